@@ -309,7 +309,8 @@ export default function Home() {
               return acc
             }, {} as Record<string, string[]>)
         },
-        history: sanitizedHistory  // Send conversation history without UI-only fields
+        history: sanitizedHistory,  // Send conversation history without UI-only fields
+        stream_protocol: 2  // Delta-only report_chunk events (seq + periodic checkpoints)
       }
 
       console.log('🚀 Sending streaming request to backend:', message)
@@ -368,8 +369,13 @@ export default function Home() {
                 workingHistory = [...localHistoryBefore, assistantMessage]
                 updateMessages(targetSessionId!, workingHistory)
               } else if (data.action === 'report_chunk') {
-                // Streaming report content
-                finalReport = data.accumulated_report
+                // Streaming report content: protocol 2 sends deltas only, legacy servers send the accumulated text
+                // (the complete event still carries the full report, which replaces the appended text)
+                if (typeof data.accumulated_report === 'string') {
+                  finalReport = data.accumulated_report
+                } else {
+                  finalReport += data.chunk || ''
+                }
                 if (!isGeneratingReport) {
                   isGeneratingReport = true
                 }
@@ -0,0 +1,241 @@
+"""Process-wide admission control for upstream calls.
+
+Every upstream (LLM adapters such as "openrouter", MCP servers as "mcp:<name>",
+and whole research runs as "research") gets a concurrency limit. Callers over
+the limit wait in a queue ordered by plan priority (pro > plus > free), with
+fair sharing between users inside a priority level and aging so lower plans
+cannot starve. The calling user/plan travels in a ContextVar, so providers.py
+and mcp_client.py need no extra arguments.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+# Lower number = served first
+PLAN_PRIORITY = {"team": 0, "pro": 0, "plus": 1, "free": 2}
+DEFAULT_PLAN = "free"
+
+# Default per-upstream limit; JSON overrides e.g. {"openrouter": 48, "mcp:tavily": 32, "research": 16}
+ADMISSION_DEFAULT_LIMIT = int(os.getenv("ADMISSION_DEFAULT_LIMIT", "32"))
+ADMISSION_LIMITS_JSON = os.getenv("ADMISSION_LIMITS", "{}")
+# Seconds of waiting that lift a waiter by one priority level
+ADMISSION_AGING_SEC = float(os.getenv("ADMISSION_AGING_SEC", "30"))
+
+QueueListener = Callable[[str, int], Awaitable[None]]
+
+_request_ctx: ContextVar[Optional[Dict[str, str]]] = ContextVar("dwr_admission_request", default=None)
+_queue_listener: ContextVar[Optional[QueueListener]] = ContextVar("dwr_admission_listener", default=None)
+
+
+def _load_limits() -> Dict[str, int]:
+    try:
+        data = json.loads(ADMISSION_LIMITS_JSON or "{}")
+        return {str(k): int(v) for k, v in data.items()} if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def normalize_plan(plan: Optional[str]) -> str:
+    p = (plan or "").strip().lower()
+    return p if p in PLAN_PRIORITY else DEFAULT_PLAN
+
+
+def set_request_context(user_id: Optional[str], plan: Optional[str]):
+    """Attribute upstream calls made from the current context to a user/plan; returns a reset token"""
+    return _request_ctx.set({"user_id": user_id or "anonymous", "plan": normalize_plan(plan)})
+
+
+def reset_request_context(token) -> None:
+    try:
+        _request_ctx.reset(token)
+    except Exception:
+        pass
+
+
+def set_queue_listener(listener: Optional[QueueListener]):
+    """Register an async callback(upstream, position) invoked when a call has to queue"""
+    return _queue_listener.set(listener)
+
+
+class AdmissionTicket:
+    """One caller's claim on a gate: granted immediately or queued"""
+
+    def __init__(self, gate: "_UpstreamGate", user_id: str, plan: str, seq: int):
+        self.gate = gate
+        self.user_id = user_id
+        self.plan = plan
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.released = False
+        self._event = asyncio.Event()
+
+    def _grant(self) -> None:
+        self.granted = True
+        self._event.set()
+
+    def position(self) -> int:
+        """1-based position in the queue (0 once granted)"""
+        return self.gate.position_of(self)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until granted; returns False on timeout (the ticket stays queued)"""
+        if self.granted:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.granted
+
+    def release(self) -> None:
+        """Give the slot back, or leave the queue if not yet granted"""
+        if self.released:
+            return
+        self.released = True
+        self.gate._release(self)
+
+
+class _UpstreamGate:
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.active = 0
+        self.active_by_user: Dict[str, int] = {}
+        self.waiters: List[AdmissionTicket] = []
+        self._seq = itertools.count()
+        self.admitted_total = 0
+        self.queued_total = 0
+        self.wait_seconds_total = 0.0
+        self.max_queue_depth = 0
+        self.recent_waits: Deque[float] = deque(maxlen=200)
+
+    def _rank(self, t: AdmissionTicket, now: float) -> tuple:
+        aged = float(PLAN_PRIORITY.get(t.plan, 2))
+        if ADMISSION_AGING_SEC > 0:
+            aged -= (now - t.enqueued_at) / ADMISSION_AGING_SEC
+        # Fair share: among equal priority, users with fewer running calls go first
+        return (aged, self.active_by_user.get(t.user_id, 0), t.seq)
+
+    def enqueue(self, user_id: str, plan: str) -> AdmissionTicket:
+        ticket = AdmissionTicket(self, user_id, plan, next(self._seq))
+        if self.active < self.limit and not self.waiters:
+            self._admit(ticket)
+        else:
+            self.waiters.append(ticket)
+            self.queued_total += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self.waiters))
+        return ticket
+
+    def _admit(self, ticket: AdmissionTicket) -> None:
+        self.active += 1
+        self.active_by_user[ticket.user_id] = self.active_by_user.get(ticket.user_id, 0) + 1
+        waited = time.monotonic() - ticket.enqueued_at
+        self.admitted_total += 1
+        self.wait_seconds_total += waited
+        self.recent_waits.append(waited)
+        ticket._grant()
+
+    def _dispatch(self) -> None:
+        while self.active < self.limit and self.waiters:
+            now = time.monotonic()
+            nxt = min(self.waiters, key=lambda t: self._rank(t, now))
+            self.waiters.remove(nxt)
+            self._admit(nxt)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        if ticket.granted:
+            self.active = max(0, self.active - 1)
+            left = self.active_by_user.get(ticket.user_id, 1) - 1
+            if left > 0:
+                self.active_by_user[ticket.user_id] = left
+            else:
+                self.active_by_user.pop(ticket.user_id, None)
+        elif ticket in self.waiters:
+            self.waiters.remove(ticket)
+        self._dispatch()
+
+    def position_of(self, ticket: AdmissionTicket) -> int:
+        if ticket.granted:
+            return 0
+        now = time.monotonic()
+        ordered = sorted(self.waiters, key=lambda t: self._rank(t, now))
+        try:
+            return ordered.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = sorted(self.recent_waits)
+
+        def pct(q: float) -> float:
+            return waits[int(q * (len(waits) - 1))] if waits else 0.0
+
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted_total": self.admitted_total,
+            "queued_total": self.queued_total,
+            "avg_wait_seconds": (self.wait_seconds_total / self.admitted_total) if self.admitted_total else 0.0,
+            "wait_p50_seconds": pct(0.5),
+            "wait_p90_seconds": pct(0.9),
+        }
+
+
+class AdmissionController:
+    """Registry of per-upstream gates"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = ADMISSION_DEFAULT_LIMIT):
+        self._limits = dict(limits if limits is not None else _load_limits())
+        self._default_limit = default_limit
+        self._gates: Dict[str, _UpstreamGate] = {}
+
+    def gate(self, upstream: str) -> _UpstreamGate:
+        g = self._gates.get(upstream)
+        if g is None:
+            g = _UpstreamGate(upstream, self._limits.get(upstream, self._default_limit))
+            self._gates[upstream] = g
+        return g
+
+    def enqueue(self, upstream: str, user_id: Optional[str] = None, plan: Optional[str] = None) -> AdmissionTicket:
+        ctx = _request_ctx.get() or {}
+        return self.gate(upstream).enqueue(user_id or ctx.get("user_id") or "anonymous", normalize_plan(plan or ctx.get("plan")))
+
+    @asynccontextmanager
+    async def slot(self, upstream: str):
+        """Hold one concurrency slot on ``upstream`` for the duration of the block"""
+        ticket = self.enqueue(upstream)
+        try:
+            if not ticket.granted:
+                listener = _queue_listener.get()
+                if listener is not None:
+                    try:
+                        await listener(upstream, ticket.position())
+                    except Exception:
+                        pass
+                await ticket.wait()
+            yield ticket
+        finally:
+            ticket.release()
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: g.metrics() for name, g in sorted(self._gates.items())}
+
+
+_global_admission = AdmissionController()
+
+
+def get_admission() -> AdmissionController:
+    """Get global admission controller instance"""
+    return _global_admission
@@ -0,0 +1,188 @@
+"""API key verification caches and batched ``last_used_at`` writes.
+
+- Key records are cached by prefix for API_KEY_CACHE_TTL_SEC. The secret hash
+  check, revocation and expiry checks still run on every request against the
+  cached record, so only the Supabase round trip is skipped. Revoking a key
+  drops it from this process's cache; other workers pick the revocation up
+  within the TTL.
+- Keys that failed verification (unknown prefix or wrong secret) are remembered
+  for API_KEY_NEGATIVE_TTL_SEC, so repeated bad keys are rejected without
+  touching Supabase.
+- ``last_used_at`` is collected in memory and written every
+  API_KEY_LAST_USED_FLUSH_SEC as one PATCH for all keys used in the interval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from .supabase_client import get_supabase
+except ImportError:
+    try:
+        from deep_wide_research.supabase_client import get_supabase
+    except ImportError:
+        from supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+API_KEY_CACHE_TTL_SEC = float(os.getenv("API_KEY_CACHE_TTL_SEC", "60"))
+API_KEY_NEGATIVE_TTL_SEC = float(os.getenv("API_KEY_NEGATIVE_TTL_SEC", "30"))
+API_KEY_CACHE_MAX = int(os.getenv("API_KEY_CACHE_MAX", "10000"))
+API_KEY_LAST_USED_FLUSH_SEC = float(os.getenv("API_KEY_LAST_USED_FLUSH_SEC", "30"))
+
+
+def _evict_oldest(entries: Dict[str, Tuple[float, Any]], max_size: int) -> None:
+    # Dicts keep insertion order, so the first keys are the oldest entries
+    while len(entries) > max_size:
+        entries.pop(next(iter(entries)))
+
+
+class ApiKeyCache:
+    """Per-process cache of API key records (by prefix) and of recently rejected keys"""
+
+    def __init__(self, ttl: float = API_KEY_CACHE_TTL_SEC, negative_ttl: float = API_KEY_NEGATIVE_TTL_SEC, max_size: int = API_KEY_CACHE_MAX):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max(1, max_size)
+        self._records: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._rejected: Dict[str, Tuple[float, None]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.rejected_hits = 0
+
+    @staticmethod
+    def _fingerprint(api_key: str) -> str:
+        return hashlib.sha256(api_key.strip().encode("utf-8")).hexdigest()
+
+    def get(self, prefix: str) -> Optional[Dict[str, Any]]:
+        entry = self._records.get(prefix)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._records.pop(prefix, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, prefix: str, record: Dict[str, Any]) -> None:
+        self._records.pop(prefix, None)
+        self._records[prefix] = (time.monotonic(), record)
+        _evict_oldest(self._records, self.max_size)
+
+    def invalidate(self, key_id: Optional[str] = None, prefix: Optional[str] = None) -> None:
+        if prefix:
+            self._records.pop(prefix, None)
+        if key_id:
+            for cached_prefix, (_, record) in list(self._records.items()):
+                if str(record.get("id")) == str(key_id):
+                    self._records.pop(cached_prefix, None)
+
+    def is_rejected(self, api_key: str) -> bool:
+        fingerprint = self._fingerprint(api_key)
+        entry = self._rejected.get(fingerprint)
+        if entry is None:
+            return False
+        if time.monotonic() - entry[0] > self.negative_ttl:
+            self._rejected.pop(fingerprint, None)
+            return False
+        self.rejected_hits += 1
+        return True
+
+    def reject(self, api_key: str) -> None:
+        fingerprint = self._fingerprint(api_key)
+        self._rejected.pop(fingerprint, None)
+        self._rejected[fingerprint] = (time.monotonic(), None)
+        _evict_oldest(self._rejected, self.max_size)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "records": len(self._records),
+            "rejected": len(self._rejected),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected_hits": self.rejected_hits,
+        }
+
+
+class LastUsedBatcher:
+    """Coalesces api_keys.last_used_at updates into one periodic PATCH"""
+
+    def __init__(self, interval: float = API_KEY_LAST_USED_FLUSH_SEC):
+        self.interval = interval
+        self._pending: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.writes = 0
+
+    def mark(self, key_id: str) -> None:
+        if not key_id:
+            return
+        self._pending[str(key_id)] = datetime.now(timezone.utc).isoformat()
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._run())
+            except RuntimeError:
+                pass
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        supabase = get_supabase()
+        if not supabase.configured:
+            return
+        # One PATCH for the whole batch; every key gets the latest use time in the batch
+        ids = ",".join(sorted(pending))
+        try:
+            resp = await supabase.request(
+                "PATCH",
+                "/rest/v1/api_keys",
+                params={"id": f"in.({ids})"},
+                json_body={"last_used_at": max(pending.values())},
+                timeout=10,
+            )
+            self.writes += 1
+            if not resp.is_success:
+                logger.warning(f"last_used_at batch failed: {resp.status_code} {resp.text[:200]}")
+        except Exception as e:
+            logger.warning(f"last_used_at batch failed: {e}")
+
+    async def aclose(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        await self.flush()
+
+
+_global_api_key_cache: Optional[ApiKeyCache] = None
+_global_last_used_batcher: Optional[LastUsedBatcher] = None
+
+
+def get_api_key_cache() -> ApiKeyCache:
+    """Get global API key cache instance"""
+    global _global_api_key_cache
+    if _global_api_key_cache is None:
+        _global_api_key_cache = ApiKeyCache()
+    return _global_api_key_cache
+
+
+def get_last_used_batcher() -> LastUsedBatcher:
+    """Get global last_used_at batcher instance"""
+    global _global_last_used_batcher
+    if _global_last_used_batcher is None:
+        _global_last_used_batcher = LastUsedBatcher()
+    return _global_last_used_batcher
@@ -0,0 +1,230 @@
+"""Offline bulk research runner.
+
+Runs a JSONL file of topics through the engine outside the web server:
+
+    python -m deep_wide_research.batch topics.jsonl -o results.jsonl.gz --concurrency 8
+
+Each input line is a JSON object with ``query`` (or ``topic``) and optional
+``id``, ``deep``, ``wide``, ``model``, ``mcp``, ``latency_goal`` and
+``deadline_seconds``; a bare JSON string is also accepted as the query. Lines
+without an ``id`` are identified by their line number.
+
+Results (report, sources, usage, timing) are appended to a gzip JSONL file,
+one gzip member per item. After every item the output offset and item id are
+written to ``<output>.checkpoint``; a re-run skips completed items (failed
+ones run again and append a newer record) and first truncates the output to
+the last checkpointed offset, dropping anything a crash left half-written.
+``--restart`` discards both files and starts over.
+
+All runs share one DeepWideEngine (pooled MCP/LLM connections, tools/list
+cache) and one tool-result cache, so identical searches across topics run once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from .engine import DeepWideEngine
+    from .log_utils import set_request_id, setup_logging
+except ImportError:
+    try:
+        from deep_wide_research.engine import DeepWideEngine
+        from deep_wide_research.log_utils import set_request_id, setup_logging
+    except ImportError:
+        from engine import DeepWideEngine
+        from log_utils import set_request_id, setup_logging
+
+
+def read_topics(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (item_id, item) for each non-empty input line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[batch] Skipping line {line_no}: invalid JSON ({e})", file=sys.stderr)
+                continue
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict) or not (item.get("query") or item.get("topic")):
+                print(f"[batch] Skipping line {line_no}: no query", file=sys.stderr)
+                continue
+            yield str(item.get("id") or f"line-{line_no}"), item
+
+
+class Checkpoint:
+    """Append-only record of finished items and the output size after each"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        self.offset = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from a crash
+                        continue
+                    if entry.get("completed", True):
+                        self.done.add(str(entry["id"]))
+                    self.offset = max(self.offset, int(entry["offset"]))
+
+    def record(self, item_id: str, offset: int, completed: bool = True) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": item_id, "offset": offset, "completed": completed}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if completed:
+            self.done.add(item_id)
+        self.offset = offset
+
+
+class ResultWriter:
+    """gzip JSONL output, one self-contained gzip member per record"""
+
+    def __init__(self, path: str, checkpoint: Checkpoint):
+        self.path = path
+        self.checkpoint = checkpoint
+        self._lock = asyncio.Lock()
+        if os.path.exists(path) and os.path.getsize(path) > checkpoint.offset:
+            # Drop output written after the last checkpoint (an interrupted member)
+            with open(path, "r+b") as f:
+                f.truncate(checkpoint.offset)
+
+    async def write(self, item_id: str, record: Dict[str, Any]) -> None:
+        data = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        async with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                offset = f.tell()
+            self.checkpoint.record(item_id, offset, completed=record.get("status") == "completed")
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 4,
+    limit: Optional[int] = None,
+    share_tool_results: bool = True,
+    restart: bool = False,
+) -> Dict[str, Any]:
+    checkpoint_path = f"{output_path}.checkpoint"
+    if restart:
+        for path in (output_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint = Checkpoint(checkpoint_path)
+    writer = ResultWriter(output_path, checkpoint)
+
+    items = [(item_id, item) for item_id, item in read_topics(input_path) if item_id not in checkpoint.done]
+    skipped = len(checkpoint.done)
+    if limit is not None:
+        items = items[:limit]
+    print(f"[batch] {len(items)} item(s) to run, {skipped} already done, concurrency {concurrency}")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tool_result_cache: Optional[Dict[str, Any]] = {} if share_tool_results else None
+    timings: List[float] = []
+    failed = 0
+
+    async def run_one(engine: DeepWideEngine, item_id: str, item: Dict[str, Any]) -> None:
+        nonlocal failed
+        # Each item runs in its own task, so log records carry the item id
+        set_request_id(item_id)
+        async with semaphore:
+            cfg = engine.config_factory()
+            cfg.tool_result_cache = tool_result_cache
+            query = item.get("query") or item.get("topic")
+            t_start = time.perf_counter()
+            record: Dict[str, Any] = {"id": item_id, "query": query}
+            try:
+                state = await engine.run(
+                    [query],
+                    cfg=cfg,
+                    mcp_config=item.get("mcp"),
+                    deep_param=float(item.get("deep", 0.5)),
+                    wide_param=float(item.get("wide", 0.5)),
+                    selected_model=item.get("model"),
+                    latency_goal=item.get("latency_goal"),
+                    deadline_seconds=item.get("deadline_seconds"),
+                )
+                record.update({
+                    "status": "completed",
+                    "report": state.get("final_report", ""),
+                    "sources": (state.get("contextjson") or {}).get("sources", []),
+                    "usage": state.get("usage"),
+                })
+            except Exception as e:
+                failed += 1
+                record.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+            seconds = time.perf_counter() - t_start
+            record["seconds"] = round(seconds, 3)
+            timings.append(seconds)
+            await writer.write(item_id, record)
+            print(f"[batch] {record['status']} {item_id} in {seconds:.1f}s ({len(timings)}/{len(items)})")
+
+    t_start = time.perf_counter()
+    async with DeepWideEngine() as engine:
+        await asyncio.gather(*(run_one(engine, item_id, item) for item_id, item in items))
+    wall = time.perf_counter() - t_start
+
+    return {
+        "items": len(timings),
+        "completed": len(timings) - failed,
+        "failed": failed,
+        "skipped": skipped,
+        "wall_seconds": round(wall, 1),
+        "runs_per_hour": round(len(timings) * 3600.0 / wall, 1) if wall > 0 and timings else 0.0,
+        "item_seconds_p50": round(_pct(timings, 0.5), 1),
+        "item_seconds_p90": round(_pct(timings, 0.9), 1),
+        "item_seconds_max": round(max(timings), 1) if timings else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m deep_wide_research.batch", description="Run a JSONL file of research topics offline.")
+    parser.add_argument("input", help="JSONL file of topics")
+    parser.add_argument("-o", "--output", required=True, help="gzip JSONL output (e.g. results.jsonl.gz)")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")), help="runs in flight at once")
+    parser.add_argument("--limit", type=int, default=None, help="run at most N pending items")
+    parser.add_argument("--no-shared-tools", action="store_true", help="do not share identical tool calls between topics")
+    parser.add_argument("--restart", action="store_true", help="discard previous output and checkpoint")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    summary = asyncio.run(run_batch(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        limit=args.limit,
+        share_tool_results=not args.no_shared_tools,
+        restart=args.restart,
+    ))
+    print("\n[Batch Summary]")
+    for key, value in summary.items():
+        print(f"- {key}: {value}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Two-tier model cascade for research steps.
+
+Research rounds only need to emit tool calls, so they can run on a fast/cheap
+model and escalate to the strong (user-selected) model when the fast output
+fails to parse or the fast model asks to escalate. The policy is chosen per
+deep/wide tier; the final report always stays on the selected model.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Pseudo-tool the fast model may call to hand the step to the strong model
+ESCALATE_TOOL = "Escalate"
+
+ESCALATE_PROMPT_NOTE = (
+    "\n\n<Escalation>\n"
+    "If the next step needs deeper reasoning than you can reliably provide, respond only with "
+    f'<tool_call>{{"tool": "{ESCALATE_TOOL}", "arguments": {{}}}}</tool_call> '
+    "and a stronger model will take this step.\n"
+    "</Escalation>"
+)
+
+
+def cascade_tier(deep_param: float, wide_param: float) -> str:
+    """Map deep/wide to a cascade tier: light | standard | heavy"""
+    try:
+        load = float(deep_param) * float(wide_param)
+    except Exception:
+        load = 0.25
+    if load <= 0.25:
+        return "light"
+    if load <= 0.5625:
+        return "standard"
+    return "heavy"
+
+
+def load_cascade_policy() -> Dict[str, Optional[str]]:
+    """Per-tier fast model from RESEARCH_CASCADE_POLICY, defaulting to RESEARCH_FAST_MODEL.
+
+    Example: {"light": "openai/gpt-4.1-mini", "heavy": null} - null disables the cascade.
+    """
+    default = os.getenv("RESEARCH_FAST_MODEL") or None
+    policy: Dict[str, Optional[str]] = {"light": default, "standard": default, "heavy": default}
+    try:
+        data = json.loads(os.getenv("RESEARCH_CASCADE_POLICY", "{}") or "{}")
+    except Exception:
+        data = {}
+    if isinstance(data, dict):
+        for tier, model in data.items():
+            policy[str(tier)] = str(model) if model else None
+    return policy
+
+
+class CascadeStats:
+    """Process-wide fast-call / escalation counters per tier"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, escalated: bool) -> None:
+        with self._lock:
+            c = self._counts.setdefault(tier or "unknown", {"fast_steps": 0, "escalations": 0})
+            c["fast_steps"] += 1
+            if escalated:
+                c["escalations"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for tier, c in self._counts.items():
+                rate = c["escalations"] / c["fast_steps"] if c["fast_steps"] else 0.0
+                out[tier] = {**c, "escalation_rate": rate}
+            return out
+
+
+_global_cascade_stats = CascadeStats()
+
+
+def get_cascade_stats() -> CascadeStats:
+    """Get global cascade statistics instance"""
+    return _global_cascade_stats
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-import json
 from typing import Any, Dict, List, Optional, Callable
 
+try:
+    from . import serializer
+except ImportError:
+    try:
+        from deep_wide_research import serializer
+    except ImportError:
+        import serializer
+
 
 def _try_parse_json(text: Any) -> Optional[Any]:
     try:
@@ -11,7 +18,7 @@ def _try_parse_json(text: Any) -> Optional[Any]:
         if isinstance(text, (bytes, bytearray)):
             text = text.decode("utf-8", errors="ignore")
         if isinstance(text, str):
-            return json.loads(text)
+            return serializer.loads(text)
         return None
     except Exception:
         return None
@@ -43,11 +50,14 @@ def tavily_search_to_sources(result_obj: Any, query: Optional[str]) -> List[Dict
     top = _try_parse_json(result_obj)
     if isinstance(top, dict):
         candidates.append(top)
-        for part in top.get("content", []) if isinstance(top.get("content"), list) else []:
-            if isinstance(part, dict) and isinstance(part.get("text"), str):
-                parsed = _try_parse_json(part.get("text"))
-                if isinstance(parsed, dict):
-                    candidates.append(parsed)
+        top_sc = top.get("structuredContent")
+        # The text parts repeat structuredContent as JSON; only parse them when it is missing
+        if not (isinstance(top_sc, dict) and isinstance(top_sc.get("results"), list)):
+            for part in top.get("content", []) if isinstance(top.get("content"), list) else []:
+                if isinstance(part, dict) and isinstance(part.get("text"), str):
+                    parsed = _try_parse_json(part.get("text"))
+                    if isinstance(parsed, dict):
+                        candidates.append(parsed)
 
     for cand in candidates:
         sc = cand.get("structuredContent") if isinstance(cand, dict) else None
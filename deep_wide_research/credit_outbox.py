@@ -0,0 +1,249 @@
+"""Durable write-behind outbox for credit consumption.
+
+Charging a finished run is a local SQLite insert (WAL mode) keyed by
+request_id, so billing never waits on Supabase and survives crashes and
+restarts. A background flusher claims due rows in batches, sends each to
+``sp_consume_credits`` over the shared Supabase client (bounded concurrency),
+and deletes it once accepted. Failures are retried with exponential backoff;
+an INSUFFICIENT_CREDITS answer is final and the row is kept as ``failed`` for
+inspection. The same request_id is only ever queued once, and the RPC itself
+is idempotent on p_request_id, so a retry after a lost response is harmless.
+
+All SQLite work runs on the outbox's own worker thread, never on the event
+loop, with a short busy timeout (CREDIT_OUTBOX_DB_TIMEOUT_SEC).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .supabase_client import get_supabase
+except ImportError:
+    try:
+        from deep_wide_research.supabase_client import get_supabase
+    except ImportError:
+        from supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# The temp-dir default is for local development: on ephemeral hosts (e.g. Railway) it does not
+# survive a redeploy, so pending charges would be lost. Set CREDIT_OUTBOX_DB on a persistent volume.
+_TEMP_OUTBOX_DB = os.path.join(tempfile.gettempdir(), "dwr_credit_outbox.sqlite3")
+CREDIT_OUTBOX_DB = os.getenv("CREDIT_OUTBOX_DB", _TEMP_OUTBOX_DB)
+CREDIT_OUTBOX_FLUSH_SEC = float(os.getenv("CREDIT_OUTBOX_FLUSH_SEC", "2"))
+CREDIT_OUTBOX_BATCH = int(os.getenv("CREDIT_OUTBOX_BATCH", "50"))
+CREDIT_OUTBOX_CONCURRENCY = int(os.getenv("CREDIT_OUTBOX_CONCURRENCY", "8"))
+CREDIT_OUTBOX_MAX_BACKOFF_SEC = float(os.getenv("CREDIT_OUTBOX_MAX_BACKOFF_SEC", "300"))
+CREDIT_OUTBOX_DB_TIMEOUT_SEC = float(os.getenv("CREDIT_OUTBOX_DB_TIMEOUT_SEC", "1"))
+# A charge that cannot be written (file locked past the timeout) is retried this many times
+CREDIT_OUTBOX_ENQUEUE_ATTEMPTS = 3
+# A claimed row is invisible to other flushers (other workers sharing the file) this long
+CREDIT_OUTBOX_CLAIM_SEC = 60.0
+
+_COLUMNS = "request_id, user_id, units, meta, attempts"
+
+
+class CreditOutbox:
+    """SQLite-backed queue of pending sp_consume_credits calls"""
+
+    def __init__(self, path: str = CREDIT_OUTBOX_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="credit-outbox-db")
+        try:
+            self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None, timeout=CREDIT_OUTBOX_DB_TIMEOUT_SEC)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        except Exception as e:
+            logger.warning(f"Cannot open {path}, charges are kept in memory only: {e}")
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS credit_outbox ("
+            "request_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, units INTEGER NOT NULL, meta TEXT, "
+            "created_at REAL NOT NULL, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS credit_outbox_due ON credit_outbox (status, next_attempt_at)")
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        # Called with the user_id after a charge is accepted (e.g. to drop a cached balance)
+        self.on_charged: Optional[Callable[[str], None]] = None
+
+    async def _db(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking SQLite call on the outbox thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _insert(self, user_id: str, units: int, request_id: str, meta: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO credit_outbox (request_id, user_id, units, meta, created_at) VALUES (?, ?, ?, ?, ?)",
+                (request_id, user_id, int(units), meta, time.time()),
+            )
+        return cur.rowcount > 0
+
+    async def enqueue(self, user_id: str, units: int, request_id: str, meta: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue a charge; False if this request_id was already queued"""
+        encoded = json.dumps(meta or {}, ensure_ascii=False, default=str)
+        for attempt in range(CREDIT_OUTBOX_ENQUEUE_ATTEMPTS):
+            try:
+                inserted = await self._db(self._insert, user_id, units, request_id, encoded)
+                break
+            except sqlite3.OperationalError:
+                # Locked by another worker past the busy timeout
+                if attempt + 1 == CREDIT_OUTBOX_ENQUEUE_ATTEMPTS:
+                    raise
+                await asyncio.sleep(0.1 * (attempt + 1))
+        if self._wake is not None:
+            self._wake.set()
+        return inserted
+
+    def _pending_units(self, user_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(units), 0) FROM credit_outbox WHERE user_id = ? AND status = 'pending'", (user_id,)
+            ).fetchone()
+        return int(row[0] or 0)
+
+    async def pending_units(self, user_id: str) -> int:
+        """Units queued for ``user_id`` but not yet charged in Supabase"""
+        return await self._db(self._pending_units, user_id)
+
+    def _claim(self, limit: int) -> List[Tuple[str, str, int, str, int]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM credit_outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                    "ORDER BY created_at LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE credit_outbox SET next_attempt_at = ? WHERE request_id = ?",
+                    [(now + CREDIT_OUTBOX_CLAIM_SEC, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _done(self, request_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM credit_outbox WHERE request_id = ?", (request_id,))
+
+    def _retry(self, request_id: str, attempts: int, error: str, final: bool = False) -> None:
+        delay = min(CREDIT_OUTBOX_MAX_BACKOFF_SEC, 2.0 ** min(attempts, 16))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE credit_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE request_id = ?",
+                ("failed" if final else "pending", attempts, time.time() + delay, error[:500], request_id),
+            )
+
+    async def _send(self, row: Tuple[str, str, int, str, int]) -> None:
+        request_id, user_id, units, meta, attempts = row
+        payload = {
+            "p_user_id": user_id,
+            "p_units": units,
+            "p_request_id": request_id,
+            "p_meta": json.loads(meta or "{}"),
+        }
+        try:
+            resp = await get_supabase().rpc("sp_consume_credits", payload, timeout=10)
+        except Exception as e:
+            await self._db(self._retry, request_id, attempts + 1, f"{type(e).__name__}: {e}")
+            return
+        if resp.is_success:
+            await self._db(self._done, request_id)
+            self.sent += 1
+            if self.on_charged is not None:
+                self.on_charged(user_id)
+        elif "INSUFFICIENT_CREDITS" in resp.text:
+            logger.warning(f"Insufficient credits for {request_id} ({units} units, user {user_id})")
+            await self._db(self._retry, request_id, attempts + 1, resp.text, True)
+        else:
+            await self._db(self._retry, request_id, attempts + 1, f"{resp.status_code}: {resp.text}")
+
+    async def flush(self) -> int:
+        """Send every due row once; returns how many rows were attempted"""
+        if not get_supabase().configured:
+            return 0
+        attempted = 0
+        semaphore = asyncio.Semaphore(max(1, CREDIT_OUTBOX_CONCURRENCY))
+
+        async def send(row):
+            async with semaphore:
+                await self._send(row)
+
+        while True:
+            rows = await self._db(self._claim, CREDIT_OUTBOX_BATCH)
+            if not rows:
+                return attempted
+            attempted += len(rows)
+            await asyncio.gather(*(send(row) for row in rows))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Flush failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=CREDIT_OUTBOX_FLUSH_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self.path == _TEMP_OUTBOX_DB:
+            logger.warning(
+                f"CREDIT_OUTBOX_DB is not set; pending charges are kept in {self.path}, "
+                "which does not survive a redeploy on ephemeral hosts. Point it at a persistent volume."
+            )
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        # Last attempt; anything left stays on disk for the next start
+        try:
+            await asyncio.wait_for(self.flush(), timeout=5)
+        except Exception:
+            pass
+
+    def _counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM credit_outbox GROUP BY status").fetchall())
+
+    async def metrics(self) -> Dict[str, Any]:
+        counts = await self._db(self._counts)
+        return {"pending": counts.get("pending", 0), "failed": counts.get("failed", 0), "sent": self.sent}
+
+
+_global_credit_outbox: Optional[CreditOutbox] = None
+
+
+def get_credit_outbox() -> CreditOutbox:
+    """Get global credit outbox instance"""
+    global _global_credit_outbox
+    if _global_credit_outbox is None:
+        _global_credit_outbox = CreditOutbox()
+    return _global_credit_outbox
@@ -0,0 +1,101 @@
+"""Pre-flight credit checks: cached balances and in-flight reservations.
+
+A research run is billed only when it ends, so without a check up front a
+user with no credits still triggers the full LLM and search spend. Before a
+run starts, its units are reserved against
+
+    cached balance - units already reserved by running requests - charges still in the outbox
+
+and the reservation is released when the run ends (the actual charge goes
+through the credit outbox). Balances are cached for CREDIT_BALANCE_TTL_SEC
+and dropped on every grant and charge. Reservations are per process and
+expire after CREDIT_RESERVATION_TTL_SEC in case a run never reports back.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+CREDIT_BALANCE_TTL_SEC = float(os.getenv("CREDIT_BALANCE_TTL_SEC", "30"))
+CREDIT_RESERVATION_TTL_SEC = float(os.getenv("CREDIT_RESERVATION_TTL_SEC", "3600"))
+
+
+class CreditGuard:
+    """Per-process balance cache and credit reservations"""
+
+    def __init__(self, balance_ttl: float = CREDIT_BALANCE_TTL_SEC, reservation_ttl: float = CREDIT_RESERVATION_TTL_SEC):
+        self.balance_ttl = balance_ttl
+        self.reservation_ttl = reservation_ttl
+        self._balances: Dict[str, Tuple[float, int]] = {}
+        # user_id -> {reservation_id: (expires_at, units)}
+        self._reservations: Dict[str, Dict[int, Tuple[float, int]]] = {}
+        self._ids = itertools.count(1)
+        self.rejected = 0
+
+    def cached_balance(self, user_id: str) -> Optional[int]:
+        entry = self._balances.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.balance_ttl:
+            self._balances.pop(user_id, None)
+            return None
+        return entry[1]
+
+    def store_balance(self, user_id: str, balance: int) -> None:
+        self._balances[user_id] = (time.monotonic(), int(balance))
+
+    def invalidate(self, user_id: str) -> None:
+        self._balances.pop(user_id, None)
+
+    def reserved(self, user_id: str) -> int:
+        held = self._reservations.get(user_id)
+        if not held:
+            return 0
+        now = time.monotonic()
+        for reservation_id, (expires_at, _) in list(held.items()):
+            if expires_at <= now:
+                held.pop(reservation_id, None)
+        if not held:
+            self._reservations.pop(user_id, None)
+        return sum(units for _, units in held.values())
+
+    def try_reserve(self, user_id: str, units: int, balance: int, pending: int = 0) -> Optional[int]:
+        """Reserve ``units`` if the balance covers them; returns a reservation id or None"""
+        if balance - self.reserved(user_id) - pending < units:
+            self.rejected += 1
+            return None
+        return self.reserve(user_id, units)
+
+    def reserve(self, user_id: str, units: int) -> int:
+        reservation_id = next(self._ids)
+        self._reservations.setdefault(user_id, {})[reservation_id] = (time.monotonic() + self.reservation_ttl, int(units))
+        return reservation_id
+
+    def release(self, user_id: str, reservation_id: Optional[int]) -> None:
+        if reservation_id is None:
+            return
+        held = self._reservations.get(user_id)
+        if held is not None:
+            held.pop(reservation_id, None)
+            if not held:
+                self._reservations.pop(user_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "cached_balances": len(self._balances),
+            "users_with_reservations": len(self._reservations),
+            "reserved_units": sum(units for held in self._reservations.values() for _, units in held.values()),
+            "rejected": self.rejected,
+        }
+
+
+_global_credit_guard: Optional[CreditGuard] = None
+
+
+def get_credit_guard() -> CreditGuard:
+    """Get global credit guard instance"""
+    global _global_credit_guard
+    if _global_credit_guard is None:
+        _global_credit_guard = CreditGuard()
+    return _global_credit_guard
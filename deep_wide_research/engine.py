@@ -7,27 +7,56 @@ This engine orchestrates two core phases:
 
 from __future__ import annotations
 
-import json
 from typing import Dict, List, Optional, Any
 
+import asyncio
+import hashlib
+import logging
 import os
 import sys
 import time
+from contextlib import aclosing
 
 # Support direct execution and module imports - try absolute and relative imports
 try:
     # Try importing as part of the package (development environment)
     from .research_strategy import run_research_llm_driven
     from .generate_strategy import generate_report
+    from .route_stats import LATENCY_GOALS, get_route_stats, load_equivalent_models
+    from .cascade import cascade_tier, load_cascade_policy
+    from .admission import get_admission, set_queue_listener
+    from .usage import UsageLedger
+    from .runtime_model import get_run_history
+    from .mcp_client import MCPSessionPool, get_registry
+    from .providers import ProviderClientPool, reset_client_pool, use_client_pool
+    from . import serializer
 except ImportError:
     # Try absolute imports (direct run or deployment environment)
     try:
         from deep_wide_research.research_strategy import run_research_llm_driven
         from deep_wide_research.generate_strategy import generate_report
+        from deep_wide_research.route_stats import LATENCY_GOALS, get_route_stats, load_equivalent_models
+        from deep_wide_research.cascade import cascade_tier, load_cascade_policy
+        from deep_wide_research.admission import get_admission, set_queue_listener
+        from deep_wide_research.usage import UsageLedger
+        from deep_wide_research.runtime_model import get_run_history
+        from deep_wide_research.mcp_client import MCPSessionPool, get_registry
+        from deep_wide_research.providers import ProviderClientPool, reset_client_pool, use_client_pool
+        from deep_wide_research import serializer
     except ImportError:
         # Import as standalone modules (Railway deployment environment)
         from research_strategy import run_research_llm_driven
         from generate_strategy import generate_report
+        from route_stats import LATENCY_GOALS, get_route_stats, load_equivalent_models
+        from cascade import cascade_tier, load_cascade_policy
+        from admission import get_admission, set_queue_listener
+        from usage import UsageLedger
+        from runtime_model import get_run_history
+        from mcp_client import MCPSessionPool, get_registry
+        from providers import ProviderClientPool, reset_client_pool, use_client_pool
+        import serializer
+
+logger = logging.getLogger(__name__)
 
 
 def today_str() -> str:
@@ -38,6 +67,11 @@ def today_str() -> str:
 
 
 async def _run_researcher(topic: str, cfg: Configuration, api_keys: Optional[dict], mcp_config: Optional[Dict[str, List[str]]] = None, deep_param: float = 0.5, wide_param: float = 0.5, status_callback=None) -> Dict[str, str]:
+    if status_callback is not None:
+        # Surface upstream admission queueing to the client (scoped to this task's context)
+        async def _on_queued(upstream: str, position: int) -> None:
+            await status_callback({"event": "queued", "upstream": upstream, "position": position})
+        set_queue_listener(_on_queued)
     # Delegate to LLM-driven tool-calling strategy
     return await run_research_llm_driven(topic=topic, cfg=cfg, api_keys=api_keys, mcp_config=mcp_config, deep_param=deep_param, wide_param=wide_param, status_callback=status_callback)
 
@@ -66,18 +100,398 @@ class Configuration:
         self.final_report_model = os.getenv("FINAL_REPORT_MODEL", "openai:gpt-4.1")
         self.final_report_model_max_tokens = int(os.getenv("FINAL_REPORT_MODEL_MAX_TOKENS", "128000"))
         self.mcp_prompt = None
-
-def _apply_model_mapping_to_cfg(cfg: Configuration, deep_param: float, wide_param: float, selected_model: Optional[str] = None) -> None:
+        # Report latency goal: "latency" | "throughput" | None (provider default routing)
+        self.report_latency_goal = os.getenv("REPORT_LATENCY_GOAL") or None
+        # OpenRouter provider routing preferences for the report call, e.g. {"sort": "latency"}
+        self.report_provider_prefs: Optional[Dict[str, Any]] = None
+        # Research cascade: fast model for research steps (None = research_model only)
+        self.research_fast_model: Optional[str] = None
+        self.cascade_tier: Optional[str] = None
+        self._cascade_stats: Dict[str, int] = {"fast_steps": 0, "escalations": 0}
+        # Research rounds completed (feeds run history / ETA)
+        self._research_rounds = 0
+        # Per-request token/tool usage, emitted as the final "usage" event
+        self.usage_ledger = UsageLedger()
+        # Optional wall-clock deadline (perf_counter timestamps); research stops at
+        # research_deadline_ts so the report starts before deadline_ts
+        self.deadline_ts: Optional[float] = None
+        self.research_deadline_ts: Optional[float] = None
+        # MCP clients opened by this run (an MCPClientLease); closed when the run ends
+        self.mcp_lease = None
+        # Tool results shared by runs of one batch: identical calls are made once
+        self.tool_result_cache: Optional[Dict[str, Any]] = None
+        # LLM responses shared the same way (see providers.chat_complete)
+        self.llm_response_cache: Optional[Dict[str, Any]] = None
+
+def _apply_model_mapping_to_cfg(cfg: Configuration, deep_param: float, wide_param: float, selected_model: Optional[str] = None, latency_goal: Optional[str] = None) -> None:
     if selected_model:
-        print(f"[DeepWideResearch] Using user-selected model: {selected_model}")
+        logger.info(f"Using user-selected model: {selected_model}")
         cfg.research_model = selected_model
         cfg.final_report_model = selected_model
     else:
         # No specific model selected by user, fallback to default if not already set by env
         # (defaults are already set in Configuration.__init__)
-        print(f"[DeepWideResearch] No user model selected, using default: {cfg.research_model}")
+        logger.info(f"No user model selected, using default: {cfg.research_model}")
+    _apply_cascade_policy_to_cfg(cfg, deep_param, wide_param)
+    _apply_latency_goal_to_cfg(cfg, latency_goal)
+
+
+def _apply_cascade_policy_to_cfg(cfg: Configuration, deep_param: float, wide_param: float) -> None:
+    """Pick the research fast model for this deep/wide tier (report model is unchanged)"""
+    tier = cascade_tier(deep_param, wide_param)
+    cfg.cascade_tier = tier
+    fast_model = load_cascade_policy().get(tier)
+    if fast_model and fast_model != cfg.research_model:
+        cfg.research_fast_model = fast_model
+        logger.info(f"Research cascade ({tier}): {fast_model} -> escalate to {cfg.research_model}")
+    else:
+        cfg.research_fast_model = None
+
+
+def _apply_latency_goal_to_cfg(cfg: Configuration, latency_goal: Optional[str] = None) -> None:
+    """Route the report call by measured speed when a latency goal is set.
+
+    Sets OpenRouter provider ordering for the report, and swaps the report model
+    for a configured equivalent (EQUIVALENT_MODELS) that is measurably faster.
+    """
+    goal = (latency_goal or getattr(cfg, "report_latency_goal", None) or "").strip().lower()
+    if goal not in LATENCY_GOALS:
+        return
+    cfg.report_latency_goal = goal
+    cfg.report_provider_prefs = {"sort": goal}
+    alternates = load_equivalent_models().get(cfg.final_report_model) or []
+    if not alternates:
+        return
+    try:
+        picked = get_route_stats().pick_model([cfg.final_report_model] + alternates, goal)
+    except Exception:
+        picked = None
+    if picked and picked != cfg.final_report_model:
+        logger.info(f"Latency goal '{goal}': report model {cfg.final_report_model} -> {picked}")
+        cfg.final_report_model = picked
+
+
+def resolve_report_model(deep_param: float, wide_param: float, selected_model: Optional[str] = None, latency_goal: Optional[str] = None) -> str:
+    """Report model a run with these parameters will use (the model run history is keyed by)"""
+    cfg = Configuration()
+    _apply_model_mapping_to_cfg(cfg, deep_param, wide_param, selected_model, latency_goal)
+    return cfg.final_report_model
+
+
+
+# Share of a request deadline held back for the report phase, and its floor in seconds.
+# When route stats know the report model, its p90 TTFT is used if larger.
+DEADLINE_REPORT_RESERVE_FRACTION = float(os.getenv("DEADLINE_REPORT_RESERVE_FRACTION", "0.2"))
+DEADLINE_REPORT_RESERVE_SEC = float(os.getenv("DEADLINE_REPORT_RESERVE_SEC", "5"))
+
+
+def _apply_deadline_to_cfg(cfg: Configuration, deadline_seconds: Optional[float]) -> None:
+    """Split a per-request deadline into a research budget and a report reserve"""
+    if not deadline_seconds or deadline_seconds <= 0:
+        return
+    start = getattr(cfg, "request_start_ts", None) or time.perf_counter()
+    reserve = max(DEADLINE_REPORT_RESERVE_SEC, deadline_seconds * DEADLINE_REPORT_RESERVE_FRACTION)
+    try:
+        ttft_p90 = get_route_stats().summary(cfg.final_report_model).get("ttft_p90")
+        if ttft_p90:
+            reserve = max(reserve, float(ttft_p90))
+    except Exception:
+        pass
+    # Never reserve more than half: a tight deadline still gets some research
+    reserve = min(reserve, deadline_seconds * 0.5)
+    cfg.deadline_ts = start + deadline_seconds
+    cfg.research_deadline_ts = cfg.deadline_ts - reserve
+    logger.info(f"Deadline {deadline_seconds:.1f}s: research budget {deadline_seconds - reserve:.1f}s, report reserve {reserve:.1f}s")
+
+
+async def _cancel_task(task: Optional[asyncio.Future]) -> None:
+    """Cancel ``task`` if still running and wait for it to unwind"""
+    if task is None or task.done():
+        return
+    task.cancel()
+    # asyncio.wait (unlike awaiting the task) does not swallow a cancellation of the caller
+    await asyncio.wait({task})
+    if not task.cancelled():
+        task.exception()  # mark retrieved; the run is being abandoned
+
+
+async def _multiplex_status(status_queue: "asyncio.Queue", task: "asyncio.Task"):
+    """Yield queued status messages until ``task`` completes, then drain the rest.
+
+    Event-driven: each wakeup is either a new message or task completion, with
+    no polling timeout.
+    """
+    getter: Optional[asyncio.Future] = None
+    try:
+        while not task.done():
+            if getter is None:
+                getter = asyncio.ensure_future(status_queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                message = getter.result()
+                getter = None
+                yield message
+    finally:
+        if getter is not None and not getter.done():
+            getter.cancel()
+    # A message may have landed in the getter just as the task finished
+    if getter is not None and getter.done() and not getter.cancelled():
+        yield getter.result()
+    while not status_queue.empty():
+        try:
+            yield status_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+
+
+def _status_to_update(message: Any) -> Dict[str, Any]:
+    """Convert a status_callback message (event dict or plain status text) into a stream update dict"""
+    try:
+        parsed = message if isinstance(message, dict) else None
+        if isinstance(parsed, dict):
+            if parsed.get("event") == "sources_update":
+                return {"action": "sources_update", "sources": parsed.get("sources", [])}
+            if parsed.get("event") == "round_done":
+                # Internal: turned into an "eta" update by the stream loop
+                return {"action": "round_done", "round": parsed.get("round"), "seconds": parsed.get("seconds")}
+            if parsed.get("event") == "queued":
+                return {"action": "queued", "message": "queued", "upstream": parsed.get("upstream"), "position": parsed.get("position")}
+    except Exception:
+        pass
+    # Fallback: plain status text
+    return {"action": "using_tools", "message": message}
+
+
+# Report stream protocols: 1 = legacy (every report_chunk also carries the whole
+# accumulated_report), 2 = delta-only chunks with seq/offset plus periodic checkpoints
+REPORT_STREAM_PROTOCOL_LEGACY = 1
+REPORT_STREAM_PROTOCOL_DELTA = 2
+# Delta protocol: attach a checkpoint (length + sha256 of the report so far) every N chunks
+REPORT_CHECKPOINT_EVERY = max(1, int(os.getenv("REPORT_CHECKPOINT_EVERY", "32")))
 
 
+def normalize_stream_protocol(value: Any) -> int:
+    """Map a client-requested protocol version to a supported one (legacy when unknown)"""
+    try:
+        version = int(value)
+    except Exception:
+        return REPORT_STREAM_PROTOCOL_LEGACY
+    return REPORT_STREAM_PROTOCOL_DELTA if version >= REPORT_STREAM_PROTOCOL_DELTA else REPORT_STREAM_PROTOCOL_LEGACY
+
+
+class _ReportChunkEncoder:
+    """Accumulates the streamed report and builds report_chunk updates for the negotiated protocol.
+
+    In delta mode each update carries only the new text with its ``seq`` (1-based)
+    and ``offset`` (characters before it). Every REPORT_CHECKPOINT_EVERY chunks a
+    ``checkpoint`` with the accumulated length and its UTF-8 sha256 lets clients
+    detect drift; the ``complete`` event still carries the full report.
+    """
+
+    def __init__(self, protocol: int = REPORT_STREAM_PROTOCOL_LEGACY):
+        self.protocol = protocol
+        self.seq = 0
+        self.length = 0
+        self._parts: List[str] = []
+        self._legacy_text = ""
+        self._hash = hashlib.sha256()
+
+    def update(self, chunk: str) -> Dict[str, Any]:
+        if self.protocol != REPORT_STREAM_PROTOCOL_DELTA:
+            self._legacy_text += chunk
+            return {"action": "report_chunk", "chunk": chunk, "accumulated_report": self._legacy_text}
+        offset = self.length
+        self.seq += 1
+        self.length += len(chunk)
+        self._parts.append(chunk)
+        self._hash.update(chunk.encode("utf-8"))
+        update: Dict[str, Any] = {"action": "report_chunk", "chunk": chunk, "seq": self.seq, "offset": offset}
+        if self.seq % REPORT_CHECKPOINT_EVERY == 0:
+            update["checkpoint"] = self.checkpoint()
+        return update
+
+    def checkpoint(self) -> Dict[str, Any]:
+        return {"seq": self.seq, "length": self.length, "sha256": self._hash.copy().hexdigest()}
+
+    def text(self) -> str:
+        if self.protocol != REPORT_STREAM_PROTOCOL_DELTA:
+            return self._legacy_text
+        return "".join(self._parts)
+
+
+# Report chunk coalescing: after the first chunk (sent immediately), buffer deltas and
+# flush every REPORT_COALESCE_MS, at REPORT_COALESCE_BYTES, or on a paragraph break.
+# REPORT_COALESCE_MS=0 disables coalescing.
+REPORT_COALESCE_MS = float(os.getenv("REPORT_COALESCE_MS", "40"))
+REPORT_COALESCE_BYTES = int(os.getenv("REPORT_COALESCE_BYTES", "1024"))
+
+
+async def _coalesce_chunks(source, interval: float = REPORT_COALESCE_MS / 1000.0, max_bytes: int = REPORT_COALESCE_BYTES):
+    """Merge small stream chunks into fewer, larger ones without delaying the first token.
+
+    The interval timer runs while waiting on the source, so buffered text is
+    flushed on time even if the upstream stalls.
+    """
+    if interval <= 0:
+        async for chunk in source:
+            yield chunk
+        return
+    loop = asyncio.get_running_loop()
+    it = source.__aiter__()
+    buf: List[str] = []
+    buf_bytes = 0
+    deadline = 0.0
+    first = True
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            timeout = max(0.0, deadline - loop.time()) if buf else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Interval elapsed with text buffered and nothing new yet
+                yield "".join(buf)
+                buf, buf_bytes = [], 0
+                continue
+            fut, pending = pending, None
+            try:
+                chunk = fut.result()
+            except StopAsyncIteration:
+                break
+            if not chunk:
+                continue
+            if first:
+                first = False
+                yield chunk
+                continue
+            paragraph_break = "\n\n" in chunk or (chunk.startswith("\n") and bool(buf) and buf[-1].endswith("\n"))
+            if not buf:
+                deadline = loop.time() + interval
+            buf.append(chunk)
+            buf_bytes += len(chunk.encode("utf-8"))
+            if paragraph_break or (max_bytes > 0 and buf_bytes >= max_bytes):
+                yield "".join(buf)
+                buf, buf_bytes = [], 0
+    finally:
+        await _cancel_task(pending)
+        if hasattr(it, "aclose"):
+            try:
+                await it.aclose()
+            except Exception:
+                pass
+    if buf:
+        yield "".join(buf)
+
+
+def _usage_summary(cfg: Configuration) -> Dict[str, Any]:
+    ledger = getattr(cfg, "usage_ledger", None)
+    summary = ledger.summary() if ledger is not None else {}
+    stats = getattr(cfg, "_cascade_stats", None)
+    if getattr(cfg, "research_fast_model", None) and stats:
+        summary["cascade"] = {"tier": cfg.cascade_tier, **stats}
+    return summary
+
+
+def _eta_update(estimate: Dict[str, Any], seconds_remaining: float, p90_seconds_remaining: float, phase: str) -> Dict[str, Any]:
+    """Stream update with the estimated time left (no 'message': clients don't log it as a step)"""
+    return {
+        "action": "eta",
+        "phase": phase,
+        "seconds_remaining": round(max(0.0, seconds_remaining), 1),
+        "p90_seconds_remaining": round(max(0.0, p90_seconds_remaining), 1),
+        "basis": estimate.get("basis"),
+        "samples": estimate.get("samples", 0),
+    }
+
+
+def _eta_after_round(estimate: Dict[str, Any], rounds_done: int, research_elapsed: float) -> Dict[str, Any]:
+    """Refine the ETA from the observed round pace: expected rounds left x mean round + report"""
+    avg_round = research_elapsed / rounds_done if rounds_done else 0.0
+    rounds_left = max(0.0, float(estimate.get("rounds") or 0.0) - rounds_done)
+    remaining = rounds_left * avg_round + estimate.get("report_seconds", 0.0)
+    total = estimate.get("total_seconds") or 0.0
+    ratio = estimate.get("total_p90_seconds", total) / total if total > 0 else 1.5
+    return _eta_update(estimate, remaining, remaining * ratio, "research")
+
+
+def _record_run_history(cfg: Configuration, deep_param: float, wide_param: float, research_seconds: float, report_seconds: float) -> None:
+    if getattr(cfg, "_deadline_cut", False):
+        # Research was cut short by the request deadline; its timings would drag the estimates down
+        logger.info("Run history: skipping a run cut short by its deadline")
+        return
+    try:
+        get_run_history().record_run(
+            deep_param,
+            wide_param,
+            cfg.final_report_model,
+            total_seconds=time.perf_counter() - cfg.request_start_ts,
+            research_seconds=research_seconds,
+            report_seconds=report_seconds,
+            rounds=getattr(cfg, "_research_rounds", 0),
+        )
+    except Exception as e:
+        logger.warning(f"Failed to record run history: {e}")
+
+
+def _ensure_mcp_lease(cfg: Configuration) -> None:
+    """Give the run its own MCP client lease unless the caller (e.g. DeepWideEngine) already did"""
+    if getattr(cfg, "mcp_lease", None) is None:
+        cfg.mcp_lease = get_registry().lease()
+
+
+async def _close_mcp_lease(cfg: Configuration) -> None:
+    lease = getattr(cfg, "mcp_lease", None)
+    if lease is None:
+        return
+    t_close_start = time.perf_counter()
+    try:
+        await lease.aclose()
+    except Exception:
+        pass
+    try:
+        cfg._timing_events.append({"label": "MCP lease close", "seconds": time.perf_counter() - t_close_start})
+    except Exception:
+        pass
+
+
+def merge_sources(source_lists: List[List[Dict[str, Any]]]) -> tuple:
+    """Deduplicate sources across runs by URL.
+
+    Returns (sources, ids): each merged source lists the runs that used it under
+    ``runs``, and ids[i] holds the indices of run i's sources in ``sources``.
+    """
+    merged: List[Dict[str, Any]] = []
+    index: Dict[str, int] = {}
+    ids: List[List[int]] = []
+    for run, sources in enumerate(source_lists):
+        run_ids: List[int] = []
+        for src in sources or []:
+            key = src.get("url") or serializer.dumps(src, sort_keys=True)
+            if key not in index:
+                index[key] = len(merged)
+                merged.append({**{k: v for k, v in src.items() if k != "rank"}, "runs": []})
+            pos = index[key]
+            if pos not in run_ids:
+                run_ids.append(pos)
+                merged[pos]["runs"].append(run)
+        ids.append(run_ids)
+    return merged, ids
+
+
+def _log_timing_summary(cfg: Configuration) -> None:
+    events = getattr(cfg, "_timing_events", None)
+    if not events:
+        return
+    fields: Dict[str, Any] = {
+        "timings": [[ev.get("label", "event"), round(ev.get("seconds", 0.0), 3)] for ev in events],
+    }
+    stats = getattr(cfg, "_cascade_stats", None) or {}
+    fast_steps = stats.get("fast_steps", 0)
+    if getattr(cfg, "research_fast_model", None) and fast_steps:
+        fields["cascade"] = {"tier": cfg.cascade_tier, "fast_steps": fast_steps, "escalations": stats.get("escalations", 0)}
+    logger.info("Timing summary", extra=fields)
+
 
 # ===================== Unified Context (sources) Helpers =====================
 try:
@@ -89,315 +503,337 @@ except ImportError:
         build_context_from_raw_notes = None
 
 
-async def run_deep_research_stream(user_messages: List[str], cfg: Optional[Configuration] = None, api_keys: Optional[dict] = None, mcp_config: Optional[Dict[str, List[str]]] = None, deep_param: float = 0.5, wide_param: float = 0.5, selected_model: Optional[str] = None):
+async def run_deep_research_stream(user_messages: List[str], cfg: Optional[Configuration] = None, api_keys: Optional[dict] = None, mcp_config: Optional[Dict[str, List[str]]] = None, deep_param: float = 0.5, wide_param: float = 0.5, selected_model: Optional[str] = None, latency_goal: Optional[str] = None, stream_protocol: int = REPORT_STREAM_PROTOCOL_LEGACY, deadline_seconds: Optional[float] = None):
     """Streaming version of the deep research flow: Research → Generate
     
     Yields:
-        Status update dictionaries containing 'action' and 'message' fields
+        Status update dictionaries containing 'action' and 'message' fields.
+        ``stream_protocol`` selects the report_chunk format (see _ReportChunkEncoder).
+        With ``deadline_seconds`` research stops early so the report starts in time.
     """
     cfg = cfg or Configuration()
     # Dynamically select models based on deep & wide from frontend
-    _apply_model_mapping_to_cfg(cfg, deep_param, wide_param, selected_model)
+    _apply_model_mapping_to_cfg(cfg, deep_param, wide_param, selected_model, latency_goal)
     # Anchor request start time at server entry and init timing aggregator
     cfg.request_start_ts = time.perf_counter()
     if not hasattr(cfg, "_timing_events"):
         cfg._timing_events = []
-    # Print selected models before any OpenRouter requests
-    print(f"[DeepWideResearch] Using OpenRouter research model: {cfg.research_model}")
-    print(f"[DeepWideResearch] Using OpenRouter final report model: {cfg.final_report_model}")
-    state = {
-        "messages": [{"role": "user", "content": m} for m in user_messages],
-        "research_brief": None,
-        "notes": [],
-        "final_report": "",
-    }
-
-    # Extract research topic
-    last_user = next((m for m in reversed(state["messages"]) if m["role"] == "user"), {"content": ""})
-    research_topic = last_user.get("content", "")
-
-    # ============================================================
-    # Phase 1: Research - use unified_research_prompt
-    # ============================================================
-    yield {"action": "thinking", "message": "thinking"}
-    
-    # Let the user briefly see the thinking state
-    import asyncio
-    await asyncio.sleep(1.5)
+    _apply_deadline_to_cfg(cfg, deadline_seconds)
+    _ensure_mcp_lease(cfg)
+    try:
+        # Print selected models before any OpenRouter requests
+        logger.info(f"Using OpenRouter research model: {cfg.research_model}")
+        logger.info(f"Using OpenRouter final report model: {cfg.final_report_model}")
+        state = {
+            "messages": [{"role": "user", "content": m} for m in user_messages],
+            "research_brief": None,
+            "notes": [],
+            "final_report": "",
+        }
+
+        # Extract research topic
+        last_user = next((m for m in reversed(state["messages"]) if m["role"] == "user"), {"content": ""})
+        research_topic = last_user.get("content", "")
+
+        # ============================================================
+        # Phase 1: Research - use unified_research_prompt
+        # ============================================================
+        yield {"action": "thinking", "message": "thinking"}
+        # Initial ETA from run history; refined after each research round
+        estimate = get_run_history().estimate(deep_param, wide_param, cfg.final_report_model)
+        yield _eta_update(estimate, estimate["total_seconds"], estimate["total_p90_seconds"], "start")
     
-    # Create a queue to receive status updates
-    from asyncio import Queue
-    status_queue = Queue()
+        # Create a queue to receive status updates
+        from asyncio import Queue
+        status_queue = Queue()
     
-    # Create the status callback
-    async def status_callback(message: str):
-        await status_queue.put(message)
+        # Create the status callback
+        async def status_callback(message: Any):
+            await status_queue.put(message)
     
-    # Start the research task
-    # Ensure model is logged before the first OpenRouter call made inside research strategy
-    print(f"[DeepWideResearch] (pre-call) Research will use: {cfg.research_model}")
-    t_research_start = time.perf_counter()
-    research_task = asyncio.create_task(_run_researcher(research_topic, cfg, api_keys, mcp_config, deep_param, wide_param, status_callback))
+        # Start the research task
+        # Ensure model is logged before the first OpenRouter call made inside research strategy
+        logger.info(f"(pre-call) Research will use: {cfg.research_model}")
+        t_research_start = time.perf_counter()
+        research_task = asyncio.create_task(_run_researcher(research_topic, cfg, api_keys, mcp_config, deep_param, wide_param, status_callback))
     
-    # Read and yield status updates from the queue
-    while not research_task.done():
         try:
-            # Try to get a status update (short timeout)
-            message = await asyncio.wait_for(status_queue.get(), timeout=0.1)
-            # Try to interpret structured sources update
-            try:
-                parsed = json.loads(message) if isinstance(message, str) else None
-                if isinstance(parsed, dict) and parsed.get("event") == "sources_update":
-                    yield {"action": "sources_update", "sources": parsed.get("sources", [])}
-                    continue
-            except Exception:
-                pass
-            # Fallback: plain status text
-            yield {"action": "using_tools", "message": message}
-        except asyncio.TimeoutError:
-            # No message; continue waiting
-            continue
-    
-    # After research completes, process remaining messages in the queue
-    while not status_queue.empty():
+            # Yield status updates as they arrive, until the research task finishes
+            async with aclosing(_multiplex_status(status_queue, research_task)) as statuses:
+                async for message in statuses:
+                    update = _status_to_update(message)
+                    if update["action"] == "round_done":
+                        yield _eta_after_round(estimate, int(update.get("round") or 0), time.perf_counter() - t_research_start)
+                        continue
+                    yield update
+        
+            # Retrieve research results
+            research = await research_task
+        finally:
+            # Consumer went away (disconnect/cancel): stop the LLM rounds and in-flight tool calls too
+            await _cancel_task(research_task)
+        t_research_end = time.perf_counter()
         try:
-            message = status_queue.get_nowait()
+            cfg._timing_events.append({"label": "Research phase total", "seconds": t_research_end - t_research_start})
+        except Exception:
+            pass
+        raw_notes = research.get("raw_notes", "") if research else ""
+        state["notes"] = [raw_notes] if raw_notes else []
+        # Build unified context JSON from raw_notes and inject into messages
+        contextjson = research.get("contextjson") if isinstance(research, dict) else None
+        if not contextjson:
             try:
-                parsed = json.loads(message) if isinstance(message, str) else None
-                if isinstance(parsed, dict) and parsed.get("event") == "sources_update":
-                    yield {"action": "sources_update", "sources": parsed.get("sources", [])}
-                    continue
+                if callable(build_context_from_raw_notes):
+                    contextjson = build_context_from_raw_notes(raw_notes)
+                else:
+                    contextjson = {"sources": []}
             except Exception:
-                pass
-            yield {"action": "using_tools", "message": message}
-        except asyncio.QueueEmpty:
-            break
-    
-    # Retrieve research results
-    research = await research_task
-    t_research_end = time.perf_counter()
-    try:
-        cfg._timing_events.append({"label": "Research phase total", "seconds": t_research_end - t_research_start})
-    except Exception:
-        pass
-    raw_notes = research.get("raw_notes", "") if research else ""
-    state["notes"] = [raw_notes] if raw_notes else []
-    # Build unified context JSON from raw_notes and inject into messages
-    contextjson = research.get("contextjson") if isinstance(research, dict) else None
-    if not contextjson:
-        try:
-            if callable(build_context_from_raw_notes):
-                contextjson = build_context_from_raw_notes(raw_notes)
-            else:
                 contextjson = {"sources": []}
-        except Exception:
-            contextjson = {"sources": []}
-    state["contextjson"] = contextjson
-    state["messages"].append({
-        "role": "user",
-        "content": f"<CONTEXT_JSON>\n{json.dumps(contextjson, ensure_ascii=False)}\n</CONTEXT_JSON>"
-    })
-
-    # ============================================================
-    # Phase 2: Generate - use final_report_generation_prompt with streaming
-    # ============================================================
-    yield {"action": "generating", "message": "research finished, generating"}
+        state["contextjson"] = contextjson
+        state["messages"].append({
+            "role": "user",
+            "content": f"<CONTEXT_JSON>\n{serializer.dumps(contextjson)}\n</CONTEXT_JSON>"
+        })
+
+        # ============================================================
+        # Phase 2: Generate - use final_report_generation_prompt with streaming
+        # ============================================================
+        yield {"action": "generating", "message": "research finished, generating"}
+        yield _eta_update(estimate, estimate["report_seconds"], estimate["report_p90_seconds"], "report")
     
-    # Import the streaming report generation function
-    try:
-        from .generate_strategy import generate_report_stream
-    except ImportError:
+        # Import the streaming report generation function
         try:
-            from deep_wide_research.generate_strategy import generate_report_stream
+            from .generate_strategy import generate_report_stream
         except ImportError:
-            from generate_strategy import generate_report_stream
-    
-    # Stream the report generation
-    # Ensure model is logged before the first OpenRouter call made inside generation strategy
-    print(f"[DeepWideResearch] (pre-call) Final report will use: {cfg.final_report_model}")
-    t_generate_start = time.perf_counter()
-    final_report_content = ""
-    async for chunk in generate_report_stream(state, cfg, api_keys):
-        final_report_content += chunk
-        # Yield each chunk as it arrives
-        yield {"action": "report_chunk", "chunk": chunk, "accumulated_report": final_report_content}
-    t_generate_end = time.perf_counter()
-    try:
-        cfg._timing_events.append({"label": "Generation phase total (stream)", "seconds": t_generate_end - t_generate_start})
-    except Exception:
-        pass
-    
-    # Update state with the final report
-    state["final_report"] = final_report_content
-    state["notes"] = []
-    state["messages"].append({"role": "assistant", "content": final_report_content})
+            try:
+                from deep_wide_research.generate_strategy import generate_report_stream
+            except ImportError:
+                from generate_strategy import generate_report_stream
     
-    # Close all MCP clients
-    try:
-        from deep_wide_research.mcp_client import get_registry
-    except Exception:
+        # Stream the report generation
+        # Ensure model is logged before the first OpenRouter call made inside generation strategy
+        logger.info(f"(pre-call) Final report will use: {cfg.final_report_model}")
+        t_generate_start = time.perf_counter()
+        report_encoder = _ReportChunkEncoder(normalize_stream_protocol(stream_protocol))
+        async with aclosing(_coalesce_chunks(generate_report_stream(state, cfg, api_keys))) as report_chunks:
+            async for chunk in report_chunks:
+                # Yield each (coalesced) chunk as it arrives
+                yield report_encoder.update(chunk)
+        final_report_content = report_encoder.text()
+        t_generate_end = time.perf_counter()
         try:
-            from .mcp_client import get_registry
+            cfg._timing_events.append({"label": "Generation phase total (stream)", "seconds": t_generate_end - t_generate_start})
         except Exception:
-            get_registry = None
+            pass
     
-    if get_registry is not None:
-        try:
-            t_close_start = time.perf_counter()
-            registry = get_registry()
-            if hasattr(registry, "close_all_clients"):
-                await registry.close_all_clients()
-            t_close_end = time.perf_counter()
+        # Update state with the final report
+        state["final_report"] = final_report_content
+        state["notes"] = []
+        state["messages"].append({"role": "assistant", "content": final_report_content})
+    
+        # Send the completion signal, then the metered usage for this run
+        _record_run_history(cfg, deep_param, wide_param, t_research_end - t_research_start, t_generate_end - t_generate_start)
+        complete_update: Dict[str, Any] = {"action": "complete", "message": final_report_content, "final_report": final_report_content}
+        if report_encoder.protocol == REPORT_STREAM_PROTOCOL_DELTA:
+            complete_update["checkpoint"] = report_encoder.checkpoint()
+        yield complete_update
+        yield {"action": "usage", "usage": _usage_summary(cfg)}
+        # End-to-end timing from request receipt to completion
+        t_all_end = time.perf_counter()
+        if hasattr(cfg, "request_start_ts"):
             try:
-                cfg._timing_events.append({"label": "MCP clients close_all_clients", "seconds": t_close_end - t_close_start})
+                cfg._timing_events.append({"label": "End-to-end total (stream, request->complete)", "seconds": t_all_end - cfg.request_start_ts})
             except Exception:
                 pass
-        except Exception:
-            pass
-    
-    # Send the completion signal
-    yield {"action": "complete", "message": final_report_content, "final_report": final_report_content}
-    # End-to-end timing from request receipt to completion
-    t_all_end = time.perf_counter()
-    if hasattr(cfg, "request_start_ts"):
-        try:
-            cfg._timing_events.append({"label": "End-to-end total (stream, request->complete)", "seconds": t_all_end - cfg.request_start_ts})
-        except Exception:
-            pass
-    # Final consolidated timing summary (print once at the end)
-    try:
-        if getattr(cfg, "_timing_events", None):
-            print("\n[Timing Summary]")
-            for ev in cfg._timing_events:
-                label = ev.get("label", "event")
-                secs = ev.get("seconds", 0.0)
-                print(f"- {label}: {secs:.3f}s")
-            print("")
-    except Exception:
-        pass
+        # Final consolidated timing summary (one record at the end)
+        _log_timing_summary(cfg)
+    finally:
+        # Close the MCP clients this run opened (concurrent runs keep theirs), also on error/cancel
+        await _close_mcp_lease(cfg)
 
 
-async def run_deep_research(user_messages: List[str], cfg: Optional[Configuration] = None, api_keys: Optional[dict] = None, mcp_config: Optional[Dict[str, List[str]]] = None, deep_param: float = 0.5, wide_param: float = 0.5, selected_model: Optional[str] = None) -> dict:
+async def run_deep_research(user_messages: List[str], cfg: Optional[Configuration] = None, api_keys: Optional[dict] = None, mcp_config: Optional[Dict[str, List[str]]] = None, deep_param: float = 0.5, wide_param: float = 0.5, selected_model: Optional[str] = None, latency_goal: Optional[str] = None, deadline_seconds: Optional[float] = None) -> dict:
     """Full deep research flow: Research → Generate
     
     Args:
         user_messages: list of user messages
         cfg: configuration object
         api_keys: API keys
+        deadline_seconds: optional wall-clock budget; research stops early so the report starts in time
         
     Returns:
         State dict containing research results and the final report
     """
     cfg = cfg or Configuration()
     # Dynamically select models based on deep & wide from frontend
-    _apply_model_mapping_to_cfg(cfg, deep_param, wide_param, selected_model)
+    _apply_model_mapping_to_cfg(cfg, deep_param, wide_param, selected_model, latency_goal)
     # Anchor request start time at server entry and init timing aggregator
     cfg.request_start_ts = time.perf_counter()
     if not hasattr(cfg, "_timing_events"):
         cfg._timing_events = []
-    # Print selected models before any OpenRouter requests
-    print(f"[DeepWideResearch] Using OpenRouter research model: {cfg.research_model}")
-    print(f"[DeepWideResearch] Using OpenRouter final report model: {cfg.final_report_model}")
-    state = {
-        "messages": [{"role": "user", "content": m} for m in user_messages],
-        "research_brief": None,
-        "notes": [],
-        "final_report": "",
-    }
-
-    # Extract research topic
-    last_user = next((m for m in reversed(state["messages"]) if m["role"] == "user"), {"content": ""})
-    research_topic = last_user.get("content", "")
-
-    # ============================================================
-    # Phase 1: Research - use unified_research_prompt
-    # ============================================================
-    # Ensure model is logged before the first OpenRouter call made inside research strategy
-    print(f"[DeepWideResearch] (pre-call) Research will use: {cfg.research_model}")
-    t_research_start = time.perf_counter()
-    research = await _run_researcher(research_topic, cfg, api_keys, mcp_config, deep_param, wide_param)
-    t_research_end = time.perf_counter()
+    _apply_deadline_to_cfg(cfg, deadline_seconds)
+    _ensure_mcp_lease(cfg)
     try:
-        cfg._timing_events.append({"label": "Research phase total", "seconds": t_research_end - t_research_start})
-    except Exception:
-        pass
-    raw_notes = research.get("raw_notes", "") if research else ""
-    state["notes"] = [raw_notes] if raw_notes else []
-    # Build unified context JSON from raw_notes and inject into messages
-    contextjson = research.get("contextjson") if isinstance(research, dict) else None
-    if not contextjson:
+        # Print selected models before any OpenRouter requests
+        logger.info(f"Using OpenRouter research model: {cfg.research_model}")
+        logger.info(f"Using OpenRouter final report model: {cfg.final_report_model}")
+        state = {
+            "messages": [{"role": "user", "content": m} for m in user_messages],
+            "research_brief": None,
+            "notes": [],
+            "final_report": "",
+        }
+
+        # Extract research topic
+        last_user = next((m for m in reversed(state["messages"]) if m["role"] == "user"), {"content": ""})
+        research_topic = last_user.get("content", "")
+
+        # ============================================================
+        # Phase 1: Research - use unified_research_prompt
+        # ============================================================
+        # Ensure model is logged before the first OpenRouter call made inside research strategy
+        logger.info(f"(pre-call) Research will use: {cfg.research_model}")
+        t_research_start = time.perf_counter()
+        research = await _run_researcher(research_topic, cfg, api_keys, mcp_config, deep_param, wide_param)
+        t_research_end = time.perf_counter()
         try:
-            if callable(build_context_from_raw_notes):
-                contextjson = build_context_from_raw_notes(raw_notes)
-            else:
-                contextjson = {"sources": []}
+            cfg._timing_events.append({"label": "Research phase total", "seconds": t_research_end - t_research_start})
         except Exception:
-            contextjson = {"sources": []}
-    state["contextjson"] = contextjson
-    state["messages"].append({
-        "role": "user",
-        "content": f"<CONTEXT_JSON>\n{json.dumps(contextjson, ensure_ascii=False)}\n</CONTEXT_JSON>"
-    })
-    # ============================================================
-    # Phase 2: Generate - use final_report_generation_prompt
-    # ============================================================
-    # Ensure model is logged before the first OpenRouter call made inside generation strategy
-    print(f"[DeepWideResearch] (pre-call) Final report will use: {cfg.final_report_model}")
-    t_generate_start = time.perf_counter()
-    await final_report_generation(state, cfg, api_keys)
-    t_generate_end = time.perf_counter()
-    try:
-        cfg._timing_events.append({"label": "Generation phase total (non-stream)", "seconds": t_generate_end - t_generate_start})
-    except Exception:
-        pass
-    
-    # Close all MCP clients to avoid cancel-scope errors caused by different tasks closing clients
-    try:
-        from deep_wide_research.mcp_client import get_registry
-    except Exception:
+            pass
+        raw_notes = research.get("raw_notes", "") if research else ""
+        state["notes"] = [raw_notes] if raw_notes else []
+        # Build unified context JSON from raw_notes and inject into messages
+        contextjson = research.get("contextjson") if isinstance(research, dict) else None
+        if not contextjson:
+            try:
+                if callable(build_context_from_raw_notes):
+                    contextjson = build_context_from_raw_notes(raw_notes)
+                else:
+                    contextjson = {"sources": []}
+            except Exception:
+                contextjson = {"sources": []}
+        state["contextjson"] = contextjson
+        state["messages"].append({
+            "role": "user",
+            "content": f"<CONTEXT_JSON>\n{serializer.dumps(contextjson)}\n</CONTEXT_JSON>"
+        })
+        # ============================================================
+        # Phase 2: Generate - use final_report_generation_prompt
+        # ============================================================
+        # Ensure model is logged before the first OpenRouter call made inside generation strategy
+        logger.info(f"(pre-call) Final report will use: {cfg.final_report_model}")
+        t_generate_start = time.perf_counter()
+        await final_report_generation(state, cfg, api_keys)
+        t_generate_end = time.perf_counter()
         try:
-            from .mcp_client import get_registry
+            cfg._timing_events.append({"label": "Generation phase total (non-stream)", "seconds": t_generate_end - t_generate_start})
         except Exception:
-            get_registry = None
+            pass
+        _record_run_history(cfg, deep_param, wide_param, t_research_end - t_research_start, t_generate_end - t_generate_start)
     
-    if get_registry is not None:
-        try:
-            t_close_start = time.perf_counter()
-            registry = get_registry()
-            if hasattr(registry, "close_all_clients"):
-                await registry.close_all_clients()
-            t_close_end = time.perf_counter()
+        # End-to-end timing from request receipt to completion
+        t_all_end = time.perf_counter()
+        if hasattr(cfg, "request_start_ts"):
             try:
-                cfg._timing_events.append({"label": "MCP clients close_all_clients", "seconds": t_close_end - t_close_start})
+                cfg._timing_events.append({"label": "End-to-end total (non-stream, request->complete)", "seconds": t_all_end - cfg.request_start_ts})
             except Exception:
                 pass
-        except Exception:
-            pass
-    
-    # End-to-end timing from request receipt to completion
-    t_all_end = time.perf_counter()
-    if hasattr(cfg, "request_start_ts"):
+        # Final consolidated timing summary (one record at the end)
+        _log_timing_summary(cfg)
+        state["usage"] = _usage_summary(cfg)
+        return state
+    finally:
+        # Close the MCP clients this run opened (concurrent runs keep theirs), also on error/cancel
+        await _close_mcp_lease(cfg)
+
+
+class DeepWideEngine:
+    """Long-lived research engine that owns resources shared across runs.
+
+    Holds a pooled MCP HTTP session with a tools/list cache and a pool of LLM
+    SDK clients, so consecutive runs reuse connections instead of rebuilding
+    them. Each run still gets its own MCP client lease, closed when that run
+    ends, so concurrent runs never close each other's clients.
+
+    Usage:
+        async with DeepWideEngine() as engine:
+            result = await engine.run(["question"], deep_param=0.7)
+            async for update in engine.run_stream(["question"]):
+                ...
+    """
+
+    def __init__(self, config_factory=Configuration):
+        self.config_factory = config_factory
+        self.mcp_pool = MCPSessionPool(get_registry())
+        self.provider_pool = ProviderClientPool()
+        self.active_runs = 0
+        self.runs_total = 0
+        self._started = False
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        await self.mcp_pool.start()
+        self._started = True
+
+    async def aclose(self) -> None:
+        self._started = False
+        await self.mcp_pool.aclose()
+        await self.provider_pool.aclose()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    def _prepare(self, cfg: Optional[Configuration]) -> Configuration:
+        cfg = cfg or self.config_factory()
+        cfg.mcp_lease = self.mcp_pool.lease()
+        return cfg
+
+    async def run_stream(self, user_messages: List[str], cfg: Optional[Configuration] = None, **kwargs):
+        """run_deep_research_stream on the engine's pools; same keyword arguments"""
+        cfg = self._prepare(cfg)
+        token = use_client_pool(self.provider_pool)
+        self.active_runs += 1
+        self.runs_total += 1
         try:
-            cfg._timing_events.append({"label": "End-to-end total (non-stream, request->complete)", "seconds": t_all_end - cfg.request_start_ts})
-        except Exception:
-            pass
-    # Final consolidated timing summary (print once at the end)
-    try:
-        if getattr(cfg, "_timing_events", None):
-            print("\n[Timing Summary]")
-            for ev in cfg._timing_events:
-                label = ev.get("label", "event")
-                secs = ev.get("seconds", 0.0)
-                print(f"- {label}: {secs:.3f}s")
-            print("")
-    except Exception:
-        pass
-    return state
+            async with aclosing(run_deep_research_stream(user_messages, cfg=cfg, **kwargs)) as stream:
+                async for update in stream:
+                    yield update
+        finally:
+            self.active_runs -= 1
+            await cfg.mcp_lease.aclose()
+            reset_client_pool(token)
+
+    async def run(self, user_messages: List[str], cfg: Optional[Configuration] = None, **kwargs) -> dict:
+        """run_deep_research on the engine's pools; same keyword arguments"""
+        cfg = self._prepare(cfg)
+        token = use_client_pool(self.provider_pool)
+        self.active_runs += 1
+        self.runs_total += 1
+        try:
+            return await run_deep_research(user_messages, cfg=cfg, **kwargs)
+        finally:
+            self.active_runs -= 1
+            await cfg.mcp_lease.aclose()
+            reset_client_pool(token)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "started": self._started,
+            "active_runs": self.active_runs,
+            "runs_total": self.runs_total,
+            "mcp": self.mcp_pool.metrics(),
+            "providers": self.provider_pool.metrics(),
+            "admission": get_admission().metrics(),
+        }
 
 
 if __name__ == "__main__":
     """Click Run in VSCode to test the full Deep Research flow"""
-    import asyncio
     
     class TestConfig(Configuration):
         def __init__(self):
@@ -6,8 +6,9 @@ messages, research brief (optional), and findings collected during research.
 
 from __future__ import annotations
 
+from contextlib import aclosing
 from typing import Dict, List, Optional
-import json
+import logging
 import time
 
 # Support direct execution and module imports - try absolute and relative imports
@@ -15,15 +16,23 @@ try:
     # Try importing as part of the package (development environment)
     from .newprompt import final_report_generation_prompt
     from .providers import chat_complete
+    from .route_stats import get_route_stats
+    from .log_utils import log_payload
 except ImportError:
     # Try absolute imports (direct run or deployment environment)
     try:
         from deep_wide_research.newprompt import final_report_generation_prompt
         from deep_wide_research.providers import chat_complete
+        from deep_wide_research.route_stats import get_route_stats
+        from deep_wide_research.log_utils import log_payload
     except ImportError:
         # Import as standalone modules (Railway deployment environment)
         from newprompt import final_report_generation_prompt
         from providers import chat_complete
+        from route_stats import get_route_stats
+        from log_utils import log_payload
+
+logger = logging.getLogger(__name__)
 
 
 def _today_str() -> str:
@@ -33,6 +42,12 @@ def _today_str() -> str:
     return f"{now:%a} {now:%b} {now.day}, {now:%Y}"
 
 
+def _log_report_inputs(state: Dict, system_message: Dict, user_payload: Dict) -> None:
+    log_payload(logger, "Report system prompt", system_message["content"])
+    log_payload(logger, "Report user payload", user_payload["content"])
+    log_payload(logger, "CONTEXT_JSON - generate before prompt", state.get("contextjson") or {"sources": []})
+
+
 async def generate_report(state: Dict, cfg, api_keys: Optional[dict] = None) -> str:
     """Generate the final report and return its content string.
 
@@ -52,14 +67,7 @@ async def generate_report(state: Dict, cfg, api_keys: Optional[dict] = None) ->
         )
     }
 
-    # Optional: print debug logs
-    print(system_message["content"])
-    print(user_payload["content"])
-    try:
-        print("\n[CONTEXT_JSON - generate before prompt]")
-        print(json.dumps(state.get("contextjson") or {"sources": []}, ensure_ascii=False))
-    except Exception:
-        pass
+    _log_report_inputs(state, system_message, user_payload)
 
     t_llm_start = time.perf_counter()
     resp = await chat_complete(
@@ -67,7 +75,12 @@ async def generate_report(state: Dict, cfg, api_keys: Optional[dict] = None) ->
         [system_message, user_payload],
         cfg.final_report_model_max_tokens,
         api_keys,
+        provider_prefs=getattr(cfg, "report_provider_prefs", None),
+        response_cache=getattr(cfg, "llm_response_cache", None),
     )
+    ledger = getattr(cfg, "usage_ledger", None)
+    if ledger is not None:
+        ledger.record_llm("report", cfg.final_report_model, resp.usage, resp.provider)
     t_llm_end = time.perf_counter()
     try:
         if hasattr(cfg, "_timing_events"):
@@ -77,6 +90,7 @@ async def generate_report(state: Dict, cfg, api_keys: Optional[dict] = None) ->
             })
     except Exception:
         pass
+    log_payload(logger, "Final report generated", resp.content)
     return resp.content
 
 
@@ -108,46 +122,64 @@ async def generate_report_stream(state: Dict, cfg, api_keys: Optional[dict] = No
         )
     }
 
-    # Optional: print debug logs
-    print(system_message["content"])
-    print(user_payload["content"])
-    try:
-        print("\n[CONTEXT_JSON - generate before prompt]")
-        print(json.dumps(state.get("contextjson") or {"sources": []}, ensure_ascii=False))
-    except Exception:
-        pass
+    _log_report_inputs(state, system_message, user_payload)
 
     # Accumulate the complete report for final debug output
-    accumulated_report = ""
+    report_chunks: List[str] = []
     # Anchor to request start if available, else now
     start_ts = getattr(cfg, "request_start_ts", time.perf_counter())
     first_chunk_time: Optional[float] = None
+    usage: Dict = {}
+    t_call_start = time.perf_counter()
     
-    async for chunk in chat_complete_stream(
+    report_stream = chat_complete_stream(
         cfg.final_report_model,
         [system_message, user_payload],
         cfg.final_report_model_max_tokens,
         api_keys,
-    ):
-        if first_chunk_time is None:
-            first_chunk_time = time.perf_counter()
-            try:
-                if hasattr(cfg, "_timing_events"):
-                    cfg._timing_events.append({
-                        "label": "TTFT (request->first_token)",
-                        "seconds": first_chunk_time - start_ts
-                    })
-            except Exception:
-                pass
-        accumulated_report += chunk
-        yield chunk
+        on_usage=usage.update,
+        provider_prefs=getattr(cfg, "report_provider_prefs", None),
+    )
+    async with aclosing(report_stream):
+        async for chunk in report_stream:
+            if first_chunk_time is None:
+                first_chunk_time = time.perf_counter()
+                try:
+                    if hasattr(cfg, "_timing_events"):
+                        cfg._timing_events.append({
+                            "label": "TTFT (request->first_token)",
+                            "seconds": first_chunk_time - start_ts
+                        })
+                        cfg._timing_events.append({
+                            "label": "Report LLM TTFT (call->first_token)",
+                            "seconds": first_chunk_time - t_call_start
+                        })
+                except Exception:
+                    pass
+            report_chunks.append(chunk)
+            yield chunk
+    
+    accumulated_report = "".join(report_chunks)
+    ledger = getattr(cfg, "usage_ledger", None)
+    if ledger is not None:
+        ledger.record_llm("report", cfg.final_report_model, usage)
+    
+    # Feed rolling route statistics (call-level TTFT, decode throughput)
+    if first_chunk_time is not None:
+        try:
+            decode_secs = time.perf_counter() - first_chunk_time
+            tokens = usage.get("completion_tokens") or len(accumulated_report) / 4.0
+            tps = tokens / decode_secs if decode_secs > 0 else None
+            get_route_stats().record(
+                cfg.final_report_model,
+                usage.get("upstream") or usage.get("provider"),
+                ttft=first_chunk_time - t_call_start,
+                tokens_per_sec=tps,
+            )
+        except Exception:
+            pass
     
-    # Print the complete generated report for debugging
-    print("\n" + "="*80)
-    print("FINAL REPORT GENERATED:")
-    print("="*80)
-    print(accumulated_report)
-    print("="*80 + "\n")
+    log_payload(logger, "Final report generated", accumulated_report)
     # Do not print or add another end-to-end metric here to avoid duplication; engine prints summary
 
 
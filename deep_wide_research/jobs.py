@@ -0,0 +1,364 @@
+"""Background research jobs with resumable event streams.
+
+A job runs a research stream in its own task, independent of any HTTP
+connection. Every SSE frame it produces gets a sequence number (the SSE
+``id``) and is kept in a bounded per-job ring buffer; with JOB_EVENTS_DB set,
+frames are also written to a local SQLite file so a client that reconnects
+with an older ``Last-Event-ID`` than the buffer still holds can be replayed.
+Finished jobs are kept for JOB_TTL_SEC so late reconnects still see the result.
+
+Jobs started with a client ``request_id`` are also indexed by (user_id,
+request_id): a retried POST attaches to the existing run instead of starting a
+second one. The id is claimed before admission, so a retry that arrives during
+rate limiting or the credit check attaches too. Such runs are not detached, so
+once every client has gone for JOB_ORPHAN_GRACE_SEC the run is cancelled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+try:
+    from .serializer import sse_event
+except ImportError:
+    try:
+        from deep_wide_research.serializer import sse_event
+    except ImportError:
+        from serializer import sse_event
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENT_BUFFER = int(os.getenv("JOB_EVENT_BUFFER", "2000"))
+JOB_TTL_SEC = float(os.getenv("JOB_TTL_SEC", "900"))
+# Optional SQLite spill file for job events (empty = memory only)
+JOB_EVENTS_DB = os.getenv("JOB_EVENTS_DB", "")
+# Spilled frames are written by a background thread in batches at most this often
+JOB_SPILL_FLUSH_SEC = float(os.getenv("JOB_SPILL_FLUSH_SEC", "0.2"))
+# Attached (non-background) runs with no listener for this long are cancelled
+JOB_ORPHAN_GRACE_SEC = float(os.getenv("JOB_ORPHAN_GRACE_SEC", "15"))
+
+Frame = Tuple[int, str]
+
+
+class _EventSpill:
+    """Append-only SQLite log of job frames.
+
+    append() and delete() only queue work; a writer thread commits it in
+    batches, so SSE producers never wait on SQLite. read() also sees frames
+    that are queued but not yet committed.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()  # guards the queued work below
+        self._db_lock = threading.Lock()  # guards the connection
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_events (job_id TEXT NOT NULL, seq INTEGER NOT NULL, frame TEXT NOT NULL, PRIMARY KEY (job_id, seq))"
+        )
+        self._pending: List[Tuple[str, int, str]] = []
+        self._writing: List[Tuple[str, int, str]] = []
+        self._deletes: List[str] = []
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="job-event-spill", daemon=True)
+        self._writer.start()
+
+    def append(self, job_id: str, seq: int, frame: str) -> None:
+        with self._lock:
+            self._pending.append((job_id, seq, frame))
+
+    def _write_batch(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+            deletes, self._deletes = self._deletes, []
+            # Frames of jobs deleted meanwhile are not worth writing
+            if deletes:
+                batch = [row for row in batch if row[0] not in deletes]
+            self._writing = batch
+        if not batch and not deletes:
+            return
+        try:
+            with self._db_lock:
+                self._conn.execute("BEGIN")
+                try:
+                    if batch:
+                        self._conn.executemany("INSERT OR REPLACE INTO job_events (job_id, seq, frame) VALUES (?, ?, ?)", batch)
+                    for job_id in deletes:
+                        self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            logger.warning(f"Failed to spill {len(batch)} event(s): {e}")
+        finally:
+            with self._lock:
+                self._writing = []
+
+    def _write_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(JOB_SPILL_FLUSH_SEC)
+            self._wake.clear()
+            self._write_batch()
+
+    def read(self, job_id: str, after: int, before: int) -> List[Frame]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT seq, frame FROM job_events WHERE job_id = ? AND seq > ? AND seq < ? ORDER BY seq",
+                (job_id, after, before),
+            ).fetchall()
+        frames = {int(seq): str(frame) for seq, frame in rows}
+        with self._lock:
+            for row_job, seq, frame in self._writing + self._pending:
+                if row_job == job_id and after < seq < before:
+                    frames[seq] = frame
+        return sorted(frames.items())
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._deletes.append(job_id)
+        self._wake.set()
+
+    def close(self) -> None:
+        """Stop the writer and commit whatever is still queued"""
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self._write_batch()
+
+
+class ResearchJob:
+    """One background run and its numbered event log"""
+
+    def __init__(self, job_id: str, user_id: str, spill: Optional[_EventSpill] = None, request_id: Optional[str] = None, detached: bool = True):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.request_id = request_id
+        # Detached jobs run to completion without listeners; attached ones are cancelled once orphaned
+        self.detached = detached
+        # Final outcome reported by the run ("completed" | "failed" | "cancelled")
+        self.outcome: Optional[str] = None
+        self.subscribers = 0
+        self._orphan_timer: Optional[asyncio.TimerHandle] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.last_id = 0
+        self._events: Deque[Frame] = deque(maxlen=max(1, JOB_EVENT_BUFFER))
+        self._spill = spill
+        self._changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    async def _append(self, frame: str) -> None:
+        self.last_id += 1
+        self._events.append((self.last_id, frame))
+        if self._spill is not None:
+            try:
+                self._spill.append(self.job_id, self.last_id, frame)
+            except Exception as e:
+                logger.warning(f"Failed to spill event {self.last_id} of {self.job_id}: {e}")
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def run(self, frames: AsyncIterator[str]) -> None:
+        """Drain ``frames`` (SSE ``data:`` frames) into the event log"""
+        try:
+            async with aclosing(frames):
+                async for frame in frames:
+                    await self._append(frame)
+        except Exception as e:
+            logger.warning(f"Job {self.job_id} failed: {e}")
+        finally:
+            self.finished_at = time.time()
+            if self._orphan_timer is not None:
+                self._orphan_timer.cancel()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def _subscribe(self) -> None:
+        self.subscribers += 1
+        if self._orphan_timer is not None:
+            self._orphan_timer.cancel()
+            self._orphan_timer = None
+
+    def _unsubscribe(self) -> None:
+        self.subscribers = max(0, self.subscribers - 1)
+        self._arm_orphan_timer()
+
+    def _arm_orphan_timer(self) -> None:
+        """Cancel an attached run if nobody (re)subscribes within JOB_ORPHAN_GRACE_SEC"""
+        if self.subscribers == 0 and not self.detached and not self.finished:
+            if self._orphan_timer is not None:
+                self._orphan_timer.cancel()
+            self._orphan_timer = asyncio.get_running_loop().call_later(JOB_ORPHAN_GRACE_SEC, self._cancel_if_orphaned)
+
+    def _cancel_if_orphaned(self) -> None:
+        self._orphan_timer = None
+        if self.subscribers == 0 and not self.finished and self.task is not None:
+            logger.info(f"Job {self.job_id} has no listeners; cancelling")
+            self.task.cancel()
+
+    def _frames_after(self, after: int) -> Tuple[List[Frame], Optional[Tuple[int, int]]]:
+        """Frames with id > after, plus the (first, last) id range that was lost, if any"""
+        buffered = list(self._events)
+        if not buffered or after >= self.last_id:
+            return [], None
+        first_buffered = buffered[0][0]
+        frames: List[Frame] = []
+        gap: Optional[Tuple[int, int]] = None
+        if after + 1 < first_buffered:
+            if self._spill is not None:
+                try:
+                    frames = self._spill.read(self.job_id, after, first_buffered)
+                except Exception:
+                    frames = []
+            recovered_to = frames[-1][0] if frames else after
+            if recovered_to + 1 < first_buffered:
+                gap = (recovered_to + 1, first_buffered - 1)
+        frames.extend(f for f in buffered if f[0] > after)
+        return frames, gap
+
+    async def events(self, after: int = 0) -> AsyncIterator[Frame]:
+        """Replay frames with id > ``after``, then follow live frames until the job ends.
+
+        A lost range (older than the buffer and not spilled) is reported as a
+        single ``gap`` frame so the client knows to rely on the final event.
+        """
+        cursor = max(0, after)
+        self._subscribe()
+        try:
+            while True:
+                frames, gap = self._frames_after(cursor)
+                if gap is not None:
+                    yield gap[1], sse_event({'action': 'gap', 'from': gap[0], 'to': gap[1]})
+                for seq, frame in frames:
+                    yield seq, frame
+                    cursor = seq
+                if gap is not None and not frames:
+                    cursor = gap[1]
+                if self.finished and cursor >= self.last_id:
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.last_id > cursor or self.finished)
+        finally:
+            self._unsubscribe()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": "finished" if self.finished else "running",
+            "outcome": self.outcome,
+            "request_id": self.request_id,
+            "last_event_id": self.last_id,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    """Process-wide registry of background research jobs"""
+
+    def __init__(self, spill_path: str = JOB_EVENTS_DB):
+        self._jobs: Dict[str, ResearchJob] = {}
+        # (user_id, request_id) -> job_id for single-flight of retried requests
+        self._by_request: Dict[Tuple[str, str], str] = {}
+        self._spill: Optional[_EventSpill] = None
+        if spill_path:
+            try:
+                self._spill = _EventSpill(spill_path)
+            except Exception as e:
+                logger.warning(f"SQLite spill disabled ({spill_path}): {e}")
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - (job.finished_at or now) > JOB_TTL_SEC:
+                self._jobs.pop(job_id, None)
+                if job.request_id and self._by_request.get((job.user_id, job.request_id)) == job_id:
+                    self._by_request.pop((job.user_id, job.request_id), None)
+                if self._spill is not None:
+                    try:
+                        self._spill.delete(job_id)
+                    except Exception:
+                        pass
+
+    def reserve(self, user_id: str, request_id: Optional[str] = None, detached: bool = True) -> ResearchJob:
+        """Register a job that has not started yet, indexed by (user_id, request_id) when given.
+
+        Retries of the same request attach to it right away; call launch() to
+        run it, or reject() if the run is not admitted.
+        """
+        self._evict_expired()
+        job = ResearchJob(secrets.token_urlsafe(12), user_id, spill=self._spill, request_id=request_id, detached=detached)
+        self._jobs[job.job_id] = job
+        if request_id:
+            self._by_request[(user_id, request_id)] = job.job_id
+        return job
+
+    def launch(self, job: ResearchJob, frames: AsyncIterator[str]) -> ResearchJob:
+        """Start running a reserved job"""
+        job.task = asyncio.create_task(job.run(frames))
+        # Covers a response that never subscribes (client gone before the body started)
+        job._arm_orphan_timer()
+        return job
+
+    def reject(self, job: ResearchJob, message: str) -> None:
+        """Finish a reserved job that will never run; attached clients get ``message`` as an error"""
+        job.outcome = "rejected"  # a later retry starts a new job
+
+        async def frames() -> AsyncIterator[str]:
+            yield sse_event({'action': 'error', 'message': message})
+
+        self.launch(job, frames())
+
+    def start(self, user_id: str, frames: AsyncIterator[str], request_id: Optional[str] = None, detached: bool = True) -> ResearchJob:
+        """Run ``frames`` as a new job, indexed by (user_id, request_id) when given"""
+        return self.launch(self.reserve(user_id, request_id=request_id, detached=detached), frames)
+
+    def find(self, user_id: str, request_id: Optional[str]) -> Optional[ResearchJob]:
+        """Running or recently completed job for this request; failed/cancelled/rejected runs may be retried"""
+        if not request_id:
+            return None
+        self._evict_expired()
+        job = self._jobs.get(self._by_request.get((user_id, request_id), ""))
+        if job is None or job.outcome in ("failed", "cancelled", "rejected"):
+            return None
+        if job.finished and job.outcome is None:
+            # Ended without reporting an outcome (e.g. the stream raised): let the retry run
+            return None
+        if job.task is not None and job.task.cancelled():
+            return None
+        return job
+
+    def get(self, job_id: str) -> Optional[ResearchJob]:
+        self._evict_expired()
+        return self._jobs.get(job_id)
+
+
+_global_job_registry: Optional[JobRegistry] = None
+
+
+def get_job_registry() -> JobRegistry:
+    """Get global job registry instance"""
+    global _global_job_registry
+    if _global_job_registry is None:
+        _global_job_registry = JobRegistry()
+    return _global_job_registry
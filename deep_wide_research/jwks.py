@@ -0,0 +1,203 @@
+"""JWKS key management and a cache of verified Supabase session tokens.
+
+JWKSManager keeps the signing keys as pre-parsed key objects. The key set is
+kept for as long as the response's Cache-Control max-age allows (clamped to
+JWKS_MIN_TTL_SEC..JWKS_MAX_TTL_SEC); once stale it keeps serving the old keys
+while one background task refetches. A token with an unknown ``kid`` triggers
+an immediate refetch at most once per JWKS_UNKNOWN_KID_INTERVAL_SEC, so
+garbage tokens cannot turn into a flood of JWKS requests.
+
+VerifiedTokenCache is a small LRU of token -> (sub, exp) so the same session
+token skips signature verification until it expires.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from jose import jwk
+
+try:
+    from .supabase_client import get_supabase
+except ImportError:
+    try:
+        from deep_wide_research.supabase_client import get_supabase
+    except ImportError:
+        from supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+JWKS_DEFAULT_TTL_SEC = float(os.getenv("JWKS_DEFAULT_TTL_SEC", "600"))
+JWKS_MIN_TTL_SEC = float(os.getenv("JWKS_MIN_TTL_SEC", "60"))
+JWKS_MAX_TTL_SEC = float(os.getenv("JWKS_MAX_TTL_SEC", "86400"))
+JWKS_UNKNOWN_KID_INTERVAL_SEC = float(os.getenv("JWKS_UNKNOWN_KID_INTERVAL_SEC", "30"))
+JWT_CACHE_MAX = int(os.getenv("JWT_CACHE_MAX", "4096"))
+
+_DEFAULT_ALG = {"RSA": "RS256", "EC": "ES256"}
+
+
+class JWKSFetchError(RuntimeError):
+    """The key set could not be fetched and no earlier copy is available"""
+
+
+def _max_age(cache_control: Optional[str]) -> Optional[float]:
+    if not cache_control:
+        return None
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return float(match.group(1)) if match else None
+
+
+class JWKSManager:
+    """Signing keys from one JWKS URL, parsed once and refreshed in the background"""
+
+    def __init__(self, url: Optional[str]):
+        self.url = url
+        self._jwks: Dict[str, Dict[str, Any]] = {}
+        self._parsed: Dict[Tuple[str, str], Any] = {}
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.fetches = 0
+
+    async def _fetch(self) -> None:
+        if not self.url:
+            raise JWKSFetchError("SUPABASE_JWKS_URL not set")
+        resp = await get_supabase().client.get(self.url, timeout=5)
+        self.fetches += 1
+        if not resp.is_success:
+            raise JWKSFetchError(f"Failed to fetch JWKS: {resp.text}")
+        keys = {str(k.get("kid")): k for k in (resp.json().get("keys") or []) if isinstance(k, dict)}
+        parsed: Dict[Tuple[str, str], Any] = {}
+        for kid, data in keys.items():
+            alg = data.get("alg") or _DEFAULT_ALG.get(data.get("kty", ""), "RS256")
+            try:
+                parsed[(kid, alg)] = jwk.construct(data, alg)
+            except Exception as e:
+                logger.warning(f"Skipping unusable key {kid}: {e}")
+        ttl = _max_age(resp.headers.get("cache-control"))
+        ttl = JWKS_DEFAULT_TTL_SEC if ttl is None else ttl
+        now = time.monotonic()
+        self._jwks, self._parsed = keys, parsed
+        self._fetched_at = now
+        self._expires_at = now + min(JWKS_MAX_TTL_SEC, max(JWKS_MIN_TTL_SEC, ttl))
+
+    async def _refresh(self, force: bool = False) -> None:
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if not force and self._jwks and time.monotonic() < self._expires_at:
+                return
+            await self._fetch()
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self._refresh()
+        except Exception as e:
+            logger.warning(f"Background refresh failed, keeping previous keys: {e}")
+
+    def _key(self, kid: str, alg: str) -> Optional[Any]:
+        key = self._parsed.get((kid, alg))
+        if key is None and kid in self._jwks:
+            try:
+                key = jwk.construct(self._jwks[kid], alg)
+                self._parsed[(kid, alg)] = key
+            except Exception:
+                return None
+        return key
+
+    async def get_key(self, kid: Optional[str], alg: str) -> Optional[Any]:
+        """Parsed verification key for (kid, alg), or None when the kid is unknown"""
+        kid = str(kid)
+        if not self._jwks:
+            await self._refresh()
+        elif time.monotonic() >= self._expires_at and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+        key = self._key(kid, alg)
+        if key is None and time.monotonic() - self._fetched_at >= JWKS_UNKNOWN_KID_INTERVAL_SEC:
+            # Possibly a rotated key: refetch now, but rate-limited
+            try:
+                await self._refresh(force=True)
+            except JWKSFetchError as e:
+                logger.warning(f"Refetch for unknown kid failed: {e}")
+            key = self._key(kid, alg)
+        return key
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "keys": sorted(self._jwks),
+            "fetches": self.fetches,
+            "expires_in_sec": max(0.0, self._expires_at - time.monotonic()),
+        }
+
+
+class VerifiedTokenCache:
+    """LRU of verified token digests -> (sub, exp)"""
+
+    def __init__(self, max_size: int = JWT_CACHE_MAX):
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        sub, exp = entry
+        if exp <= time.time():
+            self._entries.pop(digest, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return sub
+
+    def put(self, token: str, sub: str, exp: Any) -> None:
+        try:
+            exp_ts = float(exp)
+        except (TypeError, ValueError):
+            # Tokens without a usable expiry are always verified in full
+            return
+        digest = self._digest(token)
+        self._entries[digest] = (sub, exp_ts)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_global_jwks_manager: Optional[JWKSManager] = None
+_global_token_cache: Optional[VerifiedTokenCache] = None
+
+
+def get_jwks_manager(url: Optional[str] = None) -> JWKSManager:
+    """Get global JWKS manager instance (``url`` is used on first call)"""
+    global _global_jwks_manager
+    if _global_jwks_manager is None:
+        _global_jwks_manager = JWKSManager(url)
+    return _global_jwks_manager
+
+
+def get_token_cache() -> VerifiedTokenCache:
+    """Get global verified-token cache instance"""
+    global _global_token_cache
+    if _global_token_cache is None:
+        _global_token_cache = VerifiedTokenCache()
+    return _global_token_cache
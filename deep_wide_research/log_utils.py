@@ -0,0 +1,241 @@
+"""Structured, non-blocking logging for the research pipeline.
+
+Records go through a bounded in-memory queue and are written to stdout by a
+background thread (QueueHandler/QueueListener), so a slow stdout never blocks
+the event loop; when the queue is full records are dropped and counted. Every
+record carries the current request's correlation id (a ContextVar set per HTTP
+request, batch item or job).
+
+Large payloads (prompts, CONTEXT_JSON, tool results, reports) go through
+``log_payload``: they are serialized only if the record will be emitted, and
+are truncated to LOG_PAYLOAD_MAX_CHARS unless the request was picked by
+LOG_PAYLOAD_SAMPLE_RATE, in which case the full payload is logged at INFO.
+
+Library modules only create loggers (``logging.getLogger(__name__)``); the
+handlers are installed by ``setup_logging()``, which the entry points call
+(main.py for the API server, batch.main for the offline runner). Importing the
+package from another application leaves that application's logging alone.
+
+Environment:
+    LOG_LEVEL=INFO                 DEBUG shows truncated payloads for every request
+    LOG_FORMAT=json                json (one object per line) or text
+    LOG_PAYLOAD_MAX_CHARS=2000
+    LOG_PAYLOAD_SAMPLE_RATE=0      share of requests whose payloads are logged in full
+    LOG_QUEUE_SIZE=10000
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("dwr_request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def new_request_id() -> str:
+    return secrets.token_hex(8)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def set_request_id(request_id: Optional[str] = None) -> contextvars.Token:
+    """Bind a correlation id to the current context; pass the token to reset_request_id"""
+    return _request_id.set(request_id or new_request_id())
+
+
+def reset_request_id(token: contextvars.Token) -> None:
+    _request_id.reset(token)
+
+
+def truncate(text: str, limit: Optional[int] = None) -> str:
+    limit = LOG_PAYLOAD_MAX_CHARS if limit is None else limit
+    if limit <= 0 or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def payload_sampled(request_id: Optional[str] = None) -> bool:
+    """Whether this request's payloads are logged in full (stable per request id)"""
+    if LOG_PAYLOAD_SAMPLE_RATE <= 0:
+        return False
+    if LOG_PAYLOAD_SAMPLE_RATE >= 1:
+        return True
+    request_id = request_id or get_request_id()
+    if not request_id:
+        return False
+    return (zlib.crc32(request_id.encode("utf-8")) % 10000) < LOG_PAYLOAD_SAMPLE_RATE * 10000
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, **fields: Any) -> None:
+    """Log a large payload: in full for sampled requests, truncated at DEBUG otherwise"""
+    sampled = payload_sampled()
+    level = logging.INFO if sampled else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+    if isinstance(payload, str):
+        text = payload
+    else:
+        try:
+            text = json.dumps(payload, ensure_ascii=False, default=str)
+        except Exception:
+            text = repr(payload)
+    logger.log(
+        level,
+        label,
+        extra={**fields, "payload": text if sampled else truncate(text), "payload_chars": len(text), "sampled": sampled},
+    )
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        rid = getattr(record, "request_id", None)
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} [{record.name}]"
+        if rid:
+            line += f" [{rid}]"
+        line += f" {record.getMessage()}"
+        extras = {k: v for k, v in vars(record).items() if k not in _RESERVED and not k.startswith("_") and k != "payload"}
+        if extras:
+            line += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        if getattr(record, "payload", None) is not None:
+            line += f"\n{record.payload}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_setup_lock = threading.Lock()
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Route the root logger through the background queue (idempotent)"""
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _queue_handler is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        _queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=max(1, LOG_QUEUE_SIZE)))
+        _queue_handler.addFilter(_RequestIdFilter())
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware binding a correlation id (X-Request-ID, else a new one) to each HTTP request"""
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(self.header, b"").decode("latin-1").strip()
+        request_id = incoming[:64] if incoming else new_request_id()
+        token = set_request_id(request_id)
+
+        async def send_with_id(message):
+            if message.get("type") == "http.response.start":
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != self.header]
+                headers.append((self.header, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            reset_request_id(token)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Set up logging and return a logger; for entry points, not library modules"""
+    setup_logging()
+    return logging.getLogger(name)
+
+
+def metrics() -> Dict[str, Any]:
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "queued": _queue_handler.queue.qsize() if _queue_handler is not None else 0,
+        "dropped": _queue_handler.dropped if _queue_handler is not None else 0,
+        "payload_sample_rate": LOG_PAYLOAD_SAMPLE_RATE,
+    }
@@ -18,28 +18,72 @@ from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable
 import asyncio
 import json
+import logging
 import time
-import requests
+from contextlib import aclosing
 from jose import jwt
 import secrets
 import hashlib
 import hmac
 from datetime import datetime, timezone, timedelta
-import logging
 
 # Try two import methods: development and deployment environments
 try:
-    from deep_wide_research.engine import run_deep_research, run_deep_research_stream, Configuration
+    from deep_wide_research.engine import Configuration, DeepWideEngine, merge_sources, normalize_stream_protocol, resolve_report_model
+    from deep_wide_research.cascade import get_cascade_stats
+    from deep_wide_research.admission import get_admission, set_request_context, reset_request_context, normalize_plan
+    from deep_wide_research.jobs import ResearchJob, get_job_registry
+    from deep_wide_research.runtime_model import get_run_history
+    from deep_wide_research.supabase_client import SupabaseREST, get_supabase
+    from deep_wide_research.auth_cache import get_api_key_cache, get_last_used_batcher
+    from deep_wide_research.jwks import JWKSFetchError, get_jwks_manager, get_token_cache
+    from deep_wide_research.credit_outbox import get_credit_outbox
+    from deep_wide_research.credits import get_credit_guard
+    from deep_wide_research.rate_limit import RateLease, RateLimited, get_rate_limiter, limit_for
+    from deep_wide_research.log_utils import RequestIdMiddleware, setup_logging, metrics as log_metrics
+    from deep_wide_research.serializer import sse_event
 except ImportError:
-    from engine import run_deep_research, run_deep_research_stream, Configuration
+    from engine import Configuration, DeepWideEngine, merge_sources, normalize_stream_protocol, resolve_report_model
+    from cascade import get_cascade_stats
+    from admission import get_admission, set_request_context, reset_request_context, normalize_plan
+    from jobs import ResearchJob, get_job_registry
+    from runtime_model import get_run_history
+    from supabase_client import SupabaseREST, get_supabase
+    from auth_cache import get_api_key_cache, get_last_used_batcher
+    from jwks import JWKSFetchError, get_jwks_manager, get_token_cache
+    from credit_outbox import get_credit_outbox
+    from credits import get_credit_guard
+    from rate_limit import RateLease, RateLimited, get_rate_limiter, limit_for
+    from log_utils import RequestIdMiddleware, setup_logging, metrics as log_metrics
+    from serializer import sse_event
 
 app = FastAPI(title="PuppyResearch API", version="1.0.0")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Shared engine: pooled MCP HTTP session, tools cache and LLM clients for all requests
+research_engine = DeepWideEngine()
+
+
+@app.on_event("startup")
+async def _start_research_engine() -> None:
+    await research_engine.start()
+    get_credit_outbox().on_charged = get_credit_guard().invalidate
+    get_credit_outbox().start()
+
+
+@app.on_event("shutdown")
+async def _close_research_engine() -> None:
+    await research_engine.aclose()
+    get_job_registry().close()
+    await get_last_used_batcher().aclose()
+    await get_credit_outbox().aclose()
+    await get_supabase().aclose()
+
+# Configure logging (queued, structured; see log_utils). Only entry points do this;
+# library modules just create their loggers, so embedding apps keep their own setup
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Configure CORS to allow frontend access
@@ -131,18 +175,19 @@ else:
     # Local development: always allow all origins (for convenience)
     allowed_origins = ["*"]
     allow_all_origins = True
-    print("💡 Tip: Running in development mode with CORS set to allow all origins (*)")
     allowed_origin_regex = None
 
-# Print CORS configuration (for debugging)
-print("="*80)
-print("🔧 CORS Configuration:")
-print(f"   Environment: {'🌐 Production' if is_production else '💻 Development (Local)'}")
-print(f"   Allowed Origins: {allowed_origins}")
-print(f"   Allow All Origins: {'✅ Yes (*)' if allow_all_origins else '❌ No (Restricted)'}")
-print(f"   Allowed Origin Regex: {allowed_origin_regex or 'None'}")
-print(f"   Allow Credentials: {'✅ Yes' if not allow_all_origins else '❌ No (incompatible with *)'}")
-print("="*80)
+# Log CORS configuration (for debugging)
+logger.info(
+    "CORS configuration",
+    extra={
+        "environment": "production" if is_production else "development",
+        "allowed_origins": allowed_origins,
+        "allow_all_origins": allow_all_origins,
+        "allowed_origin_regex": allowed_origin_regex,
+        "allow_credentials": not allow_all_origins,
+    },
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -154,6 +199,8 @@ app.add_middleware(
     expose_headers=["*"],
     max_age=3600,
 )
+# Outermost: every log record of a request carries its correlation id (echoed as X-Request-ID)
+app.add_middleware(RequestIdMiddleware)
 
 # Add explicit OPTIONS handler for all routes (fix CORS preflight issues)
 from fastapi import Request
@@ -205,7 +252,6 @@ SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
 )
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")  # Optional: legacy HS256 secret
 
-_jwks_cache: Optional[Dict[str, Any]] = None
 
 # ===================== Plan → Credits Mapping (Polar seats) =====================
 # Supports dynamic mapping via remote JSON or env JSON. Keys can be product_id or
@@ -233,14 +279,14 @@ def _parse_plan_credits_json(text: str) -> Dict[str, int]:
     except Exception:
         return {}
 
-def _load_plan_credits_mapping(force: bool = False) -> Dict[str, int]:
+async def _load_plan_credits_mapping(force: bool = False) -> Dict[str, int]:
     now = time.time()
     # Use remote URL if provided
     if POLAR_PLAN_CREDITS_URL:
         if force or (now - float(_plan_credits_cache.get("last_fetch", 0.0)) > POLAR_PLAN_CREDITS_TTL_SEC):
             try:
-                resp = requests.get(POLAR_PLAN_CREDITS_URL, timeout=5)
-                if resp.ok:
+                resp = await get_supabase().client.get(POLAR_PLAN_CREDITS_URL, timeout=5)
+                if resp.is_success:
                     _plan_credits_cache["data"] = _parse_plan_credits_json(resp.text)
                     _plan_credits_cache["last_fetch"] = now
                 else:
@@ -254,8 +300,8 @@ def _load_plan_credits_mapping(force: bool = False) -> Dict[str, int]:
     # Else: always parse env JSON (simple and predictable)
     return _parse_plan_credits_json(POLAR_PLAN_CREDITS_JSON)
 
-def _resolve_plan_credits(product_id: Optional[str] = None, price_id: Optional[str] = None) -> Optional[int]:
-    mapping = _load_plan_credits_mapping()
+async def _resolve_plan_credits(product_id: Optional[str] = None, price_id: Optional[str] = None) -> Optional[int]:
+    mapping = await _load_plan_credits_mapping()
     if not mapping:
         return None
     # Prefer explicit price mapping when provided
@@ -270,11 +316,11 @@ def _resolve_plan_credits(product_id: Optional[str] = None, price_id: Optional[s
         return mapping[product_id]
     return None
 
-def _determine_units_for_purchase(product_id: Optional[str], price_id: Optional[str], plan_hint: Optional[str]) -> int:
+async def _determine_units_for_purchase(product_id: Optional[str], price_id: Optional[str], plan_hint: Optional[str]) -> int:
     """Determine credit units to grant for a Polar purchase.
     Priority: mapping(product/price) → plan hint (plus/pro) → default plus.
     """
-    units = _resolve_plan_credits(product_id=product_id, price_id=price_id)
+    units = await _resolve_plan_credits(product_id=product_id, price_id=price_id)
     if isinstance(units, int) and units > 0:
         return units
     plan = (plan_hint or "").strip().lower()
@@ -285,21 +331,15 @@ def _determine_units_for_purchase(product_id: Optional[str], price_id: Optional[
     # Fallback: assume plus
     return POLAR_PLUS_CREDITS_DEFAULT
 
-def _get_jwks() -> Dict[str, Any]:
-    global _jwks_cache
-    if _jwks_cache is None:
-        if not SUPABASE_JWKS_URL:
-            raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_JWKS_URL not set")
-        resp = requests.get(SUPABASE_JWKS_URL, timeout=5)
-        if not resp.ok:
-            raise HTTPException(status_code=500, detail=f"Failed to fetch JWKS: {resp.text}")
-        _jwks_cache = resp.json()
-    return _jwks_cache
-
-def _verify_supabase_jwt(authorization_header: Optional[str]) -> str:
+async def _verify_supabase_jwt(authorization_header: Optional[str]) -> str:
     if not authorization_header or not authorization_header.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing Authorization header")
     token = authorization_header.split(" ", 1)[1].strip()
+    # Already-verified session tokens skip signature checks until they expire
+    token_cache = get_token_cache()
+    cached_sub = token_cache.get(token)
+    if cached_sub:
+        return cached_sub
     try:
         headers = jwt.get_unverified_header(token)
     except Exception:
@@ -320,55 +360,48 @@ def _verify_supabase_jwt(authorization_header: Optional[str]) -> str:
             user_id = payload.get("sub")
             if not user_id:
                 raise HTTPException(status_code=401, detail="Invalid token payload")
+            token_cache.put(token, user_id, payload.get("exp"))
             return user_id
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=401, detail=f"Token verification failed (HS): {str(e)}")
 
-    # RS* via JWKS
-    jwks = _get_jwks()
-    key = next((k for k in jwks.get("keys", []) if k.get("kid") == headers.get("kid")), None)
+    # RS* via JWKS (pre-parsed keys, refreshed in the background)
+    if alg not in ("RS256", "RS512"):
+        raise HTTPException(status_code=401, detail=f"Unsupported token algorithm: {alg or 'none'}")
+    if not SUPABASE_JWKS_URL:
+        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_JWKS_URL not set")
+    try:
+        key = await get_jwks_manager(SUPABASE_JWKS_URL).get_key(headers.get("kid"), alg)
+    except JWKSFetchError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     if key is None:
-        # Refresh JWKS once and retry
-        global _jwks_cache
-        _jwks_cache = None
-        jwks = _get_jwks()
-        key = next((k for k in jwks.get("keys", []) if k.get("kid") == headers.get("kid")), None)
-        if key is None:
-            raise HTTPException(status_code=401, detail="JWKS key not found")
-
-    rsa_key = {
-        "kty": key["kty"],
-        "kid": key["kid"],
-        "use": key.get("use", "sig"),
-        "n": key["n"],
-        "e": key["e"],
-    }
+        raise HTTPException(status_code=401, detail="JWKS key not found")
     try:
         payload = jwt.decode(
             token,
-            rsa_key,
+            key,
             algorithms=["RS256", "RS512"],
             options={"verify_aud": False},
         )
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token payload")
+        token_cache.put(token, user_id, payload.get("exp"))
         return user_id
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Token verification failed (RS): {str(e)}")
 
-def _supabase_auth_headers() -> Dict[str, str]:
+def _supabase() -> SupabaseREST:
+    """Shared Supabase REST client; raises 500 when Supabase is not configured"""
+    if not SUPABASE_URL:
+        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
     if not SUPABASE_SERVICE_ROLE_KEY:
         raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_SERVICE_ROLE_KEY not set")
-    return {
-        "apikey": SUPABASE_SERVICE_ROLE_KEY,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-        "Content-Type": "application/json",
-    }
+    return get_supabase()
 
 
 # ===================== API Key Helpers =====================
@@ -391,40 +424,24 @@ def _parse_api_key_str(api_key: str) -> Tuple[str, str]:
         raise HTTPException(status_code=401, detail="Invalid API key format")
     return parts[0], parts[1]
 
-def _supabase_rest_get(path: str, params: Optional[Dict[str, str]] = None, timeout: int = 5):
-    if not SUPABASE_URL:
-        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
-    url = f"{SUPABASE_URL.rstrip('/')}{path}"
-    resp = requests.get(url, headers=_supabase_auth_headers(), params=params, timeout=timeout)
-    return resp
+async def _supabase_rest_get(path: str, params: Optional[Dict[str, str]] = None, timeout: int = 5):
+    return await _supabase().get(path, params=params, timeout=timeout)
 
-def _supabase_rest_patch(path: str, json_body: Dict[str, Any], timeout: int = 5):
-    if not SUPABASE_URL:
-        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
-    url = f"{SUPABASE_URL.rstrip('/')}{path}"
-    headers = _supabase_auth_headers()
-    headers["Prefer"] = "return=representation"
-    resp = requests.patch(url, headers=headers, json=json_body, timeout=timeout)
-    return resp
+async def _supabase_rest_patch(path: str, json_body: Dict[str, Any], timeout: int = 5):
+    return await _supabase().patch(path, json_body, timeout=timeout)
 
-def _supabase_rest_post(path: str, json_body: Dict[str, Any], timeout: int = 5):
-    if not SUPABASE_URL:
-        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
-    url = f"{SUPABASE_URL.rstrip('/')}{path}"
-    headers = _supabase_auth_headers()
-    headers["Prefer"] = "return=representation"
-    resp = requests.post(url, headers=headers, json=json_body, timeout=timeout)
-    return resp
-
-def _fetch_api_key_record(prefix: str) -> Optional[Dict[str, Any]]:
-    resp = _supabase_rest_get(
+async def _supabase_rest_post(path: str, json_body: Dict[str, Any], timeout: int = 5):
+    return await _supabase().post(path, json_body, timeout=timeout)
+
+async def _fetch_api_key_record(prefix: str) -> Optional[Dict[str, Any]]:
+    resp = await _supabase_rest_get(
         "/rest/v1/api_keys",
         params={
             "prefix": f"eq.{prefix}",
             "select": "id,user_id,prefix,salt,secret_hash,revoked_at,expires_at,last_used_at,scopes"
         },
     )
-    if not resp.ok:
+    if not resp.is_success:
         raise HTTPException(status_code=500, detail=f"Supabase api_keys error: {resp.text}")
     arr = resp.json()
     if isinstance(arr, list) and arr:
@@ -432,16 +449,21 @@ def _fetch_api_key_record(prefix: str) -> Optional[Dict[str, Any]]:
     return None
 
 def _touch_api_key_last_used(key_id: str) -> None:
-    try:
-        now_iso = datetime.now(timezone.utc).isoformat()
-        _supabase_rest_patch(f"/rest/v1/api_keys?id=eq.{key_id}", {"last_used_at": now_iso})
-    except Exception:
-        pass
+    # Queued and written in periodic batches (see auth_cache.LastUsedBatcher)
+    get_last_used_batcher().mark(key_id)
 
-def _verify_api_key(api_key: str) -> Tuple[str, Dict[str, Any]]:
+async def _verify_api_key(api_key: str) -> Tuple[str, Dict[str, Any]]:
     prefix, secret = _parse_api_key_str(api_key)
-    record = _fetch_api_key_record(prefix)
+    key_cache = get_api_key_cache()
+    if key_cache.is_rejected(api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    record = key_cache.get(prefix)
+    if record is None:
+        record = await _fetch_api_key_record(prefix)
+        if record:
+            key_cache.put(prefix, record)
     if not record:
+        key_cache.reject(api_key)
         raise HTTPException(status_code=401, detail="Invalid API key")
     if record.get("revoked_at"):
         raise HTTPException(status_code=401, detail="API key revoked")
@@ -461,7 +483,8 @@ def _verify_api_key(api_key: str) -> Tuple[str, Dict[str, Any]]:
     expected_hash = record.get("secret_hash") or ""
     if not salt or not expected_hash:
         raise HTTPException(status_code=401, detail="API key invalid")
-    if _hash_api_key_secret(secret, salt) != expected_hash:
+    if not hmac.compare_digest(_hash_api_key_secret(secret, salt), expected_hash):
+        key_cache.reject(api_key)
         raise HTTPException(status_code=401, detail="Invalid API key")
 
     # Best-effort update last_used_at
@@ -475,29 +498,26 @@ def _verify_api_key(api_key: str) -> Tuple[str, Dict[str, Any]]:
         raise HTTPException(status_code=401, detail="Invalid API key")
     return user_id, record
 
-def _resolve_user(headers: Dict[str, str]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+async def _resolve_user(headers: Dict[str, str]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
     # Priority: Bearer JWT, then Authorization: ApiKey, then X-API-Key
     auth_header = headers.get("authorization") or headers.get("Authorization")
     if auth_header:
         lower = auth_header.lower()
         if lower.startswith("bearer "):
-            return _verify_supabase_jwt(auth_header), "jwt", None
+            return await _verify_supabase_jwt(auth_header), "jwt", None
         if lower.startswith("apikey "):
-            user_id, rec = _verify_api_key(auth_header)
+            user_id, rec = await _verify_api_key(auth_header)
             return user_id, "api_key", rec
     x_api_key = headers.get("x-api-key") or headers.get("X-API-Key")
     if x_api_key:
-        user_id, rec = _verify_api_key(x_api_key)
+        user_id, rec = await _verify_api_key(x_api_key)
         return user_id, "api_key", rec
     raise HTTPException(status_code=401, detail="Missing Authorization or X-API-Key header")
 
-def _get_credit_balance(user_id: str) -> int:
-    if not SUPABASE_URL:
-        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
-    url = f"{SUPABASE_URL}/rest/v1/credit_balance"
+async def _get_credit_balance(user_id: str) -> int:
     params = {"user_id": f"eq.{user_id}", "select": "balance"}
-    resp = requests.get(url, headers=_supabase_auth_headers(), params=params, timeout=5)
-    if not resp.ok:
+    resp = await _supabase_rest_get("/rest/v1/credit_balance", params=params, timeout=5)
+    if not resp.is_success:
         raise HTTPException(status_code=500, detail=f"Supabase balance error: {resp.text}")
     arr = resp.json()
     if isinstance(arr, list) and arr:
@@ -508,18 +528,16 @@ def _get_credit_balance(user_id: str) -> int:
             return 0
     return 0
 
-def _consume_credits(user_id: str, units: int, request_id: str, meta: Dict[str, Any]) -> int:
-    if not SUPABASE_URL:
-        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
-    url = f"{SUPABASE_URL}/rest/v1/rpc/sp_consume_credits"
+async def _consume_credits(user_id: str, units: int, request_id: str, meta: Dict[str, Any]) -> int:
     payload = {
         "p_user_id": user_id,
         "p_units": units,
         "p_request_id": request_id,
         "p_meta": meta or {},
     }
-    resp = requests.post(url, headers=_supabase_auth_headers(), json=payload, timeout=10)
-    if not resp.ok:
+    resp = await _supabase().rpc("sp_consume_credits", payload, timeout=10)
+    get_credit_guard().invalidate(user_id)
+    if not resp.is_success:
         # Map insufficient credits to 402
         if "INSUFFICIENT_CREDITS" in resp.text:
             raise HTTPException(status_code=402, detail="Insufficient credits")
@@ -529,33 +547,31 @@ def _consume_credits(user_id: str, units: int, request_id: str, meta: Dict[str,
     except Exception:
         return 0
 
-def _grant_credits(user_id: str, units: int, request_id: str, meta: Dict[str, Any]) -> int:
-    if not SUPABASE_URL:
-        raise HTTPException(status_code=500, detail="Server misconfigured: SUPABASE_URL not set")
-    url = f"{SUPABASE_URL}/rest/v1/rpc/sp_grant_credits"
+async def _grant_credits(user_id: str, units: int, request_id: str, meta: Dict[str, Any]) -> int:
     payload = {
         "p_user_id": user_id,
         "p_units": units,
         "p_request_id": request_id,
         "p_meta": meta or {},
     }
-    resp = requests.post(url, headers=_supabase_auth_headers(), json=payload, timeout=10)
-    if not resp.ok:
+    resp = await _supabase().rpc("sp_grant_credits", payload, timeout=10)
+    get_credit_guard().invalidate(user_id)
+    if not resp.is_success:
         raise HTTPException(status_code=500, detail=f"Supabase grant error: {resp.text}")
     try:
         return int(resp.json())
     except Exception:
         return 0
 
-def _find_user_by_email(email: Optional[str]) -> Optional[str]:
+async def _find_user_by_email(email: Optional[str]) -> Optional[str]:
     if not email:
         return None
     try:
-        resp = _supabase_rest_get(
+        resp = await _supabase_rest_get(
             "/rest/v1/profiles",
             params={"email": f"eq.{email}", "select": "user_id"},
         )
-        if resp.ok:
+        if resp.is_success:
             arr = resp.json()
             if isinstance(arr, list) and arr:
                 uid = arr[0].get("user_id")
@@ -564,10 +580,10 @@ def _find_user_by_email(email: Optional[str]) -> Optional[str]:
         return None
     return None
 
-def _update_subscription(user_id: str, provider: str, status: Optional[str], current_period_end: Optional[str], metadata: Dict[str, Any]) -> None:
+async def _update_subscription(user_id: str, provider: str, status: Optional[str], current_period_end: Optional[str], metadata: Dict[str, Any]) -> None:
     try:
         # Try to find existing subscription for this user/provider
-        resp = _supabase_rest_get(
+        resp = await _supabase_rest_get(
             "/rest/v1/subscriptions",
             params={
                 "user_id": f"eq.{user_id}",
@@ -576,10 +592,10 @@ def _update_subscription(user_id: str, provider: str, status: Optional[str], cur
                 "limit": "1",
             },
         )
-        if resp.ok and isinstance(resp.json(), list) and resp.json():
+        if resp.is_success and isinstance(resp.json(), list) and resp.json():
             sub_id = resp.json()[0].get("id")
             if sub_id:
-                _supabase_rest_patch(
+                await _supabase_rest_patch(
                     f"/rest/v1/subscriptions?id=eq.{sub_id}",
                     {
                         "status": status,
@@ -589,7 +605,7 @@ def _update_subscription(user_id: str, provider: str, status: Optional[str], cur
                 )
                 return
         # Insert new
-        _supabase_rest_post(
+        await _supabase_rest_post(
             "/rest/v1/subscriptions",
             {
                 "user_id": user_id,
@@ -602,11 +618,37 @@ def _update_subscription(user_id: str, provider: str, status: Optional[str], cur
     except Exception as e:
         logger.warning(f"Failed to upsert subscription: {e}")
 
-def _update_profile_plan(user_id: str, plan: str) -> None:
+async def _update_profile_plan(user_id: str, plan: str) -> None:
+    try:
+        await _supabase_rest_patch(f"/rest/v1/profiles?user_id=eq.{user_id}", {"plan": plan})
+        _plan_cache.pop(user_id, None)
+    except Exception:
+        pass
+
+# Plan lookups feed admission priority; cached briefly to keep them off the hot path
+PLAN_CACHE_TTL_SEC = int(os.getenv("PLAN_CACHE_TTL_SEC", "300"))
+_plan_cache: Dict[str, Tuple[str, float]] = {}
+
+async def _get_user_plan(user_id: str) -> str:
+    """Return the user's plan from profiles ('free' when unknown or on error)."""
+    cached = _plan_cache.get(user_id)
+    now = time.time()
+    if cached and now - cached[1] < PLAN_CACHE_TTL_SEC:
+        return cached[0]
+    plan = "free"
     try:
-        _supabase_rest_patch(f"/rest/v1/profiles?user_id=eq.{user_id}", {"plan": plan})
+        resp = await _supabase_rest_get(
+            "/rest/v1/profiles",
+            params={"user_id": f"eq.{user_id}", "select": "plan"},
+        )
+        if resp.is_success:
+            arr = resp.json()
+            if isinstance(arr, list) and arr:
+                plan = normalize_plan(arr[0].get("plan"))
     except Exception:
         pass
+    _plan_cache[user_id] = (plan, now)
+    return plan
 
 def _compute_credits_from_params(deep: float, wide: float) -> int:
     """Compute credits as: 2 × round(4 + deep * wide * 16), then clamp to [10, 40]."""
@@ -622,6 +664,63 @@ def _compute_credits_from_params(deep: float, wide: float) -> int:
         units = 40
     return units
 
+async def _reserve_credits(user_id: str, units: int) -> Optional[int]:
+    """Reserve ``units`` for a run about to start; raises 402 when the balance cannot cover it.
+
+    Uses the cached balance (fetched on miss) less running reservations and
+    charges still waiting in the outbox. If the balance cannot be read the run
+    is allowed; it is still charged through the outbox afterwards.
+    """
+    guard = get_credit_guard()
+    balance = guard.cached_balance(user_id)
+    if balance is None:
+        try:
+            balance = await _get_credit_balance(user_id)
+            guard.store_balance(user_id, balance)
+        except Exception as e:
+            logger.warning(f"Balance check failed, allowing run: {getattr(e, 'detail', e)}")
+            return guard.reserve(user_id, units)
+    reservation = guard.try_reserve(user_id, units, balance, pending=await get_credit_outbox().pending_units(user_id))
+    if reservation is None:
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+    return reservation
+
+async def _charge_run(user_id: str, message: "ResearchMessage", request_id: str, endpoint: str, auth_method: str, api_key_rec: Optional[Dict[str, Any]], usage: Optional[Dict[str, Any]], outcome: str) -> None:
+    deep_val = float(message.deepwide.deep)
+    wide_val = float(message.deepwide.wide)
+    meta = {
+        "endpoint": endpoint,
+        "version": "1.0.0",
+        "deep": deep_val,
+        "wide": wide_val,
+        "model": message.deepwide.model,
+        "thread_id": message.thread_id,
+        "auth": auth_method,
+        "api_key_prefix": (api_key_rec.get("prefix") if api_key_rec else None),
+        "usage": usage,
+        "outcome": outcome,
+    }
+    if not await get_credit_outbox().enqueue(user_id=user_id, units=_compute_credits_from_params(deep_val, wide_val), request_id=request_id, meta=meta):
+        logger.info(f"Charge skipped: request_id {request_id} already charged")
+    get_credit_guard().invalidate(user_id)
+
+async def _admit_runs(user_id: str, plan: str, api_key_rec: Optional[Dict[str, Any]], units: int) -> Tuple[RateLease, Optional[int]]:
+    """Rate limit + credit pre-flight before a run (streaming, sync or batch endpoint); raises 429/402"""
+    try:
+        rate_lease = await get_rate_limiter().acquire(
+            user_id,
+            plan,
+            api_key_prefix=(api_key_rec.get("prefix") if api_key_rec else None),
+            scopes=(api_key_rec.get("scopes") if api_key_rec else None),
+        )
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(int(e.retry_after))})
+    try:
+        return rate_lease, await _reserve_credits(user_id, units)
+    except BaseException:
+        rate_lease.release()
+        raise
+
 class Message(BaseModel):
     """Message model - Standard OpenAI format"""
     role: str  # "user", "assistant", or "system"
@@ -633,6 +732,8 @@ class DeepWideParams(BaseModel):
     deep: float = 0.5  # Depth parameter (0-1), controls research depth
     wide: float = 0.5  # Breadth parameter (0-1), controls research breadth
     model: Optional[str] = None  # Selected model to override grid
+    latency_goal: Optional[str] = None  # Optional report routing goal: "latency" | "throughput"
+    deadline_seconds: Optional[float] = None  # Optional wall-clock budget; the report starts before it expires
 
 
 class ResearchMessage(BaseModel):
@@ -648,6 +749,11 @@ class ResearchRequest(BaseModel):
     message: ResearchMessage  # Now an object instead of a string
     history: Optional[List[Message]] = None
     request_id: Optional[str] = None
+    # report_chunk format: 1 (default) = chunk + accumulated_report, 2 = delta-only with seq/checkpoints.
+    # May also be negotiated with the X-Stream-Protocol header.
+    stream_protocol: Optional[int] = None
+    # Run as a background job that survives connection drops; resume via GET /api/research/{job_id}/events
+    background: bool = False
 
 
 class ResearchResponse(BaseModel):
@@ -655,6 +761,31 @@ class ResearchResponse(BaseModel):
     response: str
     notes: List[str] = []
     success: bool = True
+    sources: List[Dict[str, Any]] = []
+    usage: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class ResearchBatchRequest(BaseModel):
+    """Batch research request - queries run with bounded concurrency and shared tool results"""
+    queries: List[ResearchMessage]
+    request_id: Optional[str] = None
+    concurrency: Optional[int] = None  # capped by RESEARCH_BATCH_CONCURRENCY and the plan's concurrent runs
+
+
+class ResearchBatchItem(ResearchResponse):
+    """One query of a batch; its sources are indices into ResearchBatchResponse.sources"""
+    index: int
+    query: str
+    source_ids: List[int] = []
+
+
+class ResearchBatchResponse(BaseModel):
+    """Batch research response model"""
+    results: List[ResearchBatchItem]
+    sources: List[Dict[str, Any]] = []  # deduplicated across queries; "runs" lists the queries using each
+    succeeded: int = 0
+    failed: int = 0
 
 
 @app.get("/")
@@ -684,89 +815,522 @@ async def mcp_status():
     }
 
 
-async def research_stream_generator(request: ResearchRequest):
-    """Generate research streaming response"""
+@app.get("/api/stats/admission")
+async def admission_stats():
+    """Upstream admission gates: limits, in-flight, queue depth and wait times"""
+    return {"upstreams": get_admission().metrics()}
+
+
+@app.get("/api/stats/cascade")
+async def cascade_stats():
+    """Research cascade escalation rate per deep/wide tier (process-wide)"""
+    return {"tiers": get_cascade_stats().snapshot()}
+
+
+@app.get("/api/stats/engine")
+async def engine_stats():
+    """Shared engine resources: active runs, MCP session pool and LLM client pool"""
+    return research_engine.metrics()
+
+
+@app.get("/api/stats/billing")
+async def billing_stats():
+    """Credit outbox (charges waiting / rejected) and pre-flight reservations"""
+    return {"outbox": await get_credit_outbox().metrics(), "reservations": get_credit_guard().metrics()}
+
+
+@app.get("/api/stats/ratelimit")
+async def ratelimit_stats():
+    """Rate limit backend, configured per-plan limits and rejections in this worker"""
+    return get_rate_limiter().metrics()
+
+
+@app.get("/api/stats/logging")
+async def logging_stats():
+    """Log level, queued and dropped records in this worker"""
+    return log_metrics()
+
+
+@app.get("/api/stats/latency")
+async def latency_stats():
+    """Run-time history per (model, deep, wide) bucket, as used for ETAs and admission"""
+    return get_run_history().snapshot()
+
+
+# How often a queued request re-reports its queue position
+ADMISSION_STATUS_INTERVAL_SEC = float(os.getenv("ADMISSION_STATUS_INTERVAL_SEC", "2"))
+# How often an in-flight stream checks whether the client is still connected
+DISCONNECT_POLL_SEC = float(os.getenv("DISCONNECT_POLL_SEC", "1"))
+# Engine updates buffered ahead of a slow client before the run is back-pressured
+STREAM_BUFFER_EVENTS = 256
+
+_STREAM_END = object()
+
+# Fire-and-forget tasks (run finalizers); the loop only holds tasks weakly
+_background_tasks: "set[asyncio.Task]" = set()
+
+
+def _spawn_background(coro: Awaitable[Any], label: str) -> asyncio.Task:
+    """Run ``coro`` detached, keeping it referenced until done and logging its failure"""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        _background_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.warning(f"{label} failed: {t.exception()}")
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def _watch_disconnect(is_disconnected: Callable[[], Awaitable[bool]]) -> None:
+    """Return once the client has gone away"""
+    while True:
+        try:
+            if await is_disconnected():
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(DISCONNECT_POLL_SEC)
+
+
+async def research_stream_generator(
+    request: ResearchRequest,
+    user_id: Optional[str] = None,
+    plan: Optional[str] = None,
+    on_finish: Optional[Callable[[Optional[Dict[str, Any]], str, str], Awaitable[None]]] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    on_outcome: Optional[Callable[[str], None]] = None,
+):
+    """Generate research streaming response
+
+    The run executes in its own task. If ``is_disconnected`` (e.g. Request.is_disconnected)
+    reports the client gone, that task is cancelled, which cancels the research
+    rounds, in-flight tool calls and the report LLM stream.
+
+    ``on_finish(usage, outcome, phase)`` is scheduled once the stream ends, with the
+    run's usage summary (partial for unfinished runs), the outcome
+    ("completed" | "failed" | "cancelled" | "rejected") and the phase reached
+    ("queued" | "research" | "report"), so billing can meter actual usage.
+    ``on_outcome(outcome)`` is called synchronously before the generator closes
+    (e.g. so a job has its outcome before it is marked finished).
+    """
+    t_received = time.perf_counter()
+    usage: Optional[Dict[str, Any]] = None
+    outcome = "cancelled"  # until the run completes or fails
+    phase = "queued"
+    cfg = Configuration()
+    # Attribute every upstream call of this run to the user/plan for admission priority
+    admission_token = set_request_context(user_id, plan)
+    ticket = get_admission().enqueue("research", user_id, plan)
+    watcher = asyncio.create_task(_watch_disconnect(is_disconnected)) if is_disconnected is not None else None
+    producer: Optional[asyncio.Task] = None
     try:
+        # Wait for a research slot, telling the client where it stands
+        last_position = None
+        deepwide = request.message.deepwide
+        report_model: Optional[str] = None
+        while not ticket.granted:
+            if watcher is not None and watcher.done():
+                logger.warning("Client disconnected while queued")
+                return
+            position = ticket.position()
+            if position != last_position:
+                # Expected wait: runs ahead of us, each freeing a slot after a typical run
+                if report_model is None:
+                    # Run history is keyed by the model the engine will actually use
+                    report_model = resolve_report_model(deepwide.deep, deepwide.wide, deepwide.model, deepwide.latency_goal)
+                runtime = get_run_history().estimate(deepwide.deep, deepwide.wide, report_model)["total_seconds"]
+                wait_eta = position * runtime / max(1, get_admission().gate("research").limit)
+                if deepwide.deadline_seconds and wait_eta >= deepwide.deadline_seconds:
+                    # Admission decision: don't hold a request whose deadline would pass in the queue
+                    outcome = "rejected"
+                    yield sse_event({'action': 'error', 'message': f'Server busy: estimated queue wait {wait_eta:.0f}s exceeds the {deepwide.deadline_seconds:.0f}s deadline'})
+                    return
+                yield sse_event({'action': 'queued', 'message': 'queued', 'position': position, 'eta_seconds': round(wait_eta, 1)})
+                last_position = position
+            await ticket.wait(timeout=min(ADMISSION_STATUS_INTERVAL_SEC, DISCONNECT_POLL_SEC))
+        phase = "research"
+        # Time spent queued counts against the request's deadline
+        deadline_seconds = request.message.deepwide.deadline_seconds
+        if deadline_seconds:
+            deadline_seconds = max(1.0, deadline_seconds - (time.perf_counter() - t_received))
         # Build message history
         history_messages = request.history or []
         user_messages = [msg.content for msg in history_messages if msg.role == "user"]
         user_messages.append(request.message.query)
         
-        # Create configuration
-        cfg = Configuration()
-        
-        print(f"\n🔍 Received research request: {request.message.query}")
-        print(f"📊 Deep: {request.message.deepwide.deep}, Wide: {request.message.deepwide.wide}")
+        logger.info(
+            "Received research request",
+            extra={"query": request.message.query[:200], "deep": request.message.deepwide.deep, "wide": request.message.deepwide.wide},
+        )
         
-        # Execute research and stream updates
-        async for update in run_deep_research_stream(
-            user_messages=user_messages,
-            cfg=cfg,
-            api_keys=None,
-            mcp_config=request.message.mcp,
-            deep_param=request.message.deepwide.deep,
-            wide_param=request.message.deepwide.wide,
-            selected_model=request.message.deepwide.model
-        ):
-            yield f"data: {json.dumps(update)}\n\n"
+        updates: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_EVENTS)
+
+        async def produce() -> None:
+            try:
+                async with aclosing(research_engine.run_stream(
+                    user_messages,
+                    cfg=cfg,
+                    api_keys=None,
+                    mcp_config=request.message.mcp,
+                    deep_param=request.message.deepwide.deep,
+                    wide_param=request.message.deepwide.wide,
+                    selected_model=request.message.deepwide.model,
+                    latency_goal=request.message.deepwide.latency_goal,
+                    stream_protocol=normalize_stream_protocol(request.stream_protocol),
+                    deadline_seconds=deadline_seconds,
+                )) as stream:
+                    async for update in stream:
+                        await updates.put(update)
+            except Exception as e:
+                await updates.put(e)
+            await updates.put(_STREAM_END)
+
+        # Execute research in its own task so a disconnect can cancel it even while
+        # this generator is suspended (e.g. the server stopped pulling after a failed write)
+        producer = asyncio.create_task(produce())
+        if watcher is not None:
+            watcher.add_done_callback(lambda _: producer.cancel())
+
+        while True:
+            if not updates.empty():
+                update = updates.get_nowait()
+            else:
+                getter = asyncio.ensure_future(updates.get())
+                await asyncio.wait({getter, watcher} if watcher is not None else {getter}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    logger.warning("Client disconnected; cancelling research run")
+                    break
+                update = getter.result()
+            if update is _STREAM_END:
+                break
+            if isinstance(update, Exception):
+                raise update
+            action = update.get("action")
+            if action == "generating":
+                phase = "report"
+            elif action == "complete":
+                outcome = "completed"
+            elif action == "usage":
+                usage = update.get("usage")
+            yield sse_event(update)
             
     except Exception as e:
+        outcome = "failed"
         error_msg = {'action': 'error', 'message': f'Research failed: {str(e)}'}
-        yield f"data: {json.dumps(error_msg)}\n\n"
+        yield sse_event(error_msg)
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if producer is not None and not producer.done():
+            producer.cancel()
+            await asyncio.wait({producer})
+        ticket.release()
+        reset_request_context(admission_token)
+        if usage is None and phase != "queued":
+            usage = cfg.usage_ledger.summary()
+        if on_outcome is not None:
+            on_outcome(outcome)
+        if on_finish is not None:
+            # Scheduled rather than awaited: the generator may be closing on disconnect
+            _spawn_background(on_finish(usage, outcome, phase), "Run finalizer")
+
+
+async def job_event_stream(job: ResearchJob, last_event_id: int = 0):
+    """SSE stream of a background job's numbered events after ``last_event_id``"""
+    yield sse_event({'action': 'job', 'job_id': job.job_id, 'last_event_id': last_event_id})
+    async for seq, frame in job.events(last_event_id):
+        yield f"id: {seq}\n{frame}"
+
+
+class _SSEResponse(StreamingResponse):
+    """StreamingResponse that closes its stream and calls ``on_done`` once the response is over.
+
+    Runs however the response ended: a client that went away mid-stream gets
+    the generator's finally run now rather than at garbage collection, and
+    ``on_done`` covers streams that were never iterated at all (their finally
+    never runs).
+    """
 
+    def __init__(self, *args, on_done: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_done = on_done
 
-@app.post("/api/research")
-async def research(request: ResearchRequest, req: Request):
-    """Execute deep research - streaming response"""
-    # Auth (JWT or API Key)
-    user_id, auth_method, api_key_rec = _resolve_user(dict(req.headers))
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            try:
+                if aclose is not None:
+                    await aclose()
+            finally:
+                if self.on_done is not None:
+                    self.on_done()
 
-    stream = research_stream_generator(request)
-    response = StreamingResponse(
+
+def _sse_response(stream, extra_headers: Optional[Dict[str, str]] = None, on_done: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    response = _SSEResponse(
         stream,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
-        }
+            **(extra_headers or {}),
+        },
+        on_done=on_done,
     )
+    response.background = None  # ensure streaming works; billing runs from the generator's on_finish
+    return response
 
-    # After stream completes, consume variable credits based on params
-    async def on_close():
+
+@app.post("/api/research")
+async def research(request: ResearchRequest, req: Request):
+    """Execute deep research - streaming response"""
+    # Auth (JWT or API Key)
+    user_id, auth_method, api_key_rec = await _resolve_user(dict(req.headers))
+    plan = await _get_user_plan(user_id)
+    # Body field wins over the header; older clients send neither and get the legacy format
+    requested_protocol = request.stream_protocol if request.stream_protocol is not None else req.headers.get("x-stream-protocol")
+    stream_protocol = normalize_stream_protocol(requested_protocol)
+    request.stream_protocol = stream_protocol
+
+    units = _compute_credits_from_params(request.message.deepwide.deep, request.message.deepwide.wide)
+    # Held from pre-flight until the run ends; the charge itself goes through the outbox
+    reservation: Optional[int] = None
+    rate_lease: Optional[RateLease] = None
+
+    def release_admission() -> None:
+        # Safe to call more than once: both releases are idempotent
+        get_credit_guard().release(user_id, reservation)
+        if rate_lease is not None:
+            rate_lease.release()
+
+    # After stream completes, consume variable credits based on params; actual usage is metered in meta
+    async def on_close(usage: Optional[Dict[str, Any]] = None, outcome: str = "completed", phase: str = "report"):
+        release_admission()
+        # Runs that never left the queue, or were abandoned before the report started, are not charged
+        if phase == "queued" or (outcome == "cancelled" and phase != "report"):
+            logger.info(f"Charge skipped: run {outcome} during {phase} phase")
+            return
         try:
             rid = request.request_id or f"{user_id}-{int(time.time()*1000)}"
-            deep_val = float(getattr(request.message.deepwide, "deep", 0.5))
-            wide_val = float(getattr(request.message.deepwide, "wide", 0.5))
-            model_val = getattr(request.message.deepwide, "model", None)
-            units = _compute_credits_from_params(deep_val, wide_val)
-            meta = {
-                "endpoint": "/api/research",
-                "version": "1.0.0",
-                "deep": deep_val,
-                "wide": wide_val,
-                "model": model_val,
-                "thread_id": getattr(request.message, "thread_id", None),
-                "auth": auth_method,
-                "api_key_prefix": (api_key_rec.get("prefix") if api_key_rec else None),
-            }
-            _consume_credits(user_id=user_id, units=units, request_id=rid, meta=meta)
-        except HTTPException as e:
-            # log and swallow to not break client
-            print(f"[consume_credits] HTTPException: {e.status_code} {e.detail}")
+            # Durable local write; the outbox flusher charges Supabase in the background
+            await _charge_run(user_id, request.message, rid, "/api/research", auth_method, api_key_rec, usage, outcome)
         except Exception as e:
-            print(f"[consume_credits] Error: {e}")
+            logger.warning(f"Charging run failed: {e}")
+
+    headers = {"X-Stream-Protocol": str(stream_protocol)}
+    registry = get_job_registry()
+    # Single-flight: a retried request_id attaches to the run already in flight (or just finished)
+    existing = registry.find(user_id, request.request_id)
+    if existing is not None:
+        logger.info(f"Duplicate request_id {request.request_id}; attaching to job {existing.job_id}")
+        return _sse_response(job_event_stream(existing), {**headers, "X-Job-Id": existing.job_id, "X-Deduplicated": "1"})
+
+    # The run is owned by a job, not this connection; background jobs also outlive their listeners.
+    # Claim the request_id before the first await, so a retry arriving during admission attaches to this job
+    job: Optional[ResearchJob] = None
+    if request.background or request.request_id:
+        job = registry.reserve(user_id, request_id=request.request_id, detached=request.background)
+
+    # Per-user / per-key rate and concurrency limits, then the credit pre-flight;
+    # both reject before any LLM/search spend
+    try:
+        rate_lease, reservation = await _admit_runs(user_id, plan, api_key_rec, units)
+    except BaseException as e:
+        if job is not None:
+            registry.reject(job, str(getattr(e, "detail", None) or "Request was not admitted"))
+        raise
 
-    response.background = None  # ensure streaming works; we'll await completion below
-    # FastAPI doesn't expose on_complete hook for streams; best-effort: schedule task
-    asyncio.create_task(on_close())
-    return response
+    try:
+        if job is not None:
+            def set_job_outcome(outcome: str) -> None:
+                # Set before the job is marked finished, so a retry never sees a finished job without one
+                job.outcome = outcome
+
+            registry.launch(
+                job,
+                research_stream_generator(request, user_id=user_id, plan=plan, on_finish=on_close, on_outcome=set_job_outcome),
+            )
+            return _sse_response(job_event_stream(job), {**headers, "X-Job-Id": job.job_id})
+
+        stream = research_stream_generator(request, user_id=user_id, plan=plan, on_finish=on_close, is_disconnected=req.is_disconnected)
+        # on_close releases when the generator finishes; this also covers a stream that never started
+        return _sse_response(stream, headers, on_done=release_admission)
+    except BaseException as e:
+        # No run took ownership of the admission (e.g. the job could not be started)
+        release_admission()
+        if job is not None and job.task is None:
+            registry.reject(job, str(getattr(e, "detail", None) or "Research could not be started"))
+        raise
+
+
+# Upper bounds for /api/research/batch
+RESEARCH_BATCH_MAX_QUERIES = int(os.getenv("RESEARCH_BATCH_MAX_QUERIES", "50"))
+RESEARCH_BATCH_CONCURRENCY = int(os.getenv("RESEARCH_BATCH_CONCURRENCY", "4"))
+
+
+async def _run_research_once(
+    message: ResearchMessage,
+    history: Optional[List[Message]],
+    user_id: str,
+    plan: str,
+    tool_result_cache: Optional[Dict[str, Any]] = None,
+    llm_response_cache: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Run one research request to completion (non-streaming), behind the research admission gate"""
+    t_received = time.perf_counter()
+    admission_token = set_request_context(user_id, plan)
+    ticket = get_admission().enqueue("research", user_id, plan)
+    try:
+        while not ticket.granted:
+            await ticket.wait(timeout=ADMISSION_STATUS_INTERVAL_SEC)
+        deadline_seconds = message.deepwide.deadline_seconds
+        if deadline_seconds:
+            deadline_seconds = max(1.0, deadline_seconds - (time.perf_counter() - t_received))
+        user_messages = [msg.content for msg in (history or []) if msg.role == "user"]
+        user_messages.append(message.query)
+        cfg = Configuration()
+        cfg.tool_result_cache = tool_result_cache
+        cfg.llm_response_cache = llm_response_cache
+        return await research_engine.run(
+            user_messages,
+            cfg=cfg,
+            api_keys=None,
+            mcp_config=message.mcp,
+            deep_param=message.deepwide.deep,
+            wide_param=message.deepwide.wide,
+            selected_model=message.deepwide.model,
+            latency_goal=message.deepwide.latency_goal,
+            deadline_seconds=deadline_seconds,
+        )
+    finally:
+        ticket.release()
+        reset_request_context(admission_token)
+
+
+@app.post("/api/research/sync", response_model=ResearchResponse)
+async def research_sync(request: ResearchRequest, req: Request):
+    """Execute deep research and return the final report, sources and usage as JSON"""
+    user_id, auth_method, api_key_rec = await _resolve_user(dict(req.headers))
+    plan = await _get_user_plan(user_id)
+    message = request.message
+    rate_lease, reservation = await _admit_runs(user_id, plan, api_key_rec, _compute_credits_from_params(message.deepwide.deep, message.deepwide.wide))
+    rid = request.request_id or f"{user_id}-{int(time.time()*1000)}"
+    try:
+        state = await _run_research_once(message, request.history, user_id, plan)
+    except Exception as e:
+        await _charge_run(user_id, message, rid, "/api/research/sync", auth_method, api_key_rec, None, "failed")
+        logger.warning(f"Sync research run failed: {e}")
+        return ResearchResponse(response="", success=False, error=f"Research failed: {str(e)}")
+    finally:
+        get_credit_guard().release(user_id, reservation)
+        rate_lease.release()
+    await _charge_run(user_id, message, rid, "/api/research/sync", auth_method, api_key_rec, state.get("usage"), "completed")
+    return ResearchResponse(
+        response=state.get("final_report", ""),
+        notes=state.get("notes", []),
+        sources=(state.get("contextjson") or {}).get("sources", []),
+        usage=state.get("usage"),
+    )
+
+
+@app.post("/api/research/batch", response_model=ResearchBatchResponse)
+async def research_batch(request: ResearchBatchRequest, req: Request):
+    """Run many queries with bounded concurrency; identical tool and LLM calls are shared and sources deduplicated"""
+    user_id, auth_method, api_key_rec = await _resolve_user(dict(req.headers))
+    plan = await _get_user_plan(user_id)
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries")
+    if len(request.queries) > RESEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Too many queries (max {RESEARCH_BATCH_MAX_QUERIES})")
+    units = sum(_compute_credits_from_params(q.deepwide.deep, q.deepwide.wide) for q in request.queries)
+    # The whole batch counts as one run against the rate limit and reserves all its credits up front
+    rate_lease, reservation = await _admit_runs(user_id, plan, api_key_rec, units)
+    # Key scopes may lower the plan's concurrency but never raise it
+    plan_limit = limit_for(plan, None, get_rate_limiter().limits)
+    key_limit = limit_for(plan, api_key_rec.get("scopes") if api_key_rec else None, get_rate_limiter().limits)
+    concurrency = max(1, min(request.concurrency or RESEARCH_BATCH_CONCURRENCY, RESEARCH_BATCH_CONCURRENCY, plan_limit.concurrent, key_limit.concurrent))
+    batch_id = request.request_id or f"{user_id}-batch-{int(time.time()*1000)}"
+    semaphore = asyncio.Semaphore(concurrency)
+    tool_result_cache: Dict[str, Any] = {}
+    llm_response_cache: Dict[str, Any] = {}
+
+    async def run_one(index: int, message: ResearchMessage):
+        async with semaphore:
+            try:
+                state = await _run_research_once(message, None, user_id, plan, tool_result_cache=tool_result_cache, llm_response_cache=llm_response_cache)
+            except Exception as e:
+                await _charge_run(user_id, message, f"{batch_id}-{index}", "/api/research/batch", auth_method, api_key_rec, None, "failed")
+                return e
+            await _charge_run(user_id, message, f"{batch_id}-{index}", "/api/research/batch", auth_method, api_key_rec, state.get("usage"), "completed")
+            return state
+
+    logger.info(f"Research batch: {len(request.queries)} queries, concurrency {concurrency}")
+    try:
+        outcomes = await asyncio.gather(*(run_one(i, q) for i, q in enumerate(request.queries)))
+    finally:
+        get_credit_guard().release(user_id, reservation)
+        rate_lease.release()
+
+    sources, source_ids = merge_sources([
+        (o.get("contextjson") or {}).get("sources", []) if isinstance(o, dict) else [] for o in outcomes
+    ])
+    results: List[ResearchBatchItem] = []
+    for i, (message, outcome) in enumerate(zip(request.queries, outcomes)):
+        if isinstance(outcome, Exception):
+            results.append(ResearchBatchItem(index=i, query=message.query, response="", success=False, error=f"Research failed: {str(outcome)}"))
+        else:
+            results.append(ResearchBatchItem(
+                index=i,
+                query=message.query,
+                response=outcome.get("final_report", ""),
+                notes=outcome.get("notes", []),
+                usage=outcome.get("usage"),
+                source_ids=source_ids[i],
+            ))
+    succeeded = sum(1 for r in results if r.success)
+    return ResearchBatchResponse(results=results, sources=sources, succeeded=succeeded, failed=len(results) - succeeded)
+
+
+def _get_owned_job(job_id: str, user_id: str) -> ResearchJob:
+    job = get_job_registry().get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/research/{job_id}")
+async def research_job_status(job_id: str, req: Request):
+    """Status of a background research job"""
+    user_id, _, _ = await _resolve_user(dict(req.headers))
+    return _get_owned_job(job_id, user_id).status()
+
+
+@app.get("/api/research/{job_id}/events")
+async def research_job_events(job_id: str, req: Request, last_event_id: Optional[int] = None):
+    """Resume a background job's event stream after Last-Event-ID (header or query)"""
+    user_id, _, _ = await _resolve_user(dict(req.headers))
+    job = _get_owned_job(job_id, user_id)
+    after = last_event_id
+    if after is None:
+        try:
+            after = int(req.headers.get("last-event-id") or 0)
+        except ValueError:
+            after = 0
+    return _sse_response(job_event_stream(job, after), {"X-Job-Id": job.job_id})
 
 
 @app.get("/api/credits/balance")
 async def get_balance(req: Request):
-    user_id, _, _ = _resolve_user(dict(req.headers))
-    balance = _get_credit_balance(user_id)
+    user_id, _, _ = await _resolve_user(dict(req.headers))
+    balance = await _get_credit_balance(user_id)
+    get_credit_guard().store_balance(user_id, balance)
     return {"user_id": user_id, "balance": balance}
 
 
@@ -805,7 +1369,7 @@ class ListApiKeysResponse(BaseModel):
 async def create_api_key(body: CreateApiKeyRequest, req: Request):
     # Only JWT-authenticated users can create keys
     try:
-        user_id = _verify_supabase_jwt(req.headers.get("Authorization"))
+        user_id = await _verify_supabase_jwt(req.headers.get("Authorization"))
         logger.info(f"Creating API key for user: {user_id}")
     except Exception as e:
         logger.error(f"JWT verification failed: {e}")
@@ -836,8 +1400,8 @@ async def create_api_key(body: CreateApiKeyRequest, req: Request):
     }
     logger.info(f"Inserting API key with payload keys: {insert_payload.keys()}")
     try:
-        resp = _supabase_rest_post("/rest/v1/api_keys", insert_payload)
-        if not resp.ok:
+        resp = await _supabase_rest_post("/rest/v1/api_keys", insert_payload)
+        if not resp.is_success:
             logger.error(f"Supabase POST failed: {resp.status_code} - {resp.text}")
             raise HTTPException(status_code=500, detail=f"Failed to create API key: {resp.text}")
         rec = resp.json()[0]
@@ -858,7 +1422,7 @@ async def create_api_key(body: CreateApiKeyRequest, req: Request):
 async def list_api_keys(req: Request):
     # JWT required for listing
     try:
-        user_id = _verify_supabase_jwt(req.headers.get("Authorization"))
+        user_id = await _verify_supabase_jwt(req.headers.get("Authorization"))
         logger.info(f"Listing API keys for user: {user_id}")
     except Exception as e:
         logger.error(f"JWT verification failed: {e}")
@@ -869,14 +1433,14 @@ async def list_api_keys(req: Request):
         usage_by_prefix: Dict[str, int] = {}
         try:
             # Read from DB view to avoid PostgREST group-by incompatibilities
-            usage_resp = _supabase_rest_get(
+            usage_resp = await _supabase_rest_get(
                 "/rest/v1/credit_usage_by_prefix",
                 params={
                     "user_id": f"eq.{user_id}",
                     "select": "api_key_prefix,used",
                 },
             )
-            if usage_resp.ok:
+            if usage_resp.is_success:
                 for row in usage_resp.json():
                     prefix = row.get("api_key_prefix")
                     if not prefix:
@@ -892,7 +1456,7 @@ async def list_api_keys(req: Request):
         except Exception as e:
             logger.warning(f"Usage aggregation failed: {e}")
 
-        resp = _supabase_rest_get(
+        resp = await _supabase_rest_get(
             "/rest/v1/api_keys",
             params={
                 "user_id": f"eq.{user_id}",
@@ -901,7 +1465,7 @@ async def list_api_keys(req: Request):
                 "order": "created_at.desc",
             },
         )
-        if not resp.ok:
+        if not resp.is_success:
             logger.error(f"Supabase GET failed: {resp.status_code} - {resp.text}")
             raise HTTPException(status_code=500, detail=f"Failed to list API keys: {resp.text}")
         items = []
@@ -929,14 +1493,14 @@ async def list_api_keys(req: Request):
 async def revoke_api_key(key_id: str, req: Request):
     # JWT required for revocation
     try:
-        user_id = _verify_supabase_jwt(req.headers.get("Authorization"))
+        user_id = await _verify_supabase_jwt(req.headers.get("Authorization"))
         logger.info(f"Revoking API key {key_id} for user: {user_id}")
     except Exception as e:
         logger.error(f"JWT verification failed: {e}")
         raise
     
     # Ensure the key belongs to the user
-    check = _supabase_rest_get(
+    check = await _supabase_rest_get(
         "/rest/v1/api_keys",
         params={
             "id": f"eq.{key_id}",
@@ -944,7 +1508,7 @@ async def revoke_api_key(key_id: str, req: Request):
             "select": "id",
         },
     )
-    if not check.ok:
+    if not check.is_success:
         logger.error(f"Failed to fetch API key for verification: {check.status_code} - {check.text}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch API key: {check.text}")
     arr = check.json()
@@ -954,10 +1518,11 @@ async def revoke_api_key(key_id: str, req: Request):
     
     # Revoke by setting revoked_at
     now_iso = datetime.now(timezone.utc).isoformat()
-    resp = _supabase_rest_patch(f"/rest/v1/api_keys?id=eq.{key_id}", {"revoked_at": now_iso})
-    if not resp.ok:
+    resp = await _supabase_rest_patch(f"/rest/v1/api_keys?id=eq.{key_id}", {"revoked_at": now_iso})
+    if not resp.is_success:
         logger.error(f"Failed to revoke API key: {resp.status_code} - {resp.text}")
         raise HTTPException(status_code=500, detail=f"Failed to revoke API key: {resp.text}")
+    get_api_key_cache().invalidate(key_id=key_id)
     
     logger.info(f"API key {key_id} revoked successfully")
     return {"id": key_id, "revoked_at": now_iso}
@@ -12,8 +12,11 @@ Features:
 from __future__ import annotations
 
 import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 
 # Load .env file
@@ -27,6 +30,27 @@ try:
 except ImportError:
     pass  # If python-dotenv is not installed, continue using system environment variables
 
+# Support both direct execution and module import - try absolute and relative imports
+try:
+    from .admission import get_admission
+    from . import serializer
+except ImportError:
+    try:
+        from deep_wide_research.admission import get_admission
+        from deep_wide_research import serializer
+    except ImportError:
+        from admission import get_admission
+        import serializer
+
+logger = logging.getLogger(__name__)
+
+
+MCP_HTTP_TIMEOUT_SEC = float(os.getenv("MCP_HTTP_TIMEOUT_SEC", "30"))
+# Pooled HTTP connections kept by an engine-owned MCPSessionPool
+MCP_HTTP_POOL_LIMIT = int(os.getenv("MCP_HTTP_POOL_LIMIT", "100"))
+# How long an engine caches each server's tools/list response
+MCP_TOOLS_CACHE_TTL_SEC = float(os.getenv("MCP_TOOLS_CACHE_TTL_SEC", "300"))
+
 
 # ============================================================================
 # MCP Server Configuration System
@@ -103,7 +127,7 @@ class MCPRegistry:
                 description="Tavily search MCP server - powerful web search"
             ))
         else:
-            print("⚠️  Tavily MCP server skipped: TAVILY_API_KEY not found")
+            logger.warning("Tavily MCP server skipped: TAVILY_API_KEY not found")
         
         # Exa MCP Server - Always use HTTP
         exa_api_key = os.getenv("EXA_API_KEY")
@@ -115,7 +139,7 @@ class MCPRegistry:
                 description="Exa search MCP server - AI-powered web search"
             ))
         else:
-            print("⚠️  Exa MCP server skipped: EXA_API_KEY not found")
+            logger.warning("Exa MCP server skipped: EXA_API_KEY not found")
     
     def register(self, config: MCPServerConfig, silent: bool = False) -> None:
         """Register an MCP server
@@ -125,10 +149,10 @@ class MCPRegistry:
             silent: Silent mode (do not print logs)
         """
         if config.name in self._servers and not silent:
-            print(f"⚠️  Overwriting existing MCP server: {config.name}")
+            logger.warning(f"Overwriting existing MCP server: {config.name}")
         self._servers[config.name] = config
         if not silent:
-            print(f"✅ Registered MCP server: {config.name}")
+            logger.info(f"Registered MCP server: {config.name}")
     
     def unregister(self, name: str) -> bool:
         """Unregister an MCP server
@@ -141,7 +165,7 @@ class MCPRegistry:
         """
         if name in self._servers:
             del self._servers[name]
-            print(f"✅ Unregistered MCP server: {name}")
+            logger.info(f"Unregistered MCP server: {name}")
             return True
         return False
     
@@ -164,18 +188,19 @@ class MCPRegistry:
         """List all registered server configurations"""
         return list(self._servers.values())
     
-    async def create_client(self, name: str) -> Optional["MCPClient"]:
+    async def create_client(self, name: str, lease: Optional["MCPClientLease"] = None) -> Optional["MCPClient"]:
         """Create and connect an MCP client based on registered configuration
         
         Args:
             name: Server name
+            lease: Request-scoped lease that owns the client (default: registry-wide tracking)
             
         Returns:
             Connected MCPClient instance, or None if server not found
         """
         config = self.get(name)
         if not config:
-            print(f"❌ MCP server '{name}' not found in registry")
+            logger.warning(f"MCP server '{name}' not found in registry")
             return None
         
         if config.transport_type == "stdio":
@@ -189,7 +214,7 @@ class MCPRegistry:
                 server_url=config.server_url
             )
         else:
-            print(f"❌ Unknown transport type: {config.transport_type}")
+            logger.warning(f"Unknown transport type: {config.transport_type}")
             return None
         
         # Tag client with server name for routing
@@ -199,11 +224,16 @@ class MCPRegistry:
             pass
 
         await client.connect()
-        # Record active client for unified shutdown
-        self._active_clients.append(client)
+        if lease is not None:
+            # Owned by the lease; reuse its pooled HTTP session
+            client._shared_http = lease.http_session
+            lease.clients.append(client)
+        else:
+            # Record active client for unified shutdown
+            self._active_clients.append(client)
         return client
     
-    async def collect_tools(self, config: Dict[str, List[str]]) -> tuple[List[Dict[str, Any]], List["MCPClient"]]:
+    async def collect_tools(self, config: Dict[str, List[str]], lease: Optional["MCPClientLease"] = None) -> tuple[List[Dict[str, Any]], List["MCPClient"]]:
         """Collect tools from multiple MCP servers based on configuration
         
         Args:
@@ -212,9 +242,11 @@ class MCPRegistry:
                     "tavily": ["tavily-search", "tavily-extract"],
                     "exa": ["web_search_exa"]
                 }
+            lease: Optional request-scoped lease; its clients close with the lease and
+                tools/list responses may come from its pool's cache
         
         Returns:
-            (tool list, client list) - caller needs to manually close clients
+            (tool list, client list) - without a lease the caller needs to manually close clients
         """
         all_tools = []
         clients = []
@@ -223,17 +255,27 @@ class MCPRegistry:
             if server_name not in self._servers:
                 continue
             
-            client = await self.create_client(server_name)
+            client = await self.create_client(server_name, lease=lease)
             if not client:
                 continue
             
             clients.append(client)
             
-            selected = await client.select_tools(tool_names)
-            all_tools.extend(selected)
+            cached = lease.cached_tools(server_name) if lease is not None else None
+            if cached is None:
+                server_tools = await client.list_tools()
+                if lease is not None:
+                    lease.store_tools(server_name, server_tools)
+            else:
+                server_tools = cached
+            all_tools.extend(tool for tool in server_tools if tool["name"] in tool_names)
         
         return all_tools, clients
 
+    def lease(self) -> "MCPClientLease":
+        """Request-scoped lease without pooled resources (per-call HTTP sessions, no tools cache)"""
+        return MCPClientLease(self)
+
     async def close_all_clients(self) -> None:
         """Close all active clients created and tracked by this registry"""
         if not self._active_clients:
@@ -249,6 +291,83 @@ class MCPRegistry:
                 pass
 
 
+class MCPClientLease:
+    """MCP clients created for one research run; closing the lease closes only those clients"""
+
+    def __init__(self, registry: MCPRegistry, http_session: Any = None, tools_cache: Optional[Dict[str, Tuple[float, List[Dict[str, Any]]]]] = None):
+        self.registry = registry
+        self.http_session = http_session
+        self.clients: List["MCPClient"] = []
+        self._tools_cache = tools_cache
+
+    def cached_tools(self, server_name: str) -> Optional[List[Dict[str, Any]]]:
+        if self._tools_cache is None:
+            return None
+        entry = self._tools_cache.get(server_name)
+        if entry is None or time.monotonic() - entry[0] > MCP_TOOLS_CACHE_TTL_SEC:
+            return None
+        return entry[1]
+
+    def store_tools(self, server_name: str, tools: List[Dict[str, Any]]) -> None:
+        if self._tools_cache is not None:
+            self._tools_cache[server_name] = (time.monotonic(), tools)
+
+    async def collect_tools(self, config: Dict[str, List[str]]) -> tuple[List[Dict[str, Any]], List["MCPClient"]]:
+        return await self.registry.collect_tools(config, lease=self)
+
+    async def aclose(self) -> None:
+        clients = list(self.clients)
+        self.clients.clear()
+        for client in clients:
+            try:
+                await client.close()
+            except Exception:
+                # Avoid affecting main flow due to close issues
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+class MCPSessionPool:
+    """Long-lived MCP resources shared by many runs: a pooled aiohttp session and a tools/list cache"""
+
+    def __init__(self, registry: Optional[MCPRegistry] = None):
+        self.registry = registry
+        self._http = None
+        self._tools_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self.leases_total = 0
+
+    async def start(self) -> None:
+        if self._http is not None and not self._http.closed:
+            return
+        import aiohttp
+        import ssl
+
+        connector = aiohttp.TCPConnector(ssl=ssl.create_default_context(), limit=MCP_HTTP_POOL_LIMIT, keepalive_timeout=30)
+        self._http = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=MCP_HTTP_TIMEOUT_SEC, connect=10))
+
+    def lease(self) -> MCPClientLease:
+        self.leases_total += 1
+        return MCPClientLease(self.registry or get_registry(), http_session=self._http, tools_cache=self._tools_cache)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        self._tools_cache.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "http_pool_open": self._http is not None and not self._http.closed,
+            "cached_servers": sorted(self._tools_cache),
+            "leases_total": self.leases_total,
+        }
+
+
 # Global registry instance
 _global_registry = MCPRegistry()
 
@@ -319,7 +438,7 @@ class MCPClient:
                     env=kwargs.get("env")
                 )
             except ImportError:
-                print("⚠️ MCP SDK not installed. Run: pip install mcp")
+                logger.warning("MCP SDK not installed. Run: pip install mcp")
                 self._stdio_params = None
         elif transport_type == "http":
             self._server_url = kwargs.get("server_url")
@@ -372,14 +491,40 @@ class MCPClient:
             self._connected = True
             
         except ImportError as e:
-            print(f"❌ MCP SDK not installed: {e}")
-            print("Run: pip install mcp")
+            logger.warning(f"MCP SDK not installed ({e}). Run: pip install mcp")
             raise
         except Exception as e:
-            print(f"❌ Failed to connect to MCP server: {e}")
+            logger.warning(f"Failed to connect to MCP server: {e}")
             raise
     
+    @asynccontextmanager
+    async def _http_session(self):
+        """Yield an aiohttp session: the shared pooled one if set, otherwise a fresh one for this call"""
+        shared = getattr(self, "_shared_http", None)
+        if shared is not None and not shared.closed:
+            yield shared
+            return
+        import aiohttp
+        import ssl
+        
+        # Create SSL context with proper certificate verification
+        ssl_context = ssl.create_default_context()
+        # Create connector with SSL and timeout settings
+        connector = aiohttp.TCPConnector(ssl=ssl_context)
+        timeout = aiohttp.ClientTimeout(total=MCP_HTTP_TIMEOUT_SEC, connect=10)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http_sess:
+            yield http_sess
+    
+    def _admission_key(self) -> str:
+        """Admission-control upstream name for this client (one gate per MCP server)"""
+        return f"mcp:{getattr(self, '_server_name', None) or self.transport_type}"
+    
     async def list_tools(self) -> List[Dict[str, Any]]:
+        """Get the list of tools provided by MCP server (waits for an admission slot)"""
+        async with get_admission().slot(self._admission_key()):
+            return await self._list_tools_impl()
+    
+    async def _list_tools_impl(self) -> List[Dict[str, Any]]:
         """Get the list of tools provided by MCP server
         
         Returns:
@@ -419,20 +564,11 @@ class MCPClient:
                         return tools
                 
             elif self.transport_type == "http":
-                import aiohttp
-                import ssl
-                
-                # Create SSL context with proper certificate verification
-                ssl_context = ssl.create_default_context()
-                
                 # Use system proxy if available (for local development with proxy)
                 proxy = os.getenv("https_proxy") or os.getenv("HTTPS_PROXY") or os.getenv("http_proxy") or os.getenv("HTTP_PROXY")
                 
-                # Create connector with SSL and timeout settings
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                timeout = aiohttp.ClientTimeout(total=30, connect=10)
-                
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http_sess:
+                # Pooled session when leased from an engine, else a per-call session
+                async with self._http_session() as http_sess:
                     # MCP uses JSON-RPC 2.0 protocol
                     payload = {
                         "jsonrpc": "2.0",
@@ -455,11 +591,10 @@ class MCPClient:
                             # Remote MCP returns SSE format, needs parsing
                             text = await resp.text()
                             # SSE format: "event: message\ndata: {...}\n\n"
-                            import json as json_module
                             for line in text.split('\n'):
                                 if line.startswith('data: '):
                                     json_str = line[6:]  # Remove "data: " prefix
-                                    result = json_module.loads(json_str)
+                                    result = serializer.loads(json_str)
                                     # JSON-RPC response format: {"result": {"tools": [...]}}
                                     tools_data = result.get("result", {}).get("tools", [])
                                     return [{"name": t.get("name"), "description": t.get("description", ""), "inputSchema": t.get("inputSchema", {})} for t in tools_data]
@@ -468,7 +603,7 @@ class MCPClient:
                             raise RuntimeError(f"HTTP request failed: {resp.status}")
             
         except Exception as e:
-            print(f"❌ Failed to list tools: {e}")
+            logger.warning(f"Failed to list tools: {e}")
             raise
     
     async def select_tools(self, tool_names: List[str]) -> List[Dict[str, Any]]:
@@ -487,12 +622,18 @@ class MCPClient:
                 selected.append(tool)
         return selected
     
-    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> Any:
+        """Call a tool on MCP server (waits for an admission slot)"""
+        async with get_admission().slot(self._admission_key()):
+            return await self._call_tool_impl(tool_name, arguments, stats)
+    
+    async def _call_tool_impl(self, tool_name: str, arguments: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> Any:
         """Call a tool on MCP server
         
         Args:
             tool_name: Tool name
             arguments: Tool arguments
+            stats: If given, receives ``payload_bytes`` (size of the JSON response) for HTTP servers
         
         Returns:
             Tool execution result
@@ -527,20 +668,11 @@ class MCPClient:
                             return {"result": str(response)}
                 
             elif self.transport_type == "http":
-                import aiohttp
-                import ssl
-                
-                # Create SSL context with proper certificate verification
-                ssl_context = ssl.create_default_context()
-                
                 # Use system proxy if available (for local development with proxy)
                 proxy = os.getenv("https_proxy") or os.getenv("HTTPS_PROXY") or os.getenv("http_proxy") or os.getenv("HTTP_PROXY")
                 
-                # Create connector with SSL and timeout settings
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                timeout = aiohttp.ClientTimeout(total=30, connect=10)
-                
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http_sess:
+                # Pooled session when leased from an engine, else a per-call session
+                async with self._http_session() as http_sess:
                     # MCP uses JSON-RPC 2.0 protocol to call tools
                     payload = {
                         "jsonrpc": "2.0",
@@ -566,11 +698,12 @@ class MCPClient:
                             # Remote MCP returns SSE format, needs parsing
                             text = await resp.text()
                             # SSE format: "event: message\ndata: {...}\n\n"
-                            import json as json_module
                             for line in text.split('\n'):
                                 if line.startswith('data: '):
                                     json_str = line[6:]  # Remove "data: " prefix
-                                    result = json_module.loads(json_str)
+                                    result = serializer.loads(json_str)
+                                    if stats is not None:
+                                        stats["payload_bytes"] = len(json_str.encode("utf-8"))
                                     # JSON-RPC response: {"result": {"content": [...]}}
                                     return result.get("result", {})
                             raise RuntimeError("No valid data in SSE response")
@@ -578,7 +711,7 @@ class MCPClient:
                             raise RuntimeError(f"HTTP request failed: {resp.status}")
             
         except Exception as e:
-            print(f"❌ Failed to call tool '{tool_name}': {e}")
+            logger.warning(f"Failed to call tool '{tool_name}': {e}")
             raise
     
     async def close(self) -> None:
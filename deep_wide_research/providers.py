@@ -1,10 +1,23 @@
-"""Simplified OpenRouter client - retains necessary tool invocation functionality"""
+"""LLM provider client - OpenRouter plus optional direct provider adapters
+
+Model ids use the OpenRouter form ``<vendor>/<model>``. When the vendor has a
+direct adapter (OpenAI, Anthropic, Google Gemini) and its API key is configured,
+requests go straight to the vendor; otherwise they are routed via OpenRouter.
+Every adapter implements the same contract: ``complete`` returns a
+``ChatResponse`` with normalized ``usage``, ``stream`` yields text chunks and
+reports normalized usage through ``on_usage`` once the stream ends.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+from contextlib import aclosing
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 try:
     from openai import AsyncOpenAI
@@ -17,11 +30,11 @@ _ENV_DEBUG = False  # Set to True to see debug information
 try:
     from dotenv import load_dotenv
     from pathlib import Path
-    
+
     # Explicitly specify .env file path (in the current file directory)
     env_path = Path(__file__).parent / ".env"
     loaded = load_dotenv(dotenv_path=env_path)
-    
+
     if _ENV_DEBUG:
         print(f"[DEBUG] .env file path: {env_path}")
         print(f"[DEBUG] .env file exists: {env_path.exists()}")
@@ -33,13 +46,103 @@ except ImportError:
     pass  # If python-dotenv is not installed, continue using system environment variables
 
 
+# Support both direct execution and module import - try absolute and relative imports
+try:
+    from .admission import get_admission
+except ImportError:
+    try:
+        from deep_wide_research.admission import get_admission
+    except ImportError:
+        from admission import get_admission
+
+logger = logging.getLogger(__name__)
+
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# "auto": use a direct adapter when its key is configured; "openrouter": always proxy
+PROVIDER_ROUTING = os.getenv("PROVIDER_ROUTING", "auto").strip().lower()
+# Retry through OpenRouter when a direct adapter fails before producing output
+DIRECT_FALLBACK_TO_OPENROUTER = os.getenv("DIRECT_FALLBACK_TO_OPENROUTER", "1") not in ("0", "false", "False")
+# Optional JSON mapping of OpenRouter model ids to vendor-native ids,
+# e.g. {"anthropic/claude-3.5-sonnet": "claude-3-5-sonnet-latest"}
+DIRECT_MODEL_ALIASES_JSON = os.getenv("DIRECT_MODEL_ALIASES", "{}")
+
+
+UsageCallback = Callable[[Dict[str, Any]], None]
+
+
+class ProviderClientPool:
+    """Reusable SDK clients (and their HTTP connection pools), keyed by adapter and API key.
+
+    Owned by a long-lived engine and made current with ``use_client_pool``;
+    without a current pool every call builds a fresh client.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], Any] = {}
+
+    def get(self, name: str, api_key: str, factory: Callable[[], Any]) -> Any:
+        key = (name, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = factory()
+            self._clients[key] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                # Async SDK clients close with close(); google-genai's AsyncClient with aclose()
+                close = getattr(client, "aclose", None) or client.close
+                await close()
+            except Exception:
+                pass
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"clients": len(self._clients), "adapters": sorted({name for name, _ in self._clients})}
+
+
+_client_pool: ContextVar[Optional[ProviderClientPool]] = ContextVar("dwr_provider_client_pool", default=None)
+
+
+def use_client_pool(pool: Optional[ProviderClientPool]):
+    """Make ``pool`` current for LLM calls in this context; returns a reset token"""
+    return _client_pool.set(pool)
+
+
+def reset_client_pool(token) -> None:
+    try:
+        _client_pool.reset(token)
+    except Exception:
+        pass
 
 
 class ChatResponse:
     """Simple response wrapper"""
-    def __init__(self, content: str, raw: Any = None):
+    def __init__(self, content: str, raw: Any = None, usage: Optional[Dict[str, Any]] = None, provider: Optional[str] = None):
         self.content = content
         self.raw = raw
+        # Normalized usage: prompt_tokens, completion_tokens, cached_tokens, total_tokens (+ cost if reported)
+        self.usage = usage or _empty_usage()
+        # Adapter that served the request ("openrouter", "openai", "anthropic", "gemini")
+        self.provider = provider
+
+
+def _empty_usage() -> Dict[str, Any]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "total_tokens": 0}
+
+
+def _make_usage(prompt: Any = 0, completion: Any = 0, cached: Any = 0) -> Dict[str, Any]:
+    def _int(v: Any) -> int:
+        try:
+            return int(v or 0)
+        except Exception:
+            return 0
+    p, c, k = _int(prompt), _int(completion), _int(cached)
+    return {"prompt_tokens": p, "completion_tokens": c, "cached_tokens": k, "total_tokens": p + c}
 
 
 def _get_api_key(api_keys: Optional[dict] = None) -> str:
@@ -50,88 +153,476 @@ def _get_api_key(api_keys: Optional[dict] = None) -> str:
     return api_key
 
 
+def _lookup_key(names: Tuple[str, ...], api_keys: Optional[dict] = None) -> Optional[str]:
+    for name in names:
+        val = (api_keys or {}).get(name) or os.getenv(name)
+        if val:
+            return val
+    return None
+
+
 def _fix_model_id(model: str) -> str:
     """Fix model name format: 'openai:gpt-4' -> 'openai/gpt-4'"""
     return model if "/" in model else model.replace(":", "/", 1)
 
 
+def _load_model_aliases() -> Dict[str, str]:
+    try:
+        data = json.loads(DIRECT_MODEL_ALIASES_JSON or "{}")
+        return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+_MODEL_ALIASES = _load_model_aliases()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# ============================================================================
+# Provider adapters
+# ============================================================================
+
+class ProviderAdapter:
+    """Base adapter - one upstream API behind the chat_complete contract"""
+
+    name = "base"
+    # Upper bound on output tokens accepted by the upstream (None = pass through)
+    max_output_tokens: Optional[int] = None
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def native_model_id(self, model: str) -> str:
+        return model
+
+    def _new_client(self) -> Any:
+        raise NotImplementedError
+
+    def _client(self) -> Any:
+        pool = _client_pool.get()
+        if pool is None:
+            return self._new_client()
+        return pool.get(self.name, self.api_key, self._new_client)
+
+    def _cap_tokens(self, max_tokens: int) -> int:
+        if self.max_output_tokens and max_tokens > self.max_output_tokens:
+            return self.max_output_tokens
+        return max_tokens
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, **opts: Any) -> ChatResponse:
+        raise NotImplementedError
+
+    def stream(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, on_usage: Optional[UsageCallback] = None, **opts: Any) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+
+class _OpenAICompatibleAdapter(ProviderAdapter):
+    """Adapter for OpenAI-compatible chat completion APIs"""
+
+    base_url: Optional[str] = None
+
+    def _new_client(self) -> AsyncOpenAI:
+        if self.base_url:
+            return AsyncOpenAI(base_url=self.base_url, api_key=self.api_key)
+        return AsyncOpenAI(api_key=self.api_key)
+
+    def _request_kwargs(self, max_tokens: int, **opts: Any) -> Dict[str, Any]:
+        return {"max_tokens": self._cap_tokens(max_tokens)}
+
+    @staticmethod
+    def _usage_from(obj: Any) -> Dict[str, Any]:
+        usage = getattr(obj, "usage", None)
+        if usage is None:
+            return _empty_usage()
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+        out = _make_usage(getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0), cached)
+        # OpenRouter usage accounting reports the charged cost (USD credits)
+        cost = getattr(usage, "cost", None)
+        if cost is not None:
+            try:
+                out["cost"] = float(cost)
+            except Exception:
+                pass
+        return out
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, **opts: Any) -> ChatResponse:
+        resp = await self._client().chat.completions.create(
+            model=self.native_model_id(model),
+            messages=messages,
+            **self._request_kwargs(max_tokens, **opts),
+        )
+        # Be defensive: choices/message may be missing in rare cases
+        content_text = ""
+        try:
+            choices = getattr(resp, "choices", None)
+            if isinstance(choices, list) and len(choices) > 0:
+                message = getattr(choices[0], "message", None)
+                if message is not None:
+                    content_text = getattr(message, "content", "") or ""
+        except Exception:
+            content_text = ""
+        return ChatResponse(content=content_text, raw=resp, usage=self._usage_from(resp), provider=self.name)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, on_usage: Optional[UsageCallback] = None, **opts: Any) -> AsyncIterator[str]:
+        stream = await self._client().chat.completions.create(
+            model=self.native_model_id(model),
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._request_kwargs(max_tokens, **opts),
+        )
+        usage = _empty_usage()
+        upstream: Optional[str] = None
+        # Closing the stream drops the HTTP response if the consumer goes away early
+        async with stream:
+            async for chunk in stream:
+                # Guard against empty/irregular frames (e.g., heartbeats, role-only deltas)
+                try:
+                    if upstream is None:
+                        # OpenRouter names the upstream provider that served the request
+                        upstream = getattr(chunk, "provider", None)
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = self._usage_from(chunk)
+                    choices = getattr(chunk, "choices", None)
+                    if not (isinstance(choices, list) and len(choices) > 0):
+                        continue
+                    delta = getattr(choices[0], "delta", None)
+                    if delta is None:
+                        continue
+                    piece = getattr(delta, "content", None)
+                    if piece:
+                        yield piece
+                except Exception:
+                    # Skip malformed frames without failing the whole stream
+                    continue
+        if on_usage is not None:
+            usage["provider"] = self.name
+            if upstream:
+                usage["upstream"] = str(upstream)
+            on_usage(usage)
+
+
+class OpenRouterAdapter(_OpenAICompatibleAdapter):
+    """Default route: any model id via the OpenRouter proxy"""
+
+    name = "openrouter"
+    base_url = OPENROUTER_BASE_URL
+
+    def native_model_id(self, model: str) -> str:
+        return _fix_model_id(model)
+
+    def _request_kwargs(self, max_tokens: int, provider_prefs: Optional[Dict[str, Any]] = None, **opts: Any) -> Dict[str, Any]:
+        kwargs = super()._request_kwargs(max_tokens)
+        # Ask OpenRouter to include usage accounting (tokens + cost) in responses
+        extra_body: Dict[str, Any] = {"usage": {"include": True}}
+        if provider_prefs:
+            # OpenRouter provider routing, e.g. {"sort": "latency"}
+            extra_body["provider"] = dict(provider_prefs)
+        kwargs["extra_body"] = extra_body
+        return kwargs
+
+
+class OpenAIAdapter(_OpenAICompatibleAdapter):
+    """Direct OpenAI API for 'openai/*' models"""
+
+    name = "openai"
+    max_output_tokens = _env_int("OPENAI_MAX_OUTPUT_TOKENS", 32768)
+
+    def native_model_id(self, model: str) -> str:
+        return _MODEL_ALIASES.get(model) or model.split("/", 1)[-1]
+
+    def _request_kwargs(self, max_tokens: int, **opts: Any) -> Dict[str, Any]:
+        # Reasoning models (o-series) reject max_tokens; max_completion_tokens works for all
+        return {"max_completion_tokens": self._cap_tokens(max_tokens)}
+
+
+class AnthropicAdapter(ProviderAdapter):
+    """Direct Anthropic Messages API for 'anthropic/*' models (with prompt caching)"""
+
+    name = "anthropic"
+    max_output_tokens = _env_int("ANTHROPIC_MAX_OUTPUT_TOKENS", 32000)
+    prompt_cache = os.getenv("ANTHROPIC_PROMPT_CACHE", "1") not in ("0", "false", "False")
+
+    def native_model_id(self, model: str) -> str:
+        if model in _MODEL_ALIASES:
+            return _MODEL_ALIASES[model]
+        # OpenRouter uses dotted versions (claude-sonnet-4.5); Anthropic uses dashes
+        return model.split("/", 1)[-1].replace(".", "-")
+
+    def _new_client(self):
+        try:
+            from anthropic import AsyncAnthropic
+        except ImportError as e:
+            raise RuntimeError("Anthropic SDK installation required: pip install anthropic") from e
+        return AsyncAnthropic(api_key=self.api_key)
+
+    def _request_kwargs(self, model: str, messages: List[Dict[str, Any]], max_tokens: int) -> Dict[str, Any]:
+        system_text = "\n\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+        # Anthropic requires alternating user/assistant turns; merge consecutive same-role turns
+        turns: List[Dict[str, Any]] = []
+        for m in messages:
+            role = m.get("role")
+            if role == "system":
+                continue
+            role = "assistant" if role == "assistant" else "user"
+            content = str(m.get("content") or "")
+            if turns and turns[-1]["role"] == role:
+                turns[-1]["content"] += "\n\n" + content
+            else:
+                turns.append({"role": role, "content": content})
+        kwargs: Dict[str, Any] = {
+            "model": self.native_model_id(model),
+            "messages": turns,
+            "max_tokens": self._cap_tokens(max_tokens),
+        }
+        if system_text:
+            block: Dict[str, Any] = {"type": "text", "text": system_text}
+            if self.prompt_cache:
+                # The research system prompt repeats on every step; cache it upstream
+                block["cache_control"] = {"type": "ephemeral"}
+            kwargs["system"] = [block]
+        return kwargs
+
+    @staticmethod
+    def _usage_from(message: Any) -> Dict[str, Any]:
+        usage = getattr(message, "usage", None)
+        if usage is None:
+            return _empty_usage()
+        cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+        written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        prompt = (getattr(usage, "input_tokens", 0) or 0) + cached + written
+        return _make_usage(prompt, getattr(usage, "output_tokens", 0), cached)
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, **opts: Any) -> ChatResponse:
+        resp = await self._client().messages.create(**self._request_kwargs(model, messages, max_tokens))
+        content_text = "".join(
+            getattr(block, "text", "") or "" for block in (getattr(resp, "content", None) or [])
+            if getattr(block, "type", "") == "text"
+        )
+        return ChatResponse(content=content_text, raw=resp, usage=self._usage_from(resp), provider=self.name)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, on_usage: Optional[UsageCallback] = None, **opts: Any) -> AsyncIterator[str]:
+        async with self._client().messages.stream(**self._request_kwargs(model, messages, max_tokens)) as stream:
+            async for piece in stream.text_stream:
+                if piece:
+                    yield piece
+            final = await stream.get_final_message()
+        if on_usage is not None:
+            usage = self._usage_from(final)
+            usage["provider"] = self.name
+            on_usage(usage)
+
+
+class GeminiAdapter(ProviderAdapter):
+    """Direct Google Gemini API for 'google/*' models"""
+
+    name = "gemini"
+    max_output_tokens = _env_int("GEMINI_MAX_OUTPUT_TOKENS", 65536)
+
+    def native_model_id(self, model: str) -> str:
+        return _MODEL_ALIASES.get(model) or model.split("/", 1)[-1]
+
+    def _new_client(self):
+        try:
+            from google import genai
+        except ImportError as e:
+            raise RuntimeError("Google Gen AI SDK installation required: pip install google-genai") from e
+        # A client per API key; nothing is configured process-wide, so keys never mix
+        return genai.Client(api_key=self.api_key).aio
+
+    def _request_kwargs(self, model: str, messages: List[Dict[str, Any]], max_tokens: int) -> Dict[str, Any]:
+        system_text = "\n\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+        contents = [
+            {"role": "model" if m.get("role") == "assistant" else "user", "parts": [{"text": str(m.get("content") or "")}]}
+            for m in messages if m.get("role") != "system"
+        ]
+        config: Dict[str, Any] = {"max_output_tokens": self._cap_tokens(max_tokens)}
+        if system_text:
+            config["system_instruction"] = system_text
+        return {"model": self.native_model_id(model), "contents": contents, "config": config}
+
+    @staticmethod
+    def _usage_from(resp: Any) -> Dict[str, Any]:
+        meta = getattr(resp, "usage_metadata", None)
+        if meta is None:
+            return _empty_usage()
+        return _make_usage(
+            getattr(meta, "prompt_token_count", 0),
+            getattr(meta, "candidates_token_count", 0),
+            getattr(meta, "cached_content_token_count", 0),
+        )
+
+    @staticmethod
+    def _text_of(resp: Any) -> str:
+        # resp.text raises when the candidate has no text parts (e.g. safety stop)
+        try:
+            return resp.text or ""
+        except Exception:
+            return ""
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, **opts: Any) -> ChatResponse:
+        resp = await self._client().models.generate_content(**self._request_kwargs(model, messages, max_tokens))
+        return ChatResponse(content=self._text_of(resp), raw=resp, usage=self._usage_from(resp), provider=self.name)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], max_tokens: int, on_usage: Optional[UsageCallback] = None, **opts: Any) -> AsyncIterator[str]:
+        chunks = await self._client().models.generate_content_stream(**self._request_kwargs(model, messages, max_tokens))
+        usage = _empty_usage()
+        async for chunk in chunks:
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage = self._usage_from(chunk)
+            piece = self._text_of(chunk)
+            if piece:
+                yield piece
+        if on_usage is not None:
+            usage["provider"] = self.name
+            on_usage(usage)
+
+
+# Model id vendor prefix -> (accepted key names, adapter class)
+DIRECT_ADAPTERS: Dict[str, Tuple[Tuple[str, ...], type]] = {
+    "openai": (("OPENAI_API_KEY",), OpenAIAdapter),
+    "anthropic": (("ANTHROPIC_API_KEY",), AnthropicAdapter),
+    "google": (("GEMINI_API_KEY", "GOOGLE_API_KEY"), GeminiAdapter),
+}
+
+
+def select_adapter(model: str, api_keys: Optional[dict] = None) -> ProviderAdapter:
+    """Pick the adapter for a model id: direct when the vendor key is set, else OpenRouter"""
+    model_id = _fix_model_id(model)
+    if PROVIDER_ROUTING != "openrouter":
+        vendor = model_id.split("/", 1)[0].lower()
+        entry = DIRECT_ADAPTERS.get(vendor)
+        if entry is not None:
+            key_names, adapter_cls = entry
+            key = _lookup_key(key_names, api_keys)
+            if key:
+                return adapter_cls(key)
+    return OpenRouterAdapter(_get_api_key(api_keys))
+
+
+def _openrouter_fallback(adapter: ProviderAdapter, api_keys: Optional[dict]) -> Optional[ProviderAdapter]:
+    if isinstance(adapter, OpenRouterAdapter) or not DIRECT_FALLBACK_TO_OPENROUTER:
+        return None
+    key = _lookup_key(("OPENROUTER_API_KEY",), api_keys)
+    return OpenRouterAdapter(key) if key else None
+
+
+def _response_cache_key(model: str, messages: List[Dict[str, Any]], max_tokens: int, provider_prefs: Optional[Dict[str, Any]]) -> str:
+    raw = json.dumps([model, messages, max_tokens, provider_prefs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
 async def chat_complete(
-    model: str, 
-    messages: List[Dict[str, Any]], 
-    max_tokens: int, 
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: int,
     api_keys: Optional[dict] = None,
+    provider_prefs: Optional[Dict[str, Any]] = None,
+    response_cache: Optional[Dict[str, Any]] = None,
 ) -> ChatResponse:
-    """Chat completion - pure conversation mode, without using OpenAI function call"""
-    client = AsyncOpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=_get_api_key(api_keys)
-    )
-    
-    resp = await client.chat.completions.create(
-        model=_fix_model_id(model),
-        messages=messages,
-        max_tokens=max_tokens,
-    )
-    
-    # Be defensive: choices/message may be missing in rare cases
-    content_text = ""
+    """Chat completion - pure conversation mode, without using OpenAI function call
+
+    ``provider_prefs`` is forwarded as OpenRouter provider routing preferences
+    (e.g. ``{"sort": "latency"}``); direct adapters ignore it.
+
+    With ``response_cache`` (a dict shared by the runs of one batch), an
+    identical call (model, messages, max_tokens, provider_prefs) is made once;
+    the other callers get its content with zero usage and provider "cache".
+    Failed calls are not cached.
+    """
+    if response_cache is None:
+        return await _chat_complete(model, messages, max_tokens, api_keys, provider_prefs)
+    key = _response_cache_key(model, messages, max_tokens, provider_prefs)
+    shared = response_cache.get(key)
+    if shared is not None:
+        try:
+            resp = await asyncio.shield(shared)
+            return ChatResponse(resp.content, usage=_empty_usage(), provider="cache")
+        except asyncio.CancelledError:
+            if not shared.cancelled():
+                raise
+            # The owner's call failed or was abandoned; make our own
+    future = asyncio.get_running_loop().create_future()
+    response_cache[key] = future
     try:
-        choices = getattr(resp, "choices", None)
-        if isinstance(choices, list) and len(choices) > 0:
-            message = getattr(choices[0], "message", None)
-            if message is not None:
-                content_text = getattr(message, "content", "") or ""
-    except Exception:
-        content_text = ""
-    
-    return ChatResponse(content=content_text, raw=resp)
+        resp = await _chat_complete(model, messages, max_tokens, api_keys, provider_prefs)
+    except BaseException:
+        future.cancel()
+        if response_cache.get(key) is future:
+            response_cache.pop(key, None)
+        raise
+    future.set_result(resp)
+    return resp
+
+
+async def _chat_complete(
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: int,
+    api_keys: Optional[dict] = None,
+    provider_prefs: Optional[Dict[str, Any]] = None,
+) -> ChatResponse:
+    adapter = select_adapter(model, api_keys)
+    try:
+        async with get_admission().slot(adapter.name):
+            return await adapter.complete(model, messages, max_tokens, provider_prefs=provider_prefs)
+    except Exception as e:
+        fallback = _openrouter_fallback(adapter, api_keys)
+        if fallback is None:
+            raise
+        logger.warning(f"Direct provider '{adapter.name}' failed ({e}); retrying via OpenRouter")
+        async with get_admission().slot(fallback.name):
+            return await fallback.complete(model, messages, max_tokens, provider_prefs=provider_prefs)
 
 
 async def chat_complete_stream(
-    model: str, 
-    messages: List[Dict[str, Any]], 
-    max_tokens: int, 
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: int,
     api_keys: Optional[dict] = None,
+    on_usage: Optional[UsageCallback] = None,
+    provider_prefs: Optional[Dict[str, Any]] = None,
 ):
-    """Chat completion with streaming - yields content chunks as they arrive"""
-    client = AsyncOpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=_get_api_key(api_keys)
-    )
-    
-    stream = await client.chat.completions.create(
-        model=_fix_model_id(model),
-        messages=messages,
-        max_tokens=max_tokens,
-        stream=True,
-    )
-    
-    async for chunk in stream:
-        # Guard against empty/irregular frames (e.g., heartbeats, role-only deltas)
-        try:
-            choices = getattr(chunk, "choices", None)
-            if not (isinstance(choices, list) and len(choices) > 0):
-                continue
-            delta = getattr(choices[0], "delta", None)
-            if delta is None:
-                continue
-            piece = getattr(delta, "content", None)
-            if piece:
+    """Chat completion with streaming - yields content chunks as they arrive
+
+    Closing this generator early (client disconnect) closes the upstream stream.
+    If ``on_usage`` is given it is called once with the normalized usage dict
+    (plus ``provider`` and, via OpenRouter, ``upstream``) after the stream finishes.
+    """
+    adapter = select_adapter(model, api_keys)
+    produced = False
+    try:
+        # The admission slot is held for the whole stream: it is one upstream request
+        async with get_admission().slot(adapter.name), aclosing(adapter.stream(model, messages, max_tokens, on_usage=on_usage, provider_prefs=provider_prefs)) as pieces:
+            async for piece in pieces:
+                produced = True
                 yield piece
-        except Exception:
-            # Skip malformed frames without failing the whole stream
-            continue
+        return
+    except Exception as e:
+        # Only fall back when nothing has been emitted yet, so output is never duplicated
+        fallback = _openrouter_fallback(adapter, api_keys) if not produced else None
+        if fallback is None:
+            raise
+        logger.warning(f"Direct provider '{adapter.name}' stream failed ({e}); retrying via OpenRouter")
+    async with get_admission().slot(fallback.name), aclosing(fallback.stream(model, messages, max_tokens, on_usage=on_usage, provider_prefs=provider_prefs)) as pieces:
+        async for piece in pieces:
+            yield piece
 
 
 if __name__ == "__main__":
-    import asyncio
-    
     async def test():
         resp = await chat_complete(
             model="openai/gpt-3.5-turbo",
             messages=[{"role": "user", "content": "Say hello in Chinese"}],
             max_tokens=50
         )
-        print(f"Response: {resp.content}")
-    
+        print(f"Response: {resp.content} (via {resp.provider}, usage={resp.usage})")
+
     asyncio.run(test())
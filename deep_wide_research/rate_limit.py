@@ -0,0 +1,270 @@
+"""Per-user and per-API-key rate limits and concurrent-run caps.
+
+Every new research run takes one token from a token bucket and holds one
+concurrency slot until it ends. Both are checked for the user and, for API key
+requests, for the key (by prefix). A run is admitted only if every subject has
+a token and a free slot, otherwise the caller gets the time to retry after.
+
+Limits come from the user's plan (RATE_LIMITS overrides the defaults below) and
+can be tightened or raised per API key with scopes:
+    ratelimit:<runs per minute>   concurrency:<max concurrent runs>
+
+State is per process by default. With RATE_LIMIT_DB set, buckets and slots
+live in a SQLite file (WAL mode) so all uvicorn workers on a host share them;
+slots of crashed workers expire after RATE_LIMIT_LEASE_SEC. SQLite work runs on
+a dedicated thread, never on the event loop, with a short busy timeout
+(RATE_LIMIT_DB_TIMEOUT_SEC). When the file stays locked longer than that,
+RATE_LIMIT_ON_DB_ERROR decides: "open" admits the run against this process's
+own limits, "closed" rejects it with a short Retry-After.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "")
+RATE_LIMIT_LEASE_SEC = float(os.getenv("RATE_LIMIT_LEASE_SEC", "1800"))
+RATE_LIMIT_DB_TIMEOUT_SEC = float(os.getenv("RATE_LIMIT_DB_TIMEOUT_SEC", "0.5"))
+RATE_LIMIT_ON_DB_ERROR = os.getenv("RATE_LIMIT_ON_DB_ERROR", "open").strip().lower()
+# Retry-After sent when only the concurrency cap is hit (a slot frees when some run ends)
+RATE_LIMIT_CONCURRENCY_RETRY_SEC = float(os.getenv("RATE_LIMIT_CONCURRENCY_RETRY_SEC", "5"))
+
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "free": {"per_minute": 6, "burst": 3, "concurrent": 1},
+    "plus": {"per_minute": 20, "burst": 6, "concurrent": 3},
+    "pro": {"per_minute": 60, "burst": 15, "concurrent": 6},
+    "team": {"per_minute": 120, "burst": 30, "concurrent": 12},
+}
+
+
+@dataclass(frozen=True)
+class Limit:
+    per_minute: float
+    burst: float
+    concurrent: int
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def load_rate_limits() -> Dict[str, Limit]:
+    limits = {plan: dict(values) for plan, values in DEFAULT_RATE_LIMITS.items()}
+    raw = os.getenv("RATE_LIMITS")
+    if raw:
+        try:
+            for plan, values in json.loads(raw).items():
+                limits.setdefault(str(plan).lower(), dict(DEFAULT_RATE_LIMITS["free"])).update(values or {})
+        except Exception as e:
+            logger.warning(f"Ignoring invalid RATE_LIMITS: {e}")
+    return {
+        plan: Limit(float(v["per_minute"]), float(v.get("burst", v["per_minute"])), int(v["concurrent"]))
+        for plan, v in limits.items()
+    }
+
+
+def limit_for(plan: str, scopes: Optional[Sequence[str]] = None, limits: Optional[Dict[str, Limit]] = None) -> Limit:
+    """Plan limit, with ratelimit:/concurrency: key scopes applied on top"""
+    limits = limits or load_rate_limits()
+    base = limits.get(plan) or limits.get("free") or Limit(6, 3, 1)
+    per_minute, burst, concurrent = base.per_minute, base.burst, base.concurrent
+    for scope in scopes or []:
+        name, _, value = str(scope).partition(":")
+        try:
+            if name == "ratelimit":
+                per_minute = float(value)
+                burst = min(burst, per_minute) if per_minute > 0 else 0
+            elif name == "concurrency":
+                concurrent = int(value)
+        except ValueError:
+            continue
+    return Limit(per_minute, burst, concurrent)
+
+
+class _MemoryState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._slots: Dict[str, Dict[str, float]] = {}
+
+    def acquire(self, subjects: List[Tuple[str, Limit]], lease_id: str, now: float) -> Optional[RateLimited]:
+        with self._lock:
+            tokens: Dict[str, float] = {}
+            for key, limit in subjects:
+                slots = {lid: exp for lid, exp in self._slots.get(key, {}).items() if exp > now}
+                self._slots[key] = slots
+                error = _check(key, limit, self._buckets.get(key), len(slots), now)
+                if isinstance(error, RateLimited):
+                    return error
+                tokens[key] = error
+            for key, _ in subjects:
+                self._buckets[key] = (tokens[key] - 1.0, now)
+                self._slots[key][lease_id] = now + RATE_LIMIT_LEASE_SEC
+        return None
+
+    def release(self, keys: List[str], lease_id: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._slots.get(key, {}).pop(lease_id, None)
+
+
+class _SQLiteState:
+    """Shared buckets and slots; every query runs on the state's single worker thread"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit-db")
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=RATE_LIMIT_DB_TIMEOUT_SEC)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rl_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rl_slots (lease_id TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (lease_id, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS rl_slots_key ON rl_slots (key, expires_at)")
+
+    def acquire(self, subjects: List[Tuple[str, Limit]], lease_id: str, now: float) -> Optional[RateLimited]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM rl_slots WHERE expires_at <= ?", (now,))
+                tokens: Dict[str, float] = {}
+                for key, limit in subjects:
+                    row = self._conn.execute("SELECT tokens, updated FROM rl_buckets WHERE key = ?", (key,)).fetchone()
+                    in_use = self._conn.execute("SELECT COUNT(*) FROM rl_slots WHERE key = ?", (key,)).fetchone()[0]
+                    error = _check(key, limit, row, int(in_use), now)
+                    if isinstance(error, RateLimited):
+                        self._conn.execute("ROLLBACK")
+                        return error
+                    tokens[key] = error
+                for key, _ in subjects:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO rl_buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens[key] - 1.0, now)
+                    )
+                    self._conn.execute(
+                        "INSERT INTO rl_slots (lease_id, key, expires_at) VALUES (?, ?, ?)", (lease_id, key, now + RATE_LIMIT_LEASE_SEC)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return None
+
+    async def acquire_async(self, subjects: List[Tuple[str, Limit]], lease_id: str, now: float) -> Optional[RateLimited]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.acquire, subjects, lease_id, now)
+
+    def _release(self, lease_id: str) -> None:
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM rl_slots WHERE lease_id = ?", (lease_id,))
+        except Exception as e:
+            logger.warning(f"Failed to release rate limit slots {lease_id} (they expire after {RATE_LIMIT_LEASE_SEC:.0f}s): {e}")
+
+    def release(self, keys: List[str], lease_id: str) -> None:
+        # Queued for the worker thread; callers (often on the event loop) don't wait
+        self._executor.submit(self._release, lease_id)
+
+
+def _check(key: str, limit: Limit, bucket: Optional[Tuple[float, float]], in_use: int, now: float):
+    """Refilled token count for ``key``, or RateLimited if it cannot start a run now"""
+    rate = limit.per_minute / 60.0
+    if bucket is None:
+        tokens = limit.burst
+    else:
+        tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * rate)
+    if tokens < 1.0:
+        retry = (1.0 - tokens) / rate if rate > 0 else 60.0
+        return RateLimited(retry, f"Rate limit exceeded for {key.split(':', 1)[0]} ({limit.per_minute:g} runs/min)")
+    if in_use >= limit.concurrent:
+        return RateLimited(RATE_LIMIT_CONCURRENCY_RETRY_SEC, f"Too many concurrent runs for {key.split(':', 1)[0]} (max {limit.concurrent})")
+    return tokens
+
+
+class RateLease:
+    """Concurrency slots held by one run; release once the run ends"""
+
+    def __init__(self, state: Any, keys: List[str], lease_id: str):
+        self._state = state
+        self.keys = keys
+        self.lease_id = lease_id
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._state.release(self.keys, self.lease_id)
+
+
+class RateLimiter:
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.limits = load_rate_limits()
+        self._state: Any = _MemoryState()
+        # Per-process fallback when the shared file is locked and RATE_LIMIT_ON_DB_ERROR=open
+        self._local = self._state
+        if path:
+            try:
+                self._state = _SQLiteState(path)
+            except Exception as e:
+                logger.warning(f"Shared state disabled ({path}), limits are per process: {e}")
+        self.rejected = 0
+        self.db_errors = 0
+
+    async def acquire(self, user_id: str, plan: str, api_key_prefix: Optional[str] = None, scopes: Optional[Sequence[str]] = None) -> RateLease:
+        """Admit one run for the user (and API key), or raise RateLimited"""
+        subjects = [(f"user:{user_id}", limit_for(plan, None, self.limits))]
+        if api_key_prefix:
+            subjects.append((f"key:{api_key_prefix}", limit_for(plan, scopes, self.limits)))
+        lease_id = secrets.token_hex(8)
+        state = self._state
+        if isinstance(state, _SQLiteState):
+            try:
+                error = await state.acquire_async(subjects, lease_id, time.time())
+            except sqlite3.Error as e:
+                self.db_errors += 1
+                if RATE_LIMIT_ON_DB_ERROR == "closed":
+                    logger.warning(f"Rate limit state unavailable, rejecting run: {e}")
+                    self.rejected += 1
+                    raise RateLimited(1, "Rate limiter busy, retry shortly")
+                logger.warning(f"Rate limit state unavailable, applying per-process limits: {e}")
+                state = self._local
+                error = state.acquire(subjects, lease_id, time.time())
+        else:
+            error = state.acquire(subjects, lease_id, time.time())
+        if error is not None:
+            self.rejected += 1
+            error.retry_after = max(1, math.ceil(error.retry_after))
+            raise error
+        return RateLease(state, [key for key, _ in subjects], lease_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite" if isinstance(self._state, _SQLiteState) else "memory",
+            "rejected": self.rejected,
+            "db_errors": self.db_errors,
+            "limits": {plan: vars(limit) for plan, limit in self.limits.items()},
+        }
+
+
+_global_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get global rate limiter instance"""
+    global _global_rate_limiter
+    if _global_rate_limiter is None:
+        _global_rate_limiter = RateLimiter()
+    return _global_rate_limiter
@@ -10,11 +10,14 @@ from __future__ import annotations
 
 import asyncio
 import json
+import logging
+import math
+import os
 import re
 import sys
 import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 # Support both direct execution and module import - try absolute and relative imports
 try:
@@ -23,6 +26,9 @@ try:
     from .mcp_client import get_registry
     from .newprompt import create_unified_research_prompt
     from .context_utils import extract_sources_from_result, _infer_service_from_tool
+    from .cascade import ESCALATE_TOOL, ESCALATE_PROMPT_NOTE, get_cascade_stats
+    from .log_utils import log_payload
+    from . import serializer
 except ImportError:
     # Try absolute import (direct execution or deployment environment)
     try:
@@ -30,12 +36,20 @@ except ImportError:
         from deep_wide_research.mcp_client import get_registry
         from deep_wide_research.newprompt import create_unified_research_prompt
         from deep_wide_research.context_utils import extract_sources_from_result, _infer_service_from_tool
+        from deep_wide_research.cascade import ESCALATE_TOOL, ESCALATE_PROMPT_NOTE, get_cascade_stats
+        from deep_wide_research.log_utils import log_payload
+        from deep_wide_research import serializer
     except ImportError:
         # Import as standalone module (Railway deployment environment)
         from providers import chat_complete
         from mcp_client import get_registry
         from newprompt import create_unified_research_prompt
         from context_utils import extract_sources_from_result, _infer_service_from_tool
+        from cascade import ESCALATE_TOOL, ESCALATE_PROMPT_NOTE, get_cascade_stats
+        from log_utils import log_payload
+        import serializer
+
+logger = logging.getLogger(__name__)
 
 
 # MCP tool selection configuration: {server_name: [tool_names]}
@@ -133,37 +147,168 @@ def parse_tool_calls(content: str) -> List[Dict[str, Any]]:
                 "arguments": tool_data.get("arguments", {})
             })
         except json.JSONDecodeError as e:
-            print(f"⚠️ Failed to parse tool call JSON: {e}")
+            logger.warning("Failed to parse tool call JSON: %s", e)
             continue
     
     return tool_calls
 
 
+def _record_llm_usage(cfg, phase: str, model: str, resp) -> None:
+    ledger = getattr(cfg, "usage_ledger", None)
+    if ledger is not None:
+        try:
+            ledger.record_llm(phase, model, getattr(resp, "usage", None), getattr(resp, "provider", None))
+        except Exception:
+            pass
+
+
+def _record_tool_usage(cfg, server: str, payload_bytes: int, ok: bool) -> None:
+    ledger = getattr(cfg, "usage_ledger", None)
+    if ledger is not None:
+        try:
+            ledger.record_tool(server, payload_bytes, ok)
+        except Exception:
+            pass
+
+
+async def _research_step_llm(
+    messages: List[Dict[str, Any]],
+    fast_system_prompt: Optional[str],
+    cfg,
+    api_keys: Optional[dict],
+) -> tuple:
+    """Run one research step, trying the cascade fast model first when configured
+
+    Escalates to cfg.research_model when the fast output has <tool_call> blocks
+    that fail to parse, the fast model calls the Escalate pseudo-tool, or the
+    fast call errors. A fast reply without tool calls is its final answer.
+
+    Returns:
+        (response, parsed tool calls)
+    """
+    fast_model = getattr(cfg, "research_fast_model", None)
+    if fast_model and fast_system_prompt:
+        stats = getattr(cfg, "_cascade_stats", None)
+        reason = None
+        try:
+            fast_messages = [{"role": "system", "content": fast_system_prompt}] + messages[1:]
+            resp = await chat_complete(
+                model=fast_model,
+                messages=fast_messages,
+                max_tokens=cfg.research_model_max_tokens,
+                api_keys=api_keys,
+                response_cache=getattr(cfg, "llm_response_cache", None),
+            )
+            _record_llm_usage(cfg, "research_fast", fast_model, resp)
+            tool_calls = parse_tool_calls(resp.content)
+            if len(re.findall(r'<tool_call>', resp.content or "")) > len(tool_calls):
+                reason = "unparseable"
+            elif any(tc["tool"] == ESCALATE_TOOL for tc in tool_calls):
+                reason = "requested"
+        except Exception as e:
+            reason = f"error: {e}"
+        get_cascade_stats().record(getattr(cfg, "cascade_tier", ""), escalated=reason is not None)
+        if isinstance(stats, dict):
+            stats["fast_steps"] = stats.get("fast_steps", 0) + 1
+        if reason is None:
+            return resp, tool_calls
+        if isinstance(stats, dict):
+            stats["escalations"] = stats.get("escalations", 0) + 1
+        logger.info("Escalating research step from %s to %s (%s)", fast_model, cfg.research_model, reason)
+
+    resp = await chat_complete(
+        model=cfg.research_model,
+        messages=messages,
+        max_tokens=cfg.research_model_max_tokens,
+        api_keys=api_keys,
+        response_cache=getattr(cfg, "llm_response_cache", None),
+    )
+    _record_llm_usage(cfg, "research", cfg.research_model, resp)
+    # The strong model never escalates further; drop any stray Escalate calls
+    tool_calls = [tc for tc in parse_tool_calls(resp.content) if tc["tool"] != ESCALATE_TOOL]
+    return resp, tool_calls
+
+
+def _tool_cache_key(tc: Dict[str, Any]) -> str:
+    return f"{tc.get('tool', '')}:{serializer.dumps(tc.get('arguments', {}), sort_keys=True)}"
+
+
+async def _shared_tool_result(tc: Dict[str, Any], cfg, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Run ``compute`` once per identical call across runs sharing ``cfg.tool_result_cache`` (batch runs)"""
+    cache = getattr(cfg, "tool_result_cache", None)
+    if cache is None:
+        return await compute()
+    key = _tool_cache_key(tc)
+    shared = cache.get(key)
+    if shared is not None:
+        try:
+            tr = await asyncio.shield(shared)
+            logger.info("Tool '%s' result shared from an identical call", tc["tool"])
+            return {**tr, "tool_call_id": tc["id"]}
+        except asyncio.CancelledError:
+            if not shared.cancelled():
+                raise
+            # The run that owned the call gave up on it; make our own
+    future = asyncio.get_running_loop().create_future()
+    cache[key] = future
+    try:
+        tr = await compute()
+    except BaseException:
+        future.cancel()
+        if cache.get(key) is future:
+            cache.pop(key, None)
+        raise
+    future.set_result(tr)
+    if tr.get("failed"):
+        # Share failures with concurrent waiters only; later calls retry
+        cache.pop(key, None)
+    return tr
+
+
 async def _execute_single_tool(
     tc: Dict[str, Any],
     mcp_clients: List,
     cfg
 ) -> Dict[str, Any]:
     """Execute a single tool call"""
-    result = None
+    return await _shared_tool_result(tc, cfg, lambda: _call_tool(tc, mcp_clients, cfg))
+
+
+async def _call_tool(
+    tc: Dict[str, Any],
+    mcp_clients: List,
+    cfg
+) -> Dict[str, Any]:
+    # Tool results stay parsed objects from the MCP response through to the context builder
+    result: Any = None
     t_tool_start = time.perf_counter()
     # Route to the correct client by service name inferred from tool
     service = _infer_service_from_tool(tc.get("tool", "")) or ""
     # Prefer clients whose _server_name matches service; fallback to all
     ordered_clients = [c for c in mcp_clients if getattr(c, "_server_name", "").lower() == service] or list(mcp_clients)
     for client in ordered_clients:
+        server = getattr(client, "_server_name", "") or "other"
         try:
-            raw = await client.call_tool(tc["tool"], tc.get("arguments", {}))
+            stats: Dict[str, Any] = {}
+            raw = await client.call_tool(tc["tool"], tc.get("arguments", {}), stats=stats)
             # If the server returned an explicit error marker, try next client
             if isinstance(raw, dict) and raw.get("isError") is True:
+                _record_tool_usage(cfg, server, 0, ok=False)
                 continue
-            result = json.dumps(raw)
+            result = raw
+            payload_bytes = stats.get("payload_bytes")
+            if payload_bytes is None:
+                payload_bytes = len(serializer.dumps_bytes(raw))
+            _record_tool_usage(cfg, server, payload_bytes, ok=True)
             break  # Stop only when non-error result obtained
         except Exception:
+            _record_tool_usage(cfg, server, 0, ok=False)
             continue  # Try next client on failure
     
-    if result is None:
-        result = json.dumps({"error": f"Tool '{tc['tool']}' not found in any MCP server"})
+    failed = result is None
+    if failed:
+        result = {"error": f"Tool '{tc['tool']}' not found in any MCP server"}
+        payload_bytes = 0
     
     t_tool_end = time.perf_counter()
     try:
@@ -172,41 +317,141 @@ async def _execute_single_tool(
     except Exception:
         pass
 
-    # Output tool result
-    print(f"\n✓ Tool '{tc['tool']}' result ({len(result)} chars)")
-    print(f"{'='*60}")
+    logger.info(
+        "Tool '%s' result (%d bytes)", tc["tool"], payload_bytes,
+        extra={"tool": tc["tool"], "bytes": payload_bytes, "failed": failed, "seconds": round(t_tool_end - t_tool_start, 3)},
+    )
     
     return {
         "tool_call_id": tc["id"],
         "tool": tc["tool"],
-        "result": result
+        "result": result,
+        "failed": failed,
     }
 
 
-async def execute_tool_calls(
-    tool_calls: List[Dict[str, Any]],
-    mcp_clients: List,
-    cfg
-) -> List[Dict[str, Any]]:
-    """Execute all tool calls in parallel and return results list"""
-    if not tool_calls:
-        return []
-    
-    # Execute all tool calls in parallel
-    t_exec_start = time.perf_counter()
-    tool_results = await asyncio.gather(
-        *[_execute_single_tool(tc, mcp_clients, cfg) for tc in tool_calls]
-    )
-    t_exec_end = time.perf_counter()
-    try:
-        if hasattr(cfg, "_timing_events"):
-            cfg._timing_events.append({"label": "execute_tool_calls gather", "seconds": t_exec_end - t_exec_start})
-    except Exception:
-        pass
+def _research_time_left(cfg) -> Optional[float]:
+    """Seconds until the research budget of a deadline-bound request runs out (None = no deadline)"""
+    cutoff = getattr(cfg, "research_deadline_ts", None)
+    if cutoff is None:
+        return None
+    return cutoff - time.perf_counter()
+
+
+# As-completed tool rounds: the next LLM step starts once this share of the round's
+# calls is back (plus a short grace for the rest), or after the cutoff once any result
+# is in. Calls still running are carried into the next round. TOOL_QUORUM=1 waits for all.
+TOOL_QUORUM = float(os.getenv("TOOL_QUORUM", "0.75"))
+TOOL_STRAGGLER_GRACE_SEC = float(os.getenv("TOOL_STRAGGLER_GRACE_SEC", "1.5"))
+TOOL_ROUND_CUTOFF_SEC = float(os.getenv("TOOL_ROUND_CUTOFF_SEC", "20"))
+
+
+def _minimal_sources(contextjson: Dict[str, Any]) -> List[Dict[str, str]]:
+    return [
+        {"service": s.get("service", ""), "query": s.get("query", ""), "url": s.get("url", "")}
+        for s in contextjson.get("sources", [])
+        if s.get("service") and s.get("url")
+    ]
+
+
+def _fold_tool_result(
+    tr: Dict[str, Any],
+    tc: Dict[str, Any],
+    step: int,
+    contextjson: Dict[str, Any],
+    seen: Dict[str, bool],
+    tool_interactions: List[Dict[str, Any]],
+) -> int:
+    """Add one tool result to the context sources and interaction log; returns new source count"""
+    parsed_result: Any = tr.get("result", "")
+    if isinstance(parsed_result, str):
+        # Results from older callers may still be JSON text
+        try:
+            parsed_result = serializer.loads(parsed_result)
+        except Exception:
+            pass
+    tool_name = tr.get("tool") or tc.get("tool") or ""
+    tool_args = tc.get("arguments", {}) if isinstance(tc.get("arguments", {}), dict) else {}
+    query_val = tool_args.get("query")
+    service = _infer_service_from_tool(tool_name) or "other"
+    added = 0
+    # Normalize sources for Tavily/Exa
+    if service in ("tavily", "exa"):
+        try:
+            new_sources = extract_sources_from_result(service, query_val, parsed_result)
+        except Exception:
+            new_sources = []
+        sources = contextjson.setdefault("sources", [])
+        for src in new_sources:
+            key = f"{src.get('service','')}|{src.get('url','')}"
+            if key in seen:
+                continue
+            seen[key] = True
+            # Rank by arrival order
+            src["rank"] = len(sources)
+            sources.append(src)
+            added += 1
+
+    # Save interaction record
+    tool_interactions.append({
+        "step": step,
+        "id": tr.get("tool_call_id"),
+        "tool": tool_name,
+        "arguments": tool_args,
+        "result": parsed_result,
+    })
+    return added
 
-    print(tool_results)
-    
-    return list(tool_results)
+
+async def _await_tool_quorum(
+    in_flight: Dict[asyncio.Future, Tuple[int, Dict[str, Any]]],
+    round_tasks: set,
+    cfg,
+    on_done: Callable[[asyncio.Future], Awaitable[None]],
+) -> None:
+    """Fold tool results as they complete until the round reaches quorum, cutoff or the deadline.
+
+    Waits on every in-flight call, so late results from earlier rounds are folded
+    in too; only this round's calls count toward the quorum.
+    """
+    if not round_tasks:
+        return
+    needed = max(1, min(len(round_tasks), math.ceil(len(round_tasks) * TOOL_QUORUM)))
+    loop = asyncio.get_running_loop()
+    t_start = loop.time()
+    quorum_at: Optional[float] = None
+    while in_flight:
+        done_in_round = sum(1 for t in round_tasks if t.done())
+        if done_in_round >= len(round_tasks):
+            return
+        now = loop.time()
+        if done_in_round >= needed:
+            quorum_at = quorum_at or now
+            wait_until: Optional[float] = quorum_at + TOOL_STRAGGLER_GRACE_SEC
+        elif done_in_round > 0:
+            wait_until = t_start + TOOL_ROUND_CUTOFF_SEC
+        else:
+            wait_until = None
+        time_left = _research_time_left(cfg)
+        if time_left is not None:
+            deadline_at = now + time_left
+            wait_until = deadline_at if wait_until is None else min(wait_until, deadline_at)
+        timeout = None if wait_until is None else wait_until - now
+        if timeout is not None and timeout <= 0:
+            return
+        done, _ = await asyncio.wait(list(in_flight), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            await on_done(task)
+
+
+async def _cancel_tools(in_flight: Dict[asyncio.Future, Tuple[int, Dict[str, Any]]]) -> None:
+    """Cancel tool calls that are still running and forget them"""
+    tasks = list(in_flight)
+    in_flight.clear()
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks)
 
 
 async def run_research_llm_driven(
@@ -231,15 +476,20 @@ async def run_research_llm_driven(
         return {"raw_notes": empty_json}
     
     # 1. Collect MCP tools - use configuration from frontend or default
-    print("\n🔍 Collecting tools from MCP servers...")
+    logger.info("Collecting tools from MCP servers")
     t_collect_start = time.perf_counter()
     registry = get_registry()
     
     # Use MCP configuration from frontend, or use default if not provided
     effective_config = mcp_config or MCP_TOOLS_CONFIG
-    print(f"📋 Using MCP config: {effective_config}")
-    
-    mcp_tools, mcp_clients = await registry.collect_tools(effective_config)
+    logger.info("Using MCP config", extra={"mcp_config": effective_config})
+    
+    # Request-scoped lease (set by the engine) owns the clients; else the registry tracks them
+    lease = getattr(cfg, "mcp_lease", None)
+    if lease is not None:
+        mcp_tools, mcp_clients = await lease.collect_tools(effective_config)
+    else:
+        mcp_tools, mcp_clients = await registry.collect_tools(effective_config)
     t_collect_end = time.perf_counter()
     try:
         if hasattr(cfg, "_timing_events"):
@@ -248,7 +498,7 @@ async def run_research_llm_driven(
         pass
     
     if not mcp_tools:
-        print("⚠️ No tools available")
+        logger.warning("No tools available")
         error_json = json.dumps({
             "topic": topic,
             "tool_calls": [],
@@ -258,9 +508,10 @@ async def run_research_llm_driven(
             "raw_notes": error_json
         }
     
-    print(f"✅ Collected {len(mcp_tools)} tool(s):")
-    for tool in mcp_tools:
-        print(f"  - {tool.get('name', 'unknown')}")
+    logger.info(
+        "Collected %d tool(s)", len(mcp_tools),
+        extra={"tools": [tool.get("name", "unknown") for tool in mcp_tools]},
+    )
     
     # 2. Build system prompt - dynamically generate using create_unified_research_prompt
     t_prompt_start = time.perf_counter()
@@ -285,167 +536,169 @@ async def run_research_llm_driven(
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": topic}
     ]
+    # Cascade: the fast model sees the same prompt plus the escalation option
+    fast_system_prompt = system_prompt + ESCALATE_PROMPT_NOTE if getattr(cfg, "research_fast_model", None) else None
     
-    print(messages)
+    log_payload(logger, "Research messages", messages)
     
     max_steps = getattr(cfg, 'max_react_tool_calls', 8)
     conversation_history = []  # Save complete conversation history for final return
     tool_interactions: List[Dict[str, Any]] = []  # Accumulate all tool calls and results (for JSON raw_notes)
     contextjson: Dict[str, Any] = {"sources": []}
+    # Maintain simple dedup by (service,url)
+    seen: Dict[str, bool] = {}
+    # Tool calls still running (possibly from earlier rounds) -> (step, tool call)
+    in_flight: Dict[asyncio.Future, Tuple[int, Dict[str, Any]]] = {}
+
+    async def fold_done(task: asyncio.Future, cancel_reason: str = "run ended") -> None:
+        """Fold one finished tool call into the context and push the sources update right away"""
+        tool_step, tc = in_flight.pop(task)
+        if task.cancelled():
+            tr = {"tool_call_id": tc["id"], "tool": tc["tool"], "result": {"error": f"Tool '{tc['tool']}' cancelled: {cancel_reason}"}}
+        elif task.exception() is not None:
+            tr = {"tool_call_id": tc["id"], "tool": tc["tool"], "result": {"error": f"Tool '{tc['tool']}' did not complete"}}
+        else:
+            tr = task.result()
+        added = _fold_tool_result(tr, tc, tool_step, contextjson, seen, tool_interactions)
+        if added and status_callback:
+            try:
+                await status_callback({"event": "sources_update", "sources": _minimal_sources(contextjson)})
+            except Exception:
+                pass
+
+    async def fold_finished() -> None:
+        for task in [t for t in in_flight if t.done()]:
+            await fold_done(task)
+
+    async def cancel_stragglers(reason: str) -> None:
+        """Cancel calls still running and record them as cancelled, so raw_notes keeps every call"""
+        tasks = list(in_flight)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        for task in tasks:
+            await fold_done(task, reason)
 
     # Tool calling loop
-    for step in range(max_steps):
-        # Print current context before prompting LLM
-        try:
-            print("\n[CONTEXT_JSON - research before prompt]")
-            print(json.dumps(contextjson, ensure_ascii=False))
-        except Exception:
-            pass
-        # Call LLM (pure conversation mode)
-        t_llm_start = time.perf_counter()
-        resp = await chat_complete(
-            model=cfg.research_model,
-            messages=messages,
-            max_tokens=cfg.research_model_max_tokens,
-            api_keys=api_keys,
-        )
-        t_llm_end = time.perf_counter()
-        try:
-            if hasattr(cfg, "_timing_events"):
-                cfg._timing_events.append({"label": f"Step {step+1} LLM chat_complete", "seconds": t_llm_end - t_llm_start})
-        except Exception:
-            pass
-        
-        # Parse tool calls from response
-        t_parse_start = time.perf_counter()
-        tool_calls = parse_tool_calls(resp.content)
-        t_parse_end = time.perf_counter()
-        try:
-            if hasattr(cfg, "_timing_events"):
-                cfg._timing_events.append({"label": f"Step {step+1} parse tool calls", "seconds": t_parse_end - t_parse_start})
-        except Exception:
-            pass
+    round_seconds: List[float] = []  # Duration of each finished round, to project the next one
+    try:
+        for step in range(max_steps):
+            # Deadline: don't start a round that is not projected to finish within the research budget
+            time_left = _research_time_left(cfg)
+            if time_left is not None:
+                projected = sum(round_seconds) / len(round_seconds) if round_seconds else 0.0
+                if time_left <= 0 or time_left < projected:
+                    logger.info("Research budget nearly spent (%.1fs left, next round ~%.1fs); writing report with current evidence", time_left, projected)
+                    if status_callback:
+                        await status_callback("deadline reached, writing report")
+                    cfg._deadline_cut = True
+                    break
+            t_round_start = time.perf_counter()
+            log_payload(logger, "CONTEXT_JSON - research before prompt", contextjson, step=step + 1)
+            # Call LLM (pure conversation mode) and parse tool calls; may cascade fast -> strong
+            t_llm_start = time.perf_counter()
+            try:
+                resp, tool_calls = await asyncio.wait_for(
+                    _research_step_llm(messages, fast_system_prompt, cfg, api_keys),
+                    timeout=max(0.0, time_left) if time_left is not None else None,
+                )
+            except asyncio.TimeoutError:
+                logger.info("Step %d LLM call exceeded the research budget; writing report with current evidence", step + 1)
+                cfg._deadline_cut = True
+                break
+            t_llm_end = time.perf_counter()
+            try:
+                if hasattr(cfg, "_timing_events"):
+                    cfg._timing_events.append({"label": f"Step {step+1} LLM chat_complete", "seconds": t_llm_end - t_llm_start})
+            except Exception:
+                pass
         
-        # Output raw LLM response
-        print(f"\n{'='*60}")
-        print(f"[Step {step+1}] LLM Output:")
-        print(f"{'='*60}")
-        print(f"Content:\n{resp.content}")
-        if tool_calls:
-            print(f"\n🔧 Parsed {len(tool_calls)} tool call(s):")
-            for tc in tool_calls:
-                print(f"  - {tc['tool']}: {tc['arguments']}")
-        print(f"{'='*60}")
+            logger.info(
+                "Step %d parsed %d tool call(s)", step + 1, len(tool_calls),
+                extra={"step": step + 1, "tool_calls": [{"tool": tc["tool"], "arguments": tc["arguments"]} for tc in tool_calls]},
+            )
+            log_payload(logger, "Research LLM output", resp.content, step=step + 1)
         
-        # Save assistant response to history
-        conversation_history.append({"role": "assistant", "content": resp.content})
+            # Save assistant response to history
+            conversation_history.append({"role": "assistant", "content": resp.content})
         
-        if not tool_calls:
-            # No tool calls, LLM has provided final answer
-            raw_json = json.dumps({
-                "topic": topic,
-                "tool_calls": tool_interactions,
-            }, ensure_ascii=False)
-            return {
-                "raw_notes": raw_json,
-                "contextjson": contextjson
-            }
+            if not tool_calls:
+                # No tool calls, LLM has provided final answer
+                await fold_finished()
+                await cancel_stragglers("research finished")
+                raw_json = serializer.dumps({
+                    "topic": topic,
+                    "tool_calls": tool_interactions,
+                })
+                return {
+                    "raw_notes": raw_json,
+                    "contextjson": contextjson
+                }
         
-        # Check if ResearchComplete was called
-        if any(tc["tool"] == "ResearchComplete" for tc in tool_calls):
-            print("\n✅ Research completed by agent")
-            return {
-                "raw_notes": "\n\n".join([m["content"] for m in conversation_history if m.get("content")]),
-                "contextjson": contextjson
-            }
+            # Check if ResearchComplete was called
+            if any(tc["tool"] == "ResearchComplete" for tc in tool_calls):
+                logger.info("Research completed by agent")
+                await fold_finished()
+                await cancel_stragglers("research finished")
+                return {
+                    "raw_notes": "\n\n".join([m["content"] for m in conversation_history if m.get("content")]),
+                    "contextjson": contextjson
+                }
         
-        # Add assistant message to conversation
-        messages.append({"role": "assistant", "content": resp.content})
+            # Add assistant message to conversation
+            messages.append({"role": "assistant", "content": resp.content})
         
-        # Send status update - notify frontend which tools are being used
-        if status_callback and tool_calls:
-            tools_being_used = [tc["tool"] for tc in tool_calls]
-            unique_tools = list(set(tools_being_used))  # Deduplicate
-            tools_text = ", ".join(unique_tools[:3])  # Show max 3 tools
-            await status_callback(f"using {tools_text}")
+            # Send status update - notify frontend which tools are being used
+            if status_callback and tool_calls:
+                tools_being_used = [tc["tool"] for tc in tool_calls]
+                unique_tools = list(set(tools_being_used))  # Deduplicate
+                tools_text = ", ".join(unique_tools[:3])  # Show max 3 tools
+                await status_callback(f"using {tools_text}")
         
-        # Execute all tool calls
-        t_tools_start = time.perf_counter()
-        tool_results = await execute_tool_calls(tool_calls, mcp_clients, cfg)
-        t_tools_end = time.perf_counter()
-        try:
-            if hasattr(cfg, "_timing_events"):
-                cfg._timing_events.append({"label": f"Step {step+1} execute all tool calls", "seconds": t_tools_end - t_tools_start})
-        except Exception:
-            pass
-
-        # Record this round's tool calls and results (structured as JSON items)
-        call_info_map = {tc["id"]: {"tool": tc["tool"], "arguments": tc.get("arguments", {})} for tc in tool_calls}
-        # Build/extend context from each tool result
-        # Maintain simple dedup by (service,url)
-        seen = {f"{s.get('service','')}|{s.get('url','')}": True for s in contextjson.get("sources", [])}
-        for tr in tool_results:
-            call_id = tr.get("tool_call_id")
-            info = call_info_map.get(call_id, {})
-            result_text = tr.get("result", "")
-            # Parse once
+            # Start this round's tool calls; results are folded in as they complete
+            t_tools_start = time.perf_counter()
+            round_tasks = set()
+            for tc in tool_calls:
+                task = asyncio.ensure_future(_execute_single_tool(tc, mcp_clients, cfg))
+                in_flight[task] = (step + 1, tc)
+                round_tasks.add(task)
+            await _await_tool_quorum(in_flight, round_tasks, cfg, fold_done)
+            t_tools_end = time.perf_counter()
             try:
-                parsed_result: Any = json.loads(result_text)
+                if hasattr(cfg, "_timing_events"):
+                    cfg._timing_events.append({"label": f"Step {step+1} execute tool calls (quorum)", "seconds": t_tools_end - t_tools_start})
             except Exception:
-                parsed_result = result_text
-            tool_name = tr.get("tool") or info.get("tool") or ""
-            tool_args = info.get("arguments", {}) if isinstance(info.get("arguments", {}), dict) else {}
-            query_val = tool_args.get("query")
-            service = _infer_service_from_tool(tool_name) or "other"
-            # Normalize sources for Tavily/Exa
-            if service in ("tavily", "exa"):
-                try:
-                    new_sources = extract_sources_from_result(service, query_val, parsed_result)
-                except Exception:
-                    new_sources = []
-                for s in new_sources:
-                    key = f"{s.get('service','')}|{s.get('url','')}"
-                    if key in seen:
-                        continue
-                    seen[key] = True
-                    contextjson.setdefault("sources", []).append(s)
-
-            # Save interaction record
-            tool_interactions.append({
-                "step": step + 1,
-                "id": call_id,
-                "tool": tool_name,
-                "arguments": tool_args,
-                "result": parsed_result,
-            })
-
-        # Reassign rank by order
-        for i, s in enumerate(contextjson.get("sources", [])):
-            s["rank"] = i
+                pass
+            time_left = _research_time_left(cfg)
+            if time_left is not None and time_left <= 0:
+                # Out of research budget: stragglers won't make it into the report
+                cfg._deadline_cut = True
+                await cancel_stragglers("research deadline reached")
+            elif in_flight:
+                logger.info("Advancing with %d tool call(s) still running; late results join the next round", len(in_flight))
 
-        # Inject context JSON for LLM instead of raw tool results
-        ctx_block = f"<CONTEXT_JSON>\n{json.dumps(contextjson, ensure_ascii=False)}\n</CONTEXT_JSON>"
-        messages.append({"role": "user", "content": ctx_block})
-        conversation_history.append({"role": "contextjson", "content": ctx_block})
+            # Inject context JSON for LLM instead of raw tool results
+            ctx_block = f"<CONTEXT_JSON>\n{serializer.dumps(contextjson)}\n</CONTEXT_JSON>"
+            messages.append({"role": "user", "content": ctx_block})
+            conversation_history.append({"role": "contextjson", "content": ctx_block})
 
-        # Send minimal sources update to frontend via status callback
-        if status_callback:
-            try:
-                minimal_sources = [
-                    {"service": s.get("service", ""), "query": s.get("query", ""), "url": s.get("url", "")}
-                    for s in contextjson.get("sources", [])
-                    if s.get("service") and s.get("url")
-                ]
-                await status_callback(json.dumps({"event": "sources_update", "sources": minimal_sources}, ensure_ascii=False))
-            except Exception:
-                pass
-    
-    # Reached max steps, return collected tool interactions as JSON
-    raw_json = json.dumps({
-        "topic": topic,
-        "tool_calls": tool_interactions,
-    }, ensure_ascii=False)
-    return {"raw_notes": raw_json, "contextjson": contextjson}
+            round_seconds.append(time.perf_counter() - t_round_start)
+            cfg._research_rounds = len(round_seconds)
+            if status_callback:
+                await status_callback({"event": "round_done", "round": len(round_seconds), "seconds": round_seconds[-1]})
+    
+        # Reached max steps (or the deadline), return collected tool interactions as JSON
+        await fold_finished()
+        await cancel_stragglers("research finished")
+        raw_json = serializer.dumps({
+            "topic": topic,
+            "tool_calls": tool_interactions,
+        })
+        return {"raw_notes": raw_json, "contextjson": contextjson}
+    finally:
+        # Stragglers nobody will read (the run failed or was cancelled)
+        await _cancel_tools(in_flight)
 
 
 if __name__ == "__main__":
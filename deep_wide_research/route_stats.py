@@ -0,0 +1,118 @@
+"""Rolling latency statistics per (model, upstream provider).
+
+Report generation feeds TTFT and tokens-per-second samples here; the engine
+reads them back to pick the fastest of several equivalent models when a
+request carries a latency goal.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Samples kept per route, and minimum samples before a route is trusted
+ROUTE_STATS_WINDOW = int(os.getenv("ROUTE_STATS_WINDOW", "50"))
+ROUTE_STATS_MIN_SAMPLES = int(os.getenv("ROUTE_STATS_MIN_SAMPLES", "3"))
+
+# Goals accepted on requests; values double as OpenRouter provider.sort values
+LATENCY_GOALS = ("latency", "throughput")
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def load_equivalent_models() -> Dict[str, List[str]]:
+    """Parse EQUIVALENT_MODELS, e.g. {"openai/o4-mini": ["google/gemini-2.5-flash"]}"""
+    try:
+        data = json.loads(os.getenv("EQUIVALENT_MODELS", "{}") or "{}")
+    except Exception:
+        return {}
+    out: Dict[str, List[str]] = {}
+    if isinstance(data, dict):
+        for k, v in data.items():
+            if isinstance(v, list):
+                out[str(k)] = [str(m) for m in v if m]
+    return out
+
+
+class RouteStats:
+    """Thread-safe rolling window of TTFT / throughput samples per route"""
+
+    def __init__(self, window: int = ROUTE_STATS_WINDOW):
+        self._window = max(1, window)
+        self._ttft: Dict[Tuple[str, str], Deque[float]] = {}
+        self._tps: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, provider: Optional[str], ttft: Optional[float] = None, tokens_per_sec: Optional[float] = None) -> None:
+        key = (model, provider or "unknown")
+        with self._lock:
+            if ttft is not None and ttft >= 0:
+                self._ttft.setdefault(key, deque(maxlen=self._window)).append(float(ttft))
+            if tokens_per_sec is not None and tokens_per_sec > 0:
+                self._tps.setdefault(key, deque(maxlen=self._window)).append(float(tokens_per_sec))
+
+    def _summarize(self, ttft: List[float], tps: List[float]) -> Dict[str, Any]:
+        return {
+            "samples": len(ttft),
+            "ttft_p50": _percentile(ttft, 0.5),
+            "ttft_p90": _percentile(ttft, 0.9),
+            "tps_p50": _percentile(tps, 0.5),
+        }
+
+    def summary(self, model: str, provider: Optional[str] = None) -> Dict[str, Any]:
+        """Summary for one route, or across all providers of a model if provider is None"""
+        with self._lock:
+            ttft: List[float] = []
+            tps: List[float] = []
+            for key, values in self._ttft.items():
+                if key[0] == model and (provider is None or key[1] == provider):
+                    ttft.extend(values)
+            for key, values in self._tps.items():
+                if key[0] == model and (provider is None or key[1] == provider):
+                    tps.extend(values)
+        return self._summarize(ttft, tps)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            keys = sorted(set(self._ttft) | set(self._tps))
+            rows = []
+            for model, provider in keys:
+                row = self._summarize(list(self._ttft.get((model, provider), [])), list(self._tps.get((model, provider), [])))
+                row.update({"model": model, "provider": provider})
+                rows.append(row)
+        return rows
+
+    def pick_model(self, candidates: List[str], goal: str) -> Optional[str]:
+        """Best measured candidate for the goal; None when no candidate has enough samples"""
+        best: Optional[str] = None
+        best_score: Optional[float] = None
+        for model in candidates:
+            s = self.summary(model)
+            if s["samples"] < ROUTE_STATS_MIN_SAMPLES:
+                continue
+            if goal == "throughput":
+                if s["tps_p50"] is None:
+                    continue
+                score = -s["tps_p50"]
+            else:
+                score = s["ttft_p50"]
+            if best_score is None or score < best_score:
+                best, best_score = model, score
+        return best
+
+
+_global_route_stats = RouteStats()
+
+
+def get_route_stats() -> RouteStats:
+    """Get global route statistics instance"""
+    return _global_route_stats
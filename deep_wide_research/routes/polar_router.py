@@ -1,4 +1,4 @@
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, Awaitable
 import json
 import time
 import logging
@@ -15,13 +15,14 @@ class CheckoutSuccessRequest(BaseModel):
 
 def build_polar_router(
     verify_polar_signature: Callable[[Request, bytes], None],
-    determine_units_for_purchase: Callable[[Optional[str], Optional[str], Optional[str]], int],
-    grant_credits: Callable[[str, int, str, Dict[str, Any]], int],
-    update_subscription: Callable[[str, str, Optional[str], Optional[str], Dict[str, Any]], None],
-    update_profile_plan: Callable[[str, str], None],  # by user_id
-    update_profile_plan_by_email: Callable[[str, str], None],
-    find_user_by_email: Callable[[Optional[str]], Optional[str]],
-    verify_supabase_jwt: Callable[[Optional[str]], str],
+    # Data-access callables are async (Supabase REST on the shared pooled client)
+    determine_units_for_purchase: Callable[[Optional[str], Optional[str], Optional[str]], Awaitable[int]],
+    grant_credits: Callable[[str, int, str, Dict[str, Any]], Awaitable[int]],
+    update_subscription: Callable[[str, str, Optional[str], Optional[str], Dict[str, Any]], Awaitable[None]],
+    update_profile_plan: Callable[[str, str], Awaitable[None]],  # by user_id
+    update_profile_plan_by_email: Callable[[str, str], Awaitable[None]],
+    find_user_by_email: Callable[[Optional[str]], Awaitable[Optional[str]]],
+    verify_supabase_jwt: Callable[[Optional[str]], Awaitable[str]],
     pro_default: int,
     plus_default: int,
     logger: logging.Logger,
@@ -80,7 +81,7 @@ def build_polar_router(
         )
 
         if not user_id:
-            user_id = find_user_by_email(email)
+            user_id = await find_user_by_email(email)
         if logger:
             try:
                 logger.info("[dwr_polar_webhook] identified email=%s user_id=%s", email, user_id)
@@ -110,7 +111,7 @@ def build_polar_router(
             )
             price_id = data.get("price_id") or (data.get("price") or {}).get("id")
             plan_hint = (data.get("metadata") or {}).get("plan")
-            units = determine_units_for_purchase(product_id=product_id, price_id=price_id, plan_hint=plan_hint)
+            units = await determine_units_for_purchase(product_id=product_id, price_id=price_id, plan_hint=plan_hint)
             if logger:
                 try:
                     logger.info("[dwr_polar_webhook] determined units=%s (plan_hint=%s)", units, plan_hint)
@@ -130,7 +131,7 @@ def build_polar_router(
                 or (data.get("subscription") or {}).get("id")
             )
             rid = f"polar_{canonical_txn_id or event_id}"
-            new_balance = grant_credits(
+            new_balance = await grant_credits(
                 user_id=user_id,
                 units=units,
                 request_id=rid,
@@ -144,7 +145,7 @@ def build_polar_router(
             # Optional: update subscription + plan
             status = (data.get("status") or data.get("state") or "active")
             period_end = data.get("current_period_end") or data.get("period_end") or data.get("current_period_end_at")
-            update_subscription(
+            await update_subscription(
                 user_id=user_id,
                 provider="polar",
                 status=str(status).lower(),
@@ -160,9 +161,9 @@ def build_polar_router(
                     except Exception:
                         ...
                 if email:
-                    update_profile_plan_by_email(email, plan_for_profile)
+                    await update_profile_plan_by_email(email, plan_for_profile)
                 else:
-                    update_profile_plan(user_id, plan_for_profile)
+                    await update_profile_plan(user_id, plan_for_profile)
 
             return {"ok": True, "user_id": user_id, "granted": units, "balance": new_balance}
 
@@ -175,7 +176,7 @@ def build_polar_router(
             )
             price_id = data.get("price_id") or (data.get("price") or {}).get("id")
             plan_hint = (data.get("metadata") or {}).get("plan")
-            units = determine_units_for_purchase(product_id=product_id, price_id=price_id, plan_hint=plan_hint)
+            units = await determine_units_for_purchase(product_id=product_id, price_id=price_id, plan_hint=plan_hint)
             canonical_txn_id = (
                 data.get("invoice_id")
                 or (data.get("invoice") or {}).get("id")
@@ -189,7 +190,7 @@ def build_polar_router(
                 or (data.get("subscription") or {}).get("id")
             )
             rid = f"polar_refund_{canonical_txn_id or event_id}"
-            new_balance = grant_credits(
+            new_balance = await grant_credits(
                 user_id=user_id,
                 units= -abs(int(units or 0)),
                 request_id=rid,
@@ -201,7 +202,7 @@ def build_polar_router(
             )
             status = (data.get("status") or data.get("state") or "refunded")
             period_end = data.get("current_period_end") or data.get("period_end") or data.get("current_period_end_at")
-            update_subscription(
+            await update_subscription(
                 user_id=user_id,
                 provider="polar",
                 status=str(status).lower(),
@@ -214,7 +215,7 @@ def build_polar_router(
         if evt_type.startswith("subscription."):
             status = (data.get("status") or data.get("state") or evt_type.split(".")[-1])
             period_end = data.get("current_period_end") or data.get("period_end") or data.get("current_period_end_at")
-            update_subscription(
+            await update_subscription(
                 user_id=user_id,
                 provider="polar",
                 status=str(status).lower(),
@@ -229,7 +230,7 @@ def build_polar_router(
     async def polar_checkout_success(body: CheckoutSuccessRequest, req: Request):
         """Grant credits immediately after client returns from successful checkout."""
         try:
-            user_id = verify_supabase_jwt(req.headers.get("Authorization"))
+            user_id = await verify_supabase_jwt(req.headers.get("Authorization"))
         except Exception as e:
             try:
                 logger.exception("JWT verification failed on checkout success")
@@ -237,14 +238,14 @@ def build_polar_router(
                 ...
             raise
 
-        units = determine_units_for_purchase(
+        units = await determine_units_for_purchase(
             product_id=(body.product_id or None),
             price_id=(body.price_id or None),
             plan_hint=(body.plan or None),
         )
 
         rid = f"polar_checkout_success_{user_id}_{int(time.time())}"
-        new_balance = grant_credits(
+        new_balance = await grant_credits(
             user_id=user_id,
             units=units,
             request_id=rid,
@@ -263,7 +264,7 @@ def build_polar_router(
                 logger.info("[dwr_polar_checkout_success] updating plan user_id=%s plan=%s", user_id, plan_for_profile)
             except Exception:
                 ...
-        update_profile_plan(user_id, plan_for_profile)
+        await update_profile_plan(user_id, plan_for_profile)
 
         return {"ok": True, "user_id": user_id, "granted": units, "balance": new_balance}
 
@@ -0,0 +1,210 @@
+"""Run history and a simple runtime model per (deep, wide, model).
+
+Every finished run records its phase timings. Estimates come from the closest
+level with enough history:
+1. the (model, deep, wide) bucket (deep/wide rounded to RUNTIME_BUCKET) - median / p90;
+2. the model, then all runs - least-squares fit of seconds against deep*wide;
+3. a built-in prior.
+History is kept in memory and, unless RUN_HISTORY_DB is empty, in a local
+SQLite file (pruned to the newest RUN_HISTORY_MAX runs) so estimates survive
+restarts. Runs whose research was cut short by a deadline are not recorded.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+RUN_HISTORY_DB = os.getenv("RUN_HISTORY_DB", os.path.join(tempfile.gettempdir(), "dwr_run_history.sqlite3"))
+RUN_HISTORY_MAX = int(os.getenv("RUN_HISTORY_MAX", "5000"))
+RUNTIME_MIN_SAMPLES = int(os.getenv("RUNTIME_MIN_SAMPLES", "3"))
+RUNTIME_BUCKET = 0.25
+
+# Prior when there is no history: seconds = a + b * deep * wide
+_PRIOR = {"research": (20.0, 160.0), "report": (15.0, 45.0), "rounds": (2.0, 8.0)}
+
+_FIELDS = ("ts", "deep", "wide", "model", "total_seconds", "research_seconds", "report_seconds", "rounds")
+
+
+def _bucket(value: float) -> float:
+    try:
+        return round(round(float(value) / RUNTIME_BUCKET) * RUNTIME_BUCKET, 2)
+    except Exception:
+        return 0.5
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+
+def _fit(points: List[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+    """Least-squares y = a + b*x; None if x has no spread"""
+    n = len(points)
+    if n < 2:
+        return None
+    mx = sum(x for x, _ in points) / n
+    my = sum(y for _, y in points) / n
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    if sxx <= 1e-9:
+        return None
+    b = sum((x - mx) * (y - my) for x, y in points) / sxx
+    return my - b * mx, max(0.0, b)
+
+
+class RunHistory:
+    """Recent run timings plus the runtime model fitted from them"""
+
+    def __init__(self, path: str = RUN_HISTORY_DB, max_runs: int = RUN_HISTORY_MAX):
+        self._runs: Deque[Dict[str, Any]] = deque(maxlen=max(1, max_runs))
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS runs (ts REAL, deep REAL, wide REAL, model TEXT, total_seconds REAL, "
+                    "research_seconds REAL, report_seconds REAL, rounds INTEGER)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts)")
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_FIELDS)} FROM runs ORDER BY ts DESC LIMIT ?", (self._runs.maxlen,)
+                ).fetchall()
+                for row in reversed(rows):
+                    self._runs.append(dict(zip(_FIELDS, row)))
+            except Exception as e:
+                logger.warning(f"Run history persistence disabled ({path}): {e}")
+                self._conn = None
+
+    def record_run(self, deep: float, wide: float, model: str, total_seconds: float, research_seconds: float, report_seconds: float, rounds: int) -> None:
+        run = {
+            "ts": time.time(),
+            "deep": float(deep),
+            "wide": float(wide),
+            "model": model or "",
+            "total_seconds": float(total_seconds),
+            "research_seconds": float(research_seconds),
+            "report_seconds": float(report_seconds),
+            "rounds": int(rounds),
+        }
+        with self._lock:
+            self._runs.append(run)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        f"INSERT INTO runs ({', '.join(_FIELDS)}) VALUES ({', '.join('?' for _ in _FIELDS)})",
+                        tuple(run[f] for f in _FIELDS),
+                    )
+                    # Keep the file as bounded as the in-memory history
+                    self._conn.execute(
+                        "DELETE FROM runs WHERE ts < (SELECT ts FROM runs ORDER BY ts DESC LIMIT 1 OFFSET ?)",
+                        (self._runs.maxlen - 1,),
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to persist run: {e}")
+
+    def estimate(self, deep: float, wide: float, model: Optional[str]) -> Dict[str, Any]:
+        """Expected total/research/report seconds (p50 and p90) and research rounds for a run"""
+        with self._lock:
+            runs = list(self._runs)
+        db, wb = _bucket(deep), _bucket(wide)
+        bucket = [r for r in runs if r["model"] == (model or "") and _bucket(r["deep"]) == db and _bucket(r["wide"]) == wb]
+        if len(bucket) >= RUNTIME_MIN_SAMPLES:
+            out: Dict[str, Any] = {"basis": "bucket", "samples": len(bucket)}
+            for field in ("total", "research", "report"):
+                values = [r[f"{field}_seconds"] for r in bucket]
+                out[f"{field}_seconds"] = _pct(values, 0.5)
+                out[f"{field}_p90_seconds"] = _pct(values, 0.9)
+            out["rounds"] = _pct([float(r["rounds"]) for r in bucket], 0.5)
+            return out
+
+        load = float(deep) * float(wide)
+        for basis, subset in (("model_fit", [r for r in runs if r["model"] == (model or "")]), ("global_fit", runs)):
+            if len(subset) < RUNTIME_MIN_SAMPLES:
+                continue
+            fits = {}
+            for field in ("research", "report"):
+                fits[field] = _fit([(r["deep"] * r["wide"], r[f"{field}_seconds"]) for r in subset])
+            fits["rounds"] = _fit([(r["deep"] * r["wide"], float(r["rounds"])) for r in subset])
+            if any(f is None for f in fits.values()):
+                continue
+            research = max(0.0, fits["research"][0] + fits["research"][1] * load)
+            report = max(0.0, fits["report"][0] + fits["report"][1] * load)
+            # p90 from the spread of total runtime relative to its median
+            totals = [r["total_seconds"] for r in subset]
+            spread = _pct(totals, 0.9) / _pct(totals, 0.5) if _pct(totals, 0.5) > 0 else 1.5
+            return {
+                "basis": basis,
+                "samples": len(subset),
+                "total_seconds": research + report,
+                "total_p90_seconds": (research + report) * spread,
+                "research_seconds": research,
+                "research_p90_seconds": research * spread,
+                "report_seconds": report,
+                "report_p90_seconds": report * spread,
+                "rounds": max(1.0, fits["rounds"][0] + fits["rounds"][1] * load),
+            }
+
+        research = _PRIOR["research"][0] + _PRIOR["research"][1] * load
+        report = _PRIOR["report"][0] + _PRIOR["report"][1] * load
+        return {
+            "basis": "prior",
+            "samples": 0,
+            "total_seconds": research + report,
+            "total_p90_seconds": (research + report) * 1.5,
+            "research_seconds": research,
+            "research_p90_seconds": research * 1.5,
+            "report_seconds": report,
+            "report_p90_seconds": report * 1.5,
+            "rounds": _PRIOR["rounds"][0] + _PRIOR["rounds"][1] * load,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-(model, deep, wide) bucket stats for the latency endpoint"""
+        with self._lock:
+            runs = list(self._runs)
+        buckets: Dict[Tuple[str, float, float], List[Dict[str, Any]]] = {}
+        for r in runs:
+            buckets.setdefault((r["model"], _bucket(r["deep"]), _bucket(r["wide"])), []).append(r)
+        items = []
+        for (model, db, wb), group in sorted(buckets.items()):
+            totals = [g["total_seconds"] for g in group]
+            items.append({
+                "model": model,
+                "deep": db,
+                "wide": wb,
+                "runs": len(group),
+                "total_p50_seconds": _pct(totals, 0.5),
+                "total_p90_seconds": _pct(totals, 0.9),
+                "research_p50_seconds": _pct([g["research_seconds"] for g in group], 0.5),
+                "report_p50_seconds": _pct([g["report_seconds"] for g in group], 0.5),
+                "rounds_p50": _pct([float(g["rounds"]) for g in group], 0.5),
+            })
+        all_totals = [r["total_seconds"] for r in runs]
+        return {
+            "runs": len(runs),
+            "total_p50_seconds": _pct(all_totals, 0.5),
+            "total_p90_seconds": _pct(all_totals, 0.9),
+            "buckets": items,
+        }
+
+
+_global_run_history: Optional[RunHistory] = None
+
+
+def get_run_history() -> RunHistory:
+    """Get global run history instance"""
+    global _global_run_history
+    if _global_run_history is None:
+        _global_run_history = RunHistory()
+    return _global_run_history
@@ -0,0 +1,152 @@
+"""JSON encode/decode for the hot paths (tool results, CONTEXT_JSON, SSE events).
+
+Uses orjson when it is installed and falls back to the standard library, with
+the same compact output either way. SERIALIZER=json forces the standard
+library. orjson rejects a few things the standard library accepts (integers
+beyond 64 bits, for example); those values fall back to the standard library
+instead of raising.
+
+Run ``python -m deep_wide_research.serializer`` for a micro-benchmark of the
+research loop's JSON work on realistic search payloads.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if os.getenv("SERIALIZER", "auto").lower() == "json":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+_ORJSON_SORTED_OPTS = _ORJSON_OPTS | orjson.OPT_SORT_KEYS if orjson is not None else 0
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool = False) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=str)
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """UTF-8 JSON bytes (compact, non-ASCII kept as is)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=_ORJSON_SORTED_OPTS if sort_keys else _ORJSON_OPTS)
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+    return _stdlib_dumps(obj, sort_keys).encode("utf-8")
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """JSON text (compact, non-ASCII kept as is)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=_ORJSON_SORTED_OPTS if sort_keys else _ORJSON_OPTS).decode("utf-8")
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+    return _stdlib_dumps(obj, sort_keys)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Inputs the stdlib accepts but orjson does not (NaN, lone surrogates)
+            pass
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+def sse_event(obj: Any) -> str:
+    """One Server-Sent Events ``data:`` frame"""
+    return f"data: {dumps(obj)}\n\n"
+
+
+def _bench_payload(n_results: int = 10, text_chars: int = 2000) -> Any:
+    """A Tavily-style MCP tools/call result: structured results plus the same JSON as text"""
+    results = [
+        {
+            "url": f"https://example.com/article/{i}",
+            "title": f"Result {i}: a representative search hit with a longer title",
+            "content": ("Lorem ipsum dolor sit amet, consectetur adipiscing elit — ünïcödé. " * (text_chars // 64))[:text_chars],
+            "score": 0.9 - i * 0.01,
+            "publishedDate": "2026-01-01",
+        }
+        for i in range(n_results)
+    ]
+    structured = {"query": "benchmark query", "results": results}
+    return {"content": [{"type": "text", "text": json.dumps(structured)}], "structuredContent": structured, "isError": False}
+
+
+def _benchmark(rounds: int = 4, calls_per_round: int = 3, repeat: int = 20) -> None:
+    import time
+
+    try:
+        from .context_utils import build_context_from_raw_notes, extract_sources_from_result
+    except ImportError:
+        try:
+            from deep_wide_research.context_utils import build_context_from_raw_notes, extract_sources_from_result
+        except ImportError:
+            from context_utils import build_context_from_raw_notes, extract_sources_from_result
+
+    raw = _bench_payload()
+
+    def old_path() -> None:
+        # Previous flow: stringify every result, parse it back, re-dump with stdlib defaults
+        contextjson: Any = {"sources": []}
+        interactions = []
+        for step in range(rounds):
+            for _ in range(calls_per_round):
+                text = json.dumps(raw)
+                parsed = json.loads(text)
+                contextjson["sources"].extend(extract_sources_from_result("tavily", "q", parsed))
+                interactions.append({"step": step, "tool": "tavily_search", "arguments": {"query": "q"}, "result": parsed})
+                json.dumps({"event": "sources_update", "sources": contextjson["sources"]}, ensure_ascii=False)
+            json.dumps(contextjson, ensure_ascii=False)
+        raw_notes = json.dumps({"topic": "t", "tool_calls": interactions}, ensure_ascii=False)
+        build_context_from_raw_notes(raw_notes)
+
+    def new_path() -> None:
+        # Current flow: results stay parsed; only prompt text and SSE frames are encoded
+        contextjson: Any = {"sources": []}
+        interactions = []
+        for step in range(rounds):
+            for _ in range(calls_per_round):
+                contextjson["sources"].extend(extract_sources_from_result("tavily", "q", raw))
+                interactions.append({"step": step, "tool": "tavily_search", "arguments": {"query": "q"}, "result": raw})
+                sse_event({"action": "sources_update", "sources": contextjson["sources"]})
+            dumps(contextjson)
+        dumps({"topic": "t", "tool_calls": interactions})
+
+    def timed(fn) -> float:
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    payload_kb = len(json.dumps(raw).encode("utf-8")) / 1024
+    print(f"[serializer] backend={BACKEND}, tool result {payload_kb:.1f} KB, {rounds} rounds x {calls_per_round} calls")
+    old_ms, new_ms = timed(old_path), timed(new_path)
+    print(f"- {'stdlib dumps/loads round trips':<32} {old_ms:.2f} ms per run")
+    print(f"- {'parsed end to end (' + BACKEND + ')':<32} {new_ms:.2f} ms per run ({old_ms / new_ms:.1f}x)")
+    sample = {"sources": raw["structuredContent"]["results"]}
+    sample_kb = len(json.dumps(sample).encode("utf-8")) / 1024
+    for name, fn in (("json.dumps", lambda: json.dumps(sample, ensure_ascii=False)), ("serializer.dumps", lambda: dumps(sample))):
+        start = time.perf_counter()
+        for _ in range(repeat * 50):
+            fn()
+        print(f"- {name:<16} CONTEXT_JSON ({sample_kb:.0f} KB): {(time.perf_counter() - start) / (repeat * 50) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,98 @@
+"""Async Supabase REST (PostgREST) access on one shared, pooled HTTP client.
+
+The API handlers talk to Supabase on every request (auth, plan, credits), so
+the calls must not block the event loop: a slow Supabase response used to stall
+every SSE stream in the worker. All calls go through a single httpx.AsyncClient
+with keep-alive connections and bounded timeouts; close it on shutdown.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+SUPABASE_HTTP_TIMEOUT_SEC = float(os.getenv("SUPABASE_HTTP_TIMEOUT_SEC", "10"))
+SUPABASE_HTTP_CONNECT_TIMEOUT_SEC = float(os.getenv("SUPABASE_HTTP_CONNECT_TIMEOUT_SEC", "3"))
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "50"))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "20"))
+
+
+class SupabaseREST:
+    """Service-role PostgREST client; ``client`` is also usable for other small HTTP fetches"""
+
+    def __init__(self, base_url: Optional[str], service_key: Optional[str]):
+        self.base_url = (base_url or "").rstrip("/")
+        self.service_key = service_key or ""
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.base_url and self.service_key)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(SUPABASE_HTTP_TIMEOUT_SEC, connect=SUPABASE_HTTP_CONNECT_TIMEOUT_SEC),
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+                ),
+            )
+        return self._client
+
+    def headers(self, prefer: Optional[str] = None) -> Dict[str, str]:
+        headers = {
+            "apikey": self.service_key,
+            "Authorization": f"Bearer {self.service_key}",
+            "Content-Type": "application/json",
+        }
+        if prefer:
+            headers["Prefer"] = prefer
+        return headers
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, str]] = None,
+        json_body: Any = None,
+        prefer: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        kwargs: Dict[str, Any] = {"params": params, "headers": self.headers(prefer)}
+        if json_body is not None:
+            kwargs["json"] = json_body
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=min(timeout, SUPABASE_HTTP_CONNECT_TIMEOUT_SEC))
+        return await self.client.request(method, f"{self.base_url}{path}", **kwargs)
+
+    async def get(self, path: str, params: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> httpx.Response:
+        return await self.request("GET", path, params=params, timeout=timeout)
+
+    async def post(self, path: str, json_body: Any, timeout: Optional[float] = None) -> httpx.Response:
+        return await self.request("POST", path, json_body=json_body, prefer="return=representation", timeout=timeout)
+
+    async def patch(self, path: str, json_body: Any, timeout: Optional[float] = None) -> httpx.Response:
+        return await self.request("PATCH", path, json_body=json_body, prefer="return=representation", timeout=timeout)
+
+    async def rpc(self, function: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+        return await self.request("POST", f"/rest/v1/rpc/{function}", json_body=payload, timeout=timeout)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_global_supabase: Optional[SupabaseREST] = None
+
+
+def get_supabase() -> SupabaseREST:
+    """Get global Supabase REST client (reads SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY on first use)"""
+    global _global_supabase
+    if _global_supabase is None:
+        _global_supabase = SupabaseREST(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+    return _global_supabase
@@ -0,0 +1,67 @@
+"""Per-request usage ledger.
+
+Collects token usage for every LLM call (prompt, completion, cached, cost when
+the upstream reports it) and tool-call counts / payload bytes per MCP server.
+The engine emits the summary as the final ``usage`` stream event and the API
+passes it to credit consumption as metering metadata.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+_TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+
+
+def _new_token_bucket() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "total_tokens": 0, "cost": 0.0}
+
+
+class UsageLedger:
+    """Accumulates usage for one research request"""
+
+    def __init__(self):
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.tools_by_server: Dict[str, Dict[str, int]] = {}
+
+    def record_llm(self, phase: str, model: str, usage: Optional[Dict[str, Any]], provider: Optional[str] = None) -> None:
+        """Record one LLM call; ``usage`` is the normalized dict from providers.py"""
+        u = usage or {}
+        entry: Dict[str, Any] = {"phase": phase, "model": model, "provider": provider or u.get("provider")}
+        for field in _TOKEN_FIELDS:
+            try:
+                entry[field] = int(u.get(field) or 0)
+            except Exception:
+                entry[field] = 0
+        if u.get("cost") is not None:
+            try:
+                entry["cost"] = float(u["cost"])
+            except Exception:
+                pass
+        self.llm_calls.append(entry)
+
+    def record_tool(self, server: str, payload_bytes: int, ok: bool = True) -> None:
+        bucket = self.tools_by_server.setdefault(server or "other", {"calls": 0, "errors": 0, "payload_bytes": 0})
+        bucket["calls"] += 1
+        bucket["payload_bytes"] += max(0, int(payload_bytes or 0))
+        if not ok:
+            bucket["errors"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        totals = _new_token_bucket()
+        by_model: Dict[str, Dict[str, Any]] = {}
+        by_phase: Dict[str, Dict[str, Any]] = {}
+        for call in self.llm_calls:
+            for bucket in (totals, by_model.setdefault(call["model"], _new_token_bucket()), by_phase.setdefault(call["phase"], _new_token_bucket())):
+                bucket["calls"] += 1
+                for field in _TOKEN_FIELDS:
+                    bucket[field] += call.get(field, 0)
+                bucket["cost"] += call.get("cost", 0.0)
+        tool_totals = {"calls": 0, "errors": 0, "payload_bytes": 0}
+        for bucket in self.tools_by_server.values():
+            for k in tool_totals:
+                tool_totals[k] += bucket[k]
+        return {
+            "llm": {**totals, "by_model": by_model, "by_phase": by_phase},
+            "tools": {**tool_totals, "by_server": {k: dict(v) for k, v in self.tools_by_server.items()}},
+        }